@@ -0,0 +1,193 @@
+import statistics
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.src.db import engine
+from backend.src.repositories.counters import CounterRepository
+
+
+@asynccontextmanager
+async def rollback_session():
+    """Сессия внутри транзакции, которая откатывается после бенчмарка.
+
+    Сгенерированные данные не остаются в БД.
+    """
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False)
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+async def seed_recipes(
+    session,
+    recipes_count: int,
+    authors_count: int = 50,
+    ingredients_per_recipe: int = 8,
+):
+    """Наполнение БД синтетическими пользователями и рецептами.
+
+    Каждый третий рецепт получает три тега, каждый пятый - ни одного,
+    у каждого рецепта ingredients_per_recipe ингредиентов.
+    Каждый четвертый рецепт добавлен первым пользователем в избранное
+    и список покупок. Счетчики пересчитываются после вставки.
+    Возвращается id этого пользователя.
+    """
+    await session.execute(
+        text(
+            'INSERT INTO "user" (email, username, hashed_password, is_active, '
+            "is_superuser, is_verified) "
+            "SELECT 'bench_' || g || '@bench.io', 'bench_' || g, '', true, "
+            "false, true FROM generate_series(1, :authors_count) g"
+        ),
+        {"authors_count": authors_count},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO tag (name, color, slug) "
+            "SELECT 'bench_' || g, '#000000', 'bench_' || g "
+            "FROM generate_series(1, 3) g"
+        )
+    )
+    await session.execute(
+        text(
+            "INSERT INTO image (name, hash, size, mime) "
+            "SELECT 'bench_' || g || '.png', "
+            "encode(sha256(('bench_' || g)::bytea), 'hex'), 0, 'image/png' "
+            "FROM generate_series(1, :recipes_count) g"
+        ),
+        {"recipes_count": recipes_count},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO recipe (author, name, text, cooking_time, image) "
+            "SELECT u.id, 'bench_' || i.id, 'text', 10, i.id "
+            "FROM image i "
+            "JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n "
+            "      FROM \"user\" WHERE username LIKE 'bench\\_%') u "
+            "ON u.n = i.id % :authors_count "
+            "WHERE i.name LIKE 'bench\\_%'"
+        ),
+        {"authors_count": authors_count},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO recipetag (tag_id, recipe_id) "
+            "SELECT t.id, r.id FROM recipe r "
+            "JOIN tag t ON t.slug LIKE 'bench\\_%' "
+            "WHERE r.name LIKE 'bench\\_%' AND r.id % 5 <> 0 "
+            "AND (r.id % 3 = 0 OR t.slug = 'bench_' || (r.id % 3 + 1))"
+        )
+    )
+    await session.execute(
+        text(
+            "INSERT INTO ingredient (name, measurement_unit) "
+            "SELECT 'bench_' || g, 'г' FROM generate_series(1, 100) g"
+        )
+    )
+    await session.execute(
+        text(
+            "INSERT INTO ingredientamount (ingredient_id, amount) "
+            "SELECT id, 100 FROM ingredient WHERE name LIKE 'bench\\_%'"
+        )
+    )
+    await session.execute(
+        text(
+            "INSERT INTO recipeingredient (ingredient_amount_id, recipe_id) "
+            "SELECT ia.id, r.id FROM recipe r "
+            "CROSS JOIN LATERAL ("
+            "    SELECT ingredientamount.id FROM ingredientamount "
+            "    JOIN ingredient ON ingredient.id = ingredientamount.ingredient_id "
+            "    WHERE ingredient.name LIKE 'bench\\_%' "
+            "    ORDER BY (ingredientamount.id * 7 + r.id) % 100 "
+            "    LIMIT :ingredients_per_recipe"
+            ") ia "
+            "WHERE r.name LIKE 'bench\\_%'"
+        ),
+        {"ingredients_per_recipe": ingredients_per_recipe},
+    )
+    viewer_id = await session.execute(
+        text("SELECT min(id) FROM \"user\" WHERE username LIKE 'bench\\_%'")
+    )
+    viewer_id = viewer_id.scalars().one()
+    for table in ("favoriterecipe", "shoppingcart"):
+        await session.execute(
+            text(
+                f"INSERT INTO {table} (user_id, recipe_id) "
+                "SELECT :viewer_id, id FROM recipe "
+                "WHERE name LIKE 'bench\\_%' AND id % 4 = 0"
+            ),
+            {"viewer_id": viewer_id},
+        )
+    await CounterRepository(session).reconcile()
+    await session.execute(text("ANALYZE"))
+    return viewer_id
+
+
+@contextmanager
+def count_queries():
+    """Подсчет запросов, отправленных в БД внутри блока."""
+    counter = {"queries": 0}
+
+    def before_cursor_execute(*args):
+        counter["queries"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain_analyze(session, stmt) -> dict:
+    """Результат EXPLAIN ANALYZE для запроса в виде словаря."""
+    compiled = stmt.compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    result = await session.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}")
+    )
+    return result.scalars().one()[0]
+
+
+def plan_rows(plan: dict, node_type: str | None = None) -> int:
+    """Наибольшее число строк, прошедших через узлы плана указанного типа."""
+    rows = list()
+
+    def walk(node):
+        if node_type is None or node["Node Type"] == node_type:
+            rows.append(node["Actual Rows"] * node.get("Actual Loops", 1))
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    return max(rows, default=0)
+
+
+async def measure(coroutine_factory, repeats: int = 20) -> dict:
+    """Время выполнения корутины: медиана и 95-й перцентиль в мс."""
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await coroutine_factory()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[max(int(len(timings) * 0.95) - 1, 0)],
+    }
+
+
+def print_table(header: list[str], rows: list[list]):
+    """Вывод результатов бенчмарка в виде таблицы."""
+    widths = [
+        max(len(str(row[i])) for row in [header, *rows]) for i in range(len(header))
+    ]
+    for row in [header, ["-" * width for width in widths], *rows]:
+        print(" | ".join(str(value).ljust(width) for value, width in zip(row, widths)))
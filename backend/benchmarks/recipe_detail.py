@@ -0,0 +1,185 @@
+"""Сравнение получения рецепта по id: прежний путь из нескольких запросов
+и один запрос с json_build_object/json_agg.
+
+Для популярного рецепта добавляются записи в избранном множества
+пользователей, чтобы показать стоимость загрузки всех отметок рецепта.
+"""
+
+import argparse
+import sys
+from asyncio import run
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import selectinload
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.constants import MAIN_URL, MOUNT_PATH
+from backend.src.models.ingredients import (
+    IngredientAmountModel,
+    IngredientModel,
+    RecipeIngredientModel,
+)
+from backend.src.models.recipes import RecipeModel
+from backend.src.models.users import UserModel
+from backend.src.repositories.recipes import ImageRepository, RecipeRepository
+from backend.src.repositories.subscriptions import SubscriptionRepository
+from backend.src.schemas.recipes import RecipeRead
+from backend.src.schemas.users import FollowedUserRead
+from backend.benchmarks.base import (
+    count_queries,
+    measure,
+    print_table,
+    rollback_session,
+    seed_recipes,
+)
+
+
+async def legacy_get_recipe(session, id, current_user):
+    """Получение рецепта в прежнем виде: отдельные запросы и selectinload."""
+    ingredient_list_stmt = (
+        select(
+            IngredientAmountModel.amount,
+            IngredientModel.id,
+            IngredientModel.measurement_unit,
+            IngredientModel.name,
+        )
+        .filter(RecipeIngredientModel.recipe_id == id)
+        .outerjoin(
+            RecipeIngredientModel,
+            IngredientAmountModel.id == RecipeIngredientModel.ingredient_amount_id,
+        )
+        .outerjoin(
+            IngredientModel,
+            IngredientModel.id == IngredientAmountModel.ingredient_id,
+        )
+    )
+    ingredient_list_result = await session.execute(ingredient_list_stmt)
+    ingredient_list_result = ingredient_list_result.unique().mappings().all()
+    recipe_body_stmt = (
+        select(RecipeModel)
+        .filter(RecipeModel.id == id)
+        .options(
+            selectinload(RecipeModel.tags),
+            selectinload(RecipeModel.author_info).load_only(
+                UserModel.username,
+                UserModel.id,
+                UserModel.first_name,
+                UserModel.last_name,
+                UserModel.email,
+                UserModel.recipes_count,
+                UserModel.followers_count,
+                UserModel.following_count,
+            ),
+            selectinload(RecipeModel.is_favorited),
+            selectinload(RecipeModel.is_in_shopping_cart),
+        )
+        .execution_options(populate_existing=True)
+    )
+    recipe_body_result = await session.execute(recipe_body_stmt)
+    recipe_body_result = recipe_body_result.scalars().one()
+    recipe_image = await ImageRepository(session).get_one_or_none(
+        id=recipe_body_result.image
+    )
+    author = FollowedUserRead.model_validate(
+        recipe_body_result.author_info, from_attributes=True
+    )
+    if current_user:
+        subs = await SubscriptionRepository(session).get_one_or_none(
+            author_id=recipe_body_result.author_info.id,
+            subscriber_id=current_user.id,
+        )
+        if subs:
+            author.is_subscribed = True
+    response = RecipeRead(
+        id=recipe_body_result.id,
+        tags=recipe_body_result.tags,
+        author=author,
+        ingredients=ingredient_list_result,
+        name=recipe_body_result.name,
+        image=f"{MAIN_URL}{MOUNT_PATH}/{recipe_image.name}",
+        text=recipe_body_result.text,
+        cooking_time=recipe_body_result.cooking_time,
+        favorites_count=recipe_body_result.favorites_count,
+        shopping_cart_count=recipe_body_result.shopping_cart_count,
+    )
+    if current_user:
+        for elem in recipe_body_result.is_favorited:
+            if elem.user_id == current_user.id:
+                response.is_favorited = True
+        for elem in recipe_body_result.is_in_shopping_cart:
+            if elem.user_id == current_user.id:
+                response.is_in_shopping_cart = True
+    return response
+
+
+async def add_favorites(session, recipe_id, favorites_count):
+    """Добавление рецепта в избранное favorites_count новыми пользователями."""
+    await session.execute(
+        text(
+            'INSERT INTO "user" (email, username, hashed_password, is_active, '
+            "is_superuser, is_verified) "
+            "SELECT 'fan_' || g || '@bench.io', 'fan_' || g, '', true, "
+            "false, true FROM generate_series(1, :favorites_count) g"
+        ),
+        {"favorites_count": favorites_count},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO favoriterecipe (user_id, recipe_id) "
+            "SELECT id, :recipe_id FROM \"user\" WHERE username LIKE 'fan\\_%'"
+        ),
+        {"recipe_id": recipe_id},
+    )
+    await session.execute(text("ANALYZE"))
+
+
+async def run_benchmark(recipes_count: int, favorites_count: int, repeats: int):
+    async with rollback_session() as session:
+        viewer_id = await seed_recipes(session, recipes_count=recipes_count)
+        recipe_id = await session.execute(
+            text("SELECT max(id) FROM recipe WHERE name LIKE 'bench\\_%'")
+        )
+        recipe_id = recipe_id.scalars().one()
+        await add_favorites(session, recipe_id, favorites_count)
+        repository = RecipeRepository(session)
+        rows = list()
+        for title, current_user in (
+            ("аноним", None),
+            ("пользователь", SimpleNamespace(id=viewer_id)),
+        ):
+            paths = {
+                "прежний": lambda: legacy_get_recipe(session, recipe_id, current_user),
+                "json_agg": lambda: repository.get_one_or_none(
+                    id=recipe_id, current_user=current_user
+                ),
+            }
+            results = list()
+            for path, get_recipe in paths.items():
+                with count_queries() as counter:
+                    results.append(await get_recipe())
+                timings = await measure(get_recipe, repeats=repeats)
+                rows.append(
+                    [
+                        title,
+                        path,
+                        counter["queries"],
+                        f"{timings['p50']:.2f}",
+                        f"{timings['p95']:.2f}",
+                    ]
+                )
+            assert results[0] == results[1], "ответы двух путей различаются"
+    print(f"Рецептов: {recipes_count}, в избранном у {favorites_count} пользователей")
+    print_table(["пользователь", "путь", "запросов", "p50, мс", "p95, мс"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--favorites", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    run(run_benchmark(args.recipes, args.favorites, args.repeats))
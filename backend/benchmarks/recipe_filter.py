@@ -0,0 +1,138 @@
+"""Сравнение фильтра рецептов на соединениях и на полусоединениях (EXISTS).
+
+Для каждого набора фильтров выводится число строк, которое порождает
+старый запрос до и после DISTINCT, число строк нового запроса
+и время выполнения обоих по EXPLAIN ANALYZE.
+"""
+
+import argparse
+import sys
+from asyncio import run
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import and_, func, select
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.models.recipes import (
+    FavoriteRecipeModel,
+    RecipeModel,
+    ShoppingCartModel,
+)
+from backend.src.models.subscriptions import SubscriptionModel
+from backend.src.models.tags import RecipeTagModel, TagModel
+from backend.src.models.users import UserModel
+from backend.src.repositories.recipes import RecipeRepository
+from backend.benchmarks.base import (
+    explain_analyze,
+    print_table,
+    rollback_session,
+    seed_recipes,
+)
+
+SCENARIOS = {
+    "без фильтров": {},
+    "один тег": {"tags": ["bench_1"]},
+    "три тега": {"tags": ["bench_1", "bench_2", "bench_3"]},
+    "автор": {"author": True},
+    "избранное и покупки": {"is_favorited": 1, "is_in_shopping_cart": 1},
+}
+
+
+def legacy_filter_stmt(
+    current_user, is_favorited=0, is_in_shopping_cart=0, tags=None, author=None
+):
+    """Фильтр рецептов в прежнем виде: соединения с тегами и подписками."""
+    stmt = (
+        select(RecipeModel.id)
+        .join(UserModel, UserModel.id == RecipeModel.author)
+        .outerjoin(
+            SubscriptionModel,
+            and_(
+                UserModel.id == SubscriptionModel.subscriber_id,
+                RecipeModel.author == SubscriptionModel.author_id,
+            ),
+        )
+        .join(RecipeTagModel, RecipeTagModel.recipe_id == RecipeModel.id)
+        .join(TagModel, TagModel.id == RecipeTagModel.tag_id)
+    )
+    if is_favorited:
+        stmt = stmt.join(
+            FavoriteRecipeModel,
+            and_(
+                FavoriteRecipeModel.recipe_id == RecipeModel.id,
+                FavoriteRecipeModel.user_id == current_user.id,
+            ),
+        )
+    if is_in_shopping_cart:
+        stmt = stmt.join(
+            ShoppingCartModel,
+            and_(
+                ShoppingCartModel.recipe_id == RecipeModel.id,
+                ShoppingCartModel.user_id == current_user.id,
+            ),
+        )
+    if tags:
+        stmt = stmt.filter(TagModel.slug.in_(tags))
+    if author:
+        stmt = stmt.filter(RecipeModel.author == author)
+    return stmt
+
+
+async def count_rows(session, stmt) -> int:
+    count = await session.execute(select(func.count()).select_from(stmt.subquery()))
+    return count.scalars().one()
+
+
+async def run_benchmark(recipes_count: int):
+    async with rollback_session() as session:
+        viewer_id = await seed_recipes(session, recipes_count=recipes_count)
+        current_user = SimpleNamespace(id=viewer_id)
+        repository = RecipeRepository(session)
+        rows = list()
+        for title, filters in SCENARIOS.items():
+            filters = filters | {"current_user": current_user}
+            if filters.get("author"):
+                filters["author"] = viewer_id
+            legacy_stmt = legacy_filter_stmt(**filters)
+            filter_conditions = await repository.get_filter_conditions(
+                is_favorited=filters.get("is_favorited", 0),
+                is_in_shopping_cart=filters.get("is_in_shopping_cart", 0),
+                tags=filters.get("tags"),
+                author=filters.get("author"),
+                current_user=current_user,
+            )
+            new_stmt = select(RecipeModel.id).filter(*filter_conditions)
+            legacy_plan = await explain_analyze(session, legacy_stmt.distinct())
+            new_plan = await explain_analyze(session, new_stmt)
+            rows.append(
+                [
+                    title,
+                    await count_rows(session, legacy_stmt),
+                    await count_rows(session, legacy_stmt.distinct()),
+                    await count_rows(session, new_stmt),
+                    f"{legacy_plan['Execution Time']:.2f}",
+                    f"{new_plan['Execution Time']:.2f}",
+                ]
+            )
+    print(f"Рецептов: {recipes_count}")
+    print_table(
+        [
+            "фильтр",
+            "строк (join)",
+            "строк (join + distinct)",
+            "строк (exists)",
+            "мс (join)",
+            "мс (exists)",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, default=10000)
+    args = parser.parse_args()
+    run(run_benchmark(args.recipes))
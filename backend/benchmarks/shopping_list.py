@@ -0,0 +1,199 @@
+"""Сравнение подсчета списка покупок: прежний запрос с группировкой по
+(ингредиент, количество) и форматированием в Python, один запрос с SUM
+по ингредиенту, сортировкой и форматированием в БД и чтение сохраненных
+сумм из shoppinglisttotal.
+
+Часть рецептов корзины получает те же ингредиенты с другими количествами,
+поэтому прежний запрос возвращает для них несколько строк.
+"""
+
+import argparse
+import sys
+from asyncio import run
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import func, select, text
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.models.ingredients import (
+    IngredientAmountModel,
+    IngredientModel,
+    RecipeIngredientModel,
+)
+from backend.src.models.recipes import ShoppingCartModel
+from backend.src.repositories.shopping_list_totals import ShoppingListTotalRepository
+from backend.benchmarks.base import (
+    explain_analyze,
+    measure,
+    print_table,
+    rollback_session,
+    seed_recipes,
+)
+
+
+def legacy_stmt(user_id):
+    return (
+        select(
+            IngredientModel.name,
+            (func.count(IngredientModel.name) * IngredientAmountModel.amount).label(
+                "total_amount"
+            ),
+            IngredientModel.measurement_unit,
+        )
+        .select_from(RecipeIngredientModel)
+        .group_by(IngredientModel.id, IngredientAmountModel.amount)
+        .filter(ShoppingCartModel.user_id == user_id)
+        .join(
+            ShoppingCartModel,
+            RecipeIngredientModel.recipe_id == ShoppingCartModel.recipe_id,
+        )
+        .join(
+            IngredientAmountModel,
+            IngredientAmountModel.id == (RecipeIngredientModel.ingredient_amount_id),
+        )
+        .join(
+            IngredientModel,
+            IngredientModel.id == IngredientAmountModel.ingredient_id,
+        )
+    )
+
+
+async def legacy_shopping_list(session, user_id):
+    """Список покупок в прежнем виде."""
+    product_list = await session.execute(legacy_stmt(user_id))
+    return [
+        f'{elem["name"].capitalize()} - {elem["total_amount"]} {elem["measurement_unit"]}'
+        for elem in product_list.mappings().all()
+    ]
+
+
+def sum_stmt(user_id):
+    name = func.concat(
+        func.upper(func.left(IngredientModel.name, 1)),
+        func.lower(func.substr(IngredientModel.name, 2)),
+    )
+    return (
+        select(
+            func.concat(
+                name,
+                " - ",
+                func.sum(IngredientAmountModel.amount),
+                " ",
+                IngredientModel.measurement_unit,
+            )
+        )
+        .select_from(ShoppingCartModel)
+        .join(
+            RecipeIngredientModel,
+            RecipeIngredientModel.recipe_id == ShoppingCartModel.recipe_id,
+        )
+        .join(
+            IngredientAmountModel,
+            IngredientAmountModel.id == RecipeIngredientModel.ingredient_amount_id,
+        )
+        .join(
+            IngredientModel, IngredientModel.id == IngredientAmountModel.ingredient_id
+        )
+        .filter(ShoppingCartModel.user_id == user_id)
+        .group_by(IngredientModel.id)
+        .order_by(func.lower(IngredientModel.name), IngredientModel.measurement_unit)
+    )
+
+
+async def sql_shopping_list(session, stmt):
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+async def add_other_amounts(session):
+    """Каждый второй рецепт корзины получает дополнительные количества
+    двух своих ингредиентов."""
+    await session.execute(
+        text(
+            "INSERT INTO ingredientamount (ingredient_id, amount) "
+            "SELECT id, amount FROM ingredient "
+            "CROSS JOIN (VALUES (50), (150)) AS amounts (amount) "
+            "WHERE name LIKE 'bench\\_%'"
+        )
+    )
+    await session.execute(
+        text(
+            "INSERT INTO recipeingredient (ingredient_amount_id, recipe_id) "
+            "SELECT other.id, ri.recipe_id FROM recipeingredient ri "
+            "JOIN ingredientamount ia ON ia.id = ri.ingredient_amount_id "
+            "JOIN ingredientamount other ON other.ingredient_id = ia.ingredient_id "
+            "AND other.amount = 50 + (ri.recipe_id % 2) * 100 "
+            "JOIN recipe r ON r.id = ri.recipe_id "
+            "WHERE r.name LIKE 'bench\\_%' AND r.id % 8 = 0 "
+            "AND ia.ingredient_id % 4 = 0"
+        )
+    )
+    await session.execute(text("ANALYZE"))
+
+
+def totals_by_line(lines):
+    """Суммы по ингредиентам из строк вида "Название - количество единица"."""
+    result = defaultdict(int)
+    for line in lines:
+        name, rest = line.rsplit(" - ", 1)
+        amount, unit = rest.split(" ", 1)
+        result[(name, unit)] += int(amount)
+    return dict(result)
+
+
+async def run_benchmark(recipes_count: int, repeats: int):
+    async with rollback_session() as session:
+        user_id = await seed_recipes(session, recipes_count=recipes_count)
+        await add_other_amounts(session)
+        cart_size = await session.execute(
+            select(func.count()).filter(ShoppingCartModel.user_id == user_id)
+        )
+        cart_size = cart_size.scalars().one()
+        totals = ShoppingListTotalRepository(session)
+        await totals.rebuild(user_id=user_id)
+        paths = {
+            "прежний": (
+                legacy_stmt(user_id),
+                lambda: legacy_shopping_list(session, user_id),
+            ),
+            "SUM в БД": (
+                sum_stmt(user_id),
+                lambda: sql_shopping_list(session, sum_stmt(user_id)),
+            ),
+            "суммы в таблице": (
+                totals.get_list_stmt(user_id),
+                lambda: sql_shopping_list(session, totals.get_list_stmt(user_id)),
+            ),
+        }
+        results = {path: await get_list() for path, (_, get_list) in paths.items()}
+        for lines in results.values():
+            assert totals_by_line(lines) == totals_by_line(
+                results["прежний"]
+            ), "суммы путей различаются"
+        assert results["SUM в БД"] == results["суммы в таблице"]
+        rows = list()
+        for path, (stmt, get_list) in paths.items():
+            plan = await explain_analyze(session, stmt)
+            timings = await measure(get_list, repeats=repeats)
+            rows.append(
+                [
+                    path,
+                    len(results[path]),
+                    f"{plan['Execution Time']:.2f}",
+                    f"{timings['p50']:.2f}",
+                    f"{timings['p95']:.2f}",
+                ]
+            )
+    print(f"Рецептов: {recipes_count}, в корзине: {cart_size}")
+    print_table(["путь", "строк", "БД, мс", "p50, мс", "p95, мс"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    run(run_benchmark(args.recipes, args.repeats))
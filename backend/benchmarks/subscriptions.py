@@ -0,0 +1,161 @@
+"""Сравнение списка подписок и ответа на подписку: прежняя загрузка всех
+рецептов авторов через selectinload со срезом в Python и боковой
+подзапрос с LIMIT recipes_limit и подсчетом рецептов группировкой.
+
+Просматривающий пользователь подписан на всех синтетических авторов,
+ответ на подписку строится для одного из них.
+"""
+
+import argparse
+import sys
+from asyncio import run
+from pathlib import Path
+
+from sqlalchemy import and_, select, text
+from sqlalchemy.orm import load_only
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.models.recipes import RecipeModel
+from backend.src.models.subscriptions import SubscriptionModel
+from backend.src.models.users import UserModel
+from backend.src.repositories.subscriptions import SubscriptionRepository
+from backend.benchmarks.base import (
+    count_queries,
+    measure,
+    print_table,
+    rollback_session,
+    seed_recipes,
+)
+
+
+async def legacy_authors(session, stmt, recipes_limit):
+    """Авторы в прежнем виде: все рецепты каждого автора."""
+    stmt = stmt.options(
+        load_only(UserModel.id)
+        .selectinload(UserModel.recipe)
+        .load_only(RecipeModel.id)
+        .selectinload(RecipeModel.image_info)
+    ).execution_options(populate_existing=True)
+    result = await session.execute(stmt)
+    return {
+        obj.id: (
+            sorted((recipe.id for recipe in obj.recipe), reverse=True)[:recipes_limit],
+            len(obj.recipe),
+        )
+        for obj in result.scalars().all()
+    }
+
+
+def legacy_user_subs_stmt(user_id, limit):
+    return (
+        select(UserModel)
+        .join(
+            SubscriptionModel,
+            and_(
+                SubscriptionModel.author_id == UserModel.id,
+                SubscriptionModel.subscriber_id == user_id,
+            ),
+        )
+        .order_by(SubscriptionModel.id, UserModel.id)
+        .limit(limit)
+    )
+
+
+def by_author(followed_users):
+    return {
+        obj.id: ([recipe.id for recipe in obj.recipes], obj.recipes_count)
+        for obj in followed_users
+    }
+
+
+async def lateral_user_subs(repository, user_id, limit, recipes_limit):
+    response = await repository.get_user_subs(
+        user_id=user_id,
+        offset=0,
+        limit=limit,
+        page=1,
+        recipes_limit=recipes_limit,
+        router_prefix="/api/users/subscriptions",
+    )
+    return by_author(response.results)
+
+
+async def lateral_author(repository, author_id, recipes_limit):
+    author = await repository.session.execute(
+        select(*repository.followed_user_columns).filter(UserModel.id == author_id)
+    )
+    followed_users = await repository._followed_users(
+        authors=author.all(), recipes_limit=recipes_limit
+    )
+    return by_author(followed_users)
+
+
+async def run_benchmark(recipes_count: int, limit: int, recipes_limit: int, repeats):
+    async with rollback_session() as session:
+        viewer_id = await seed_recipes(session, recipes_count=recipes_count)
+        await session.execute(
+            text(
+                "INSERT INTO subscription (author_id, subscriber_id) "
+                'SELECT id, :viewer_id FROM "user" '
+                "WHERE username LIKE 'bench\\_%' AND id <> :viewer_id"
+            ),
+            {"viewer_id": viewer_id},
+        )
+        await session.execute(text("ANALYZE"))
+        author_id = await session.execute(
+            text("SELECT max(id) FROM \"user\" WHERE username LIKE 'bench\\_%'")
+        )
+        author_id = author_id.scalars().one()
+        repository = SubscriptionRepository(session)
+        cases = {
+            "список подписок": {
+                "прежний": lambda: legacy_authors(
+                    session, legacy_user_subs_stmt(viewer_id, limit), recipes_limit
+                ),
+                "LATERAL": lambda: lateral_user_subs(
+                    repository, viewer_id, limit, recipes_limit
+                ),
+            },
+            "подписка": {
+                "прежний": lambda: legacy_authors(
+                    session,
+                    select(UserModel).filter(UserModel.id == author_id),
+                    recipes_limit,
+                ),
+                "LATERAL": lambda: lateral_author(repository, author_id, recipes_limit),
+            },
+        }
+        rows = list()
+        for case, paths in cases.items():
+            results = list()
+            for path, get_authors in paths.items():
+                with count_queries() as counter:
+                    results.append(await get_authors())
+                timings = await measure(get_authors, repeats=repeats)
+                rows.append(
+                    [
+                        case,
+                        path,
+                        counter["queries"],
+                        f"{timings['p50']:.2f}",
+                        f"{timings['p95']:.2f}",
+                    ]
+                )
+            assert results[0] == results[1], "ответы двух путей различаются"
+    print(
+        f"Рецептов: {recipes_count}, авторов на странице: {limit}, "
+        f"recipes_limit: {recipes_limit}"
+    )
+    print_table(["запрос", "путь", "запросов", "p50, мс", "p95, мс"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=6)
+    parser.add_argument("--recipes-limit", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+    run(run_benchmark(args.recipes, args.limit, args.recipes_limit, args.repeats))
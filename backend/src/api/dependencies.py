@@ -3,12 +3,25 @@ from typing import Annotated
 from fastapi import Depends, Request, HTTPException
 from starlette import status
 
+from backend.src.config import settings
+from backend.src.constants import SUPERUSER_ROLE, VERIFIED_TOKEN_CACHE_TTL
 from backend.src.db import async_session_maker
 from backend.src.db_manager import DBManager
-from backend.src.exceptions.users import IncorrectTokenException, ExpiredTokenException
+from backend.src.exceptions.users import (
+    IncorrectTokenException,
+    ExpiredTokenException,
+    RevokedTokenException,
+)
 from backend.src.models.users import UserModel
 from backend.src.repositories.utils.users import decode_token
 from backend.src.schemas.users import UserReadWithRole
+from backend.src.utils.token_cache import VerifiedTokenCache
+from backend.src.utils.token_revocation import TokenRevocationList
+
+verified_tokens = VerifiedTokenCache(
+    max_size=settings.VERIFIED_TOKEN_CACHE_SIZE, ttl=VERIFIED_TOKEN_CACHE_TTL
+)
+token_revocation = TokenRevocationList()
 
 
 async def get_db():
@@ -29,37 +42,54 @@ def get_token(request: Request) -> str:
     return token.split(" ")[1]
 
 
-def get_current_user(token: str = Depends(get_token)):
+def verify_token(token: str) -> UserReadWithRole:
+    """Пользователь из JWT токена, подпись проверяется один раз за время
+    жизни токена в кэше."""
+    user = verified_tokens.get(token)
+    if user is not None:
+        return user
     try:
         data = decode_token(token)
     except IncorrectTokenException as ex:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     except ExpiredTokenException as ex:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=ex.detail)
-    return UserReadWithRole.model_validate(data, from_attributes=True)
+    user = UserReadWithRole(
+        id=int(data["sub"]),
+        is_superuser=data["role"] == SUPERUSER_ROLE,
+        token_id=data["jti"],
+        token_expire=data["exp"],
+    )
+    verified_tokens.set(token, user, expire=data["exp"])
+    return user
+
+
+async def get_current_user(token: str = Depends(get_token)):
+    user = verify_token(token)
+    if await token_revocation.is_revoked(user.token_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=RevokedTokenException.detail,
+        )
+    return user
 
 
 UserDep = Annotated[UserModel, Depends(get_current_user)]
 
 
-def get_current_user_optional(request: Request):
+async def get_current_user_optional(request: Request):
     token = request.headers.get("Authorization", None)
     if token:
-        return get_current_user(token.split(" ")[1])
+        return await get_current_user(token.split(" ")[1])
 
 
 OptionalUserDep = Annotated[UserModel, Depends(get_current_user_optional)]
 
 
-def get_current_superuser(token: str = Depends(get_token)):
-    try:
-        data = decode_token(token)
-    except IncorrectTokenException as ex:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
-    except ExpiredTokenException as ex:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=ex.detail)
-    if data["is_superuser"]:
-        return UserReadWithRole.model_validate(data, from_attributes=True)
+async def get_current_superuser(token: str = Depends(get_token)):
+    user = await get_current_user(token)
+    if user.is_superuser:
+        return user
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
         detail="Доступно только администраторам",
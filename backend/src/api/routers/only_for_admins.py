@@ -6,6 +6,7 @@ from backend.src.exceptions.base import ObjectNotFoundException
 from backend.src.schemas.ingredients import IngredientCreate, IngredientRead
 from backend.src.schemas.tags import TagCreate, TagRead
 from backend.src.services.only_for_admins import OnlyForAdminService
+from backend.src.setup import password_manager, shopping_list_renderer
 
 router = APIRouter(
     prefix="/api/only-for-admins",
@@ -55,3 +56,19 @@ async def delete_ingredient(db: DBDep, id: int) -> None:
         await OnlyForAdminService(db).delete_ingredient(id=id)
     except ObjectNotFoundException as ex:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=ex.detail)
+
+
+@router.get(
+    "/metrics/shopping-list-pdf",
+    summary="Метрики создания списков покупок в pdf",
+)
+async def get_shopping_list_pdf_metrics() -> dict:
+    return shopping_list_renderer.metrics.snapshot()
+
+
+@router.get(
+    "/metrics/password-hashing",
+    summary="Метрики хеширования и проверки паролей",
+)
+async def get_password_hashing_metrics() -> dict:
+    return password_manager.metrics.snapshot()
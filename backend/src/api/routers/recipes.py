@@ -1,3 +1,5 @@
+from typing import Literal
+
 from fastapi import APIRouter, Body, HTTPException, Query, status
 from loguru import logger
 from starlette.requests import Request
@@ -5,27 +7,39 @@ from starlette.status import HTTP_400_BAD_REQUEST
 
 from backend.src import constants
 from backend.src.api.dependencies import DBDep, UserDep, OptionalUserDep
+from backend.src.exceptions.base import InvalidCursorException
 from backend.src.exceptions.ingredients import IngredientNotFoundException
 from backend.src.exceptions.recipes import (
+    ImageTooLargeException,
+    InvalidImageException,
+    InvalidRecipeFormException,
     MainDataRecipeAtModifyingException,
+    UnsupportedImageTypeException,
     RecipeNotFoundException,
     OnlyAuthorCanEditRecipeException,
     RecipeAlreadyIsInShoppingListException,
     RecipeAlreadyIsFavoritedException,
     RecipeNotInShoppingListException,
     RecipeNotFavoritedException,
+    ShoppingListRenderException,
+    ShoppingListRendererBusyException,
 )
 from backend.src.exceptions.tags import TagNotFoundException
 from backend.src.logs.foodgram_logger import api_success_log, api_exception_log
 from backend.src.schemas.recipes import (
     RecipeCreateRequest,
+    RecipeCreateUpdateBaseRequest,
     RecipeUpdateRequest,
     RecipeRead,
     RecipeListRead,
     FavoriteRecipeRead,
+    RecipeBulkResultRead,
+    RecipeIdsRequest,
     ShoppingCartRecipeRead,
 )
 from backend.src.services.recipes import RecipeService
+from backend.src.setup import media_io
+from backend.src.utils.image_upload import RecipeFormParser
 
 ROUTER_PREFIX = "/api/recipes"
 recipe_router = APIRouter(
@@ -55,21 +69,36 @@ async def get_recipe_list(
     is_in_shopping_cart: int = Query(default=0),
     page: int | None = Query(default=None, title="Номер страницы"),
     limit: int | None = Query(default=None, title="Количество объектов на странице."),
+    cursor: str | None = Query(
+        default=None,
+        title="Курсор страницы",
+        description=(
+            "Включает постраничный вывод по курсору. Для первой страницы "
+            "передается пустое значение, для следующих - значение из ссылки next. "
+            "Поле count заполняется только на первой странице, на следующих "
+            "оно равно null."
+        ),
+    ),
 ) -> RecipeListRead | None:
     if not limit:
         limit = constants.PAGINATION_LIMIT
     if not page:
         page = 1
-    response = await RecipeService(db).get_recipe_list(
-        current_user=current_user,
-        is_favorited=is_favorited,
-        is_in_shopping_cart=is_in_shopping_cart,
-        tags=tags,
-        author=author,
-        limit=limit,
-        page=page,
-        router_prefix=ROUTER_PREFIX,
-    )
+    try:
+        response = await RecipeService(db).get_recipe_list(
+            current_user=current_user,
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            tags=tags,
+            author=author,
+            limit=limit,
+            page=page,
+            router_prefix=ROUTER_PREFIX,
+            cursor=cursor,
+        )
+    except InvalidCursorException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     logger.info(api_success_log(user=current_user, request=request.url))
     return response
 
@@ -104,6 +133,13 @@ async def create_recipe(
     except MainDataRecipeAtModifyingException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
+    except (
+        InvalidImageException,
+        UnsupportedImageTypeException,
+        ImageTooLargeException,
+    ) as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     except TagNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
@@ -111,7 +147,7 @@ async def create_recipe(
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     logger.info(
-        f"Пользователь {current_user.email} успешно создал рецепт {response.id}"
+        f"Пользователь с id {current_user.id} успешно создал рецепт {response.id}"
     )
     return response
 
@@ -141,6 +177,13 @@ async def update_recipe(
     except MainDataRecipeAtModifyingException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
+    except (
+        InvalidImageException,
+        UnsupportedImageTypeException,
+        ImageTooLargeException,
+    ) as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     except TagNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
@@ -150,7 +193,7 @@ async def update_recipe(
     except RecipeNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
-    logger.info(f"Пользователь {current_user.email} успешно обновил рецепт {id}")
+    logger.info(f"Пользователь с id {current_user.id} успешно обновил рецепт {id}")
     return response
 
 
@@ -173,7 +216,141 @@ async def delete_recipe(
     except RecipeNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
-    logger.info(f"Пользователь {current_user.email} успешно удалил рецепт {id}")
+    logger.info(f"Пользователь с id {current_user.id} успешно удалил рецепт {id}")
+    return response
+
+
+RECIPE_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "text": {"type": "string"},
+                        "cooking_time": {"type": "integer"},
+                        "tags": {"type": "array", "items": {"type": "integer"}},
+                        "ingredients": {
+                            "type": "string",
+                            "description": 'JSON-список, например [{"id": 1, "amount": 100}]',
+                        },
+                        "image": {"type": "string", "format": "binary"},
+                    },
+                    "required": ["name", "text", "cooking_time"],
+                }
+            }
+        },
+    }
+}
+
+
+@recipe_router.post(
+    "/upload",
+    status_code=status.HTTP_201_CREATED,
+    summary="Создание рецепта с загрузкой картинки файлом",
+    description=(
+        "Доступно только авторизованному пользователю. Картинка передается "
+        "файлом в теле multipart/form-data и записывается на диск по частям."
+    ),
+    openapi_extra=RECIPE_FORM_OPENAPI,
+)
+async def create_recipe_with_upload(
+    request: Request,
+    db: DBDep,
+    current_user: UserDep,
+):
+    form_parser = RecipeFormParser(request, media_io=media_io)
+    try:
+        await form_parser.parse()
+        if form_parser.image is None:
+            raise MainDataRecipeAtModifyingException
+        response = await RecipeService(db).create_recipe(
+            current_user=current_user,
+            recipe_data=form_parser.to_schema(RecipeCreateUpdateBaseRequest),
+            image_upload=form_parser.image,
+        )
+    except ImageTooLargeException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=ex.detail
+        )
+    except UnsupportedImageTypeException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=ex.detail
+        )
+    except (
+        InvalidImageException,
+        InvalidRecipeFormException,
+        MainDataRecipeAtModifyingException,
+        TagNotFoundException,
+        IngredientNotFoundException,
+    ) as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
+    finally:
+        if form_parser.image is not None:
+            form_parser.image.discard()
+    logger.info(
+        f"Пользователь с id {current_user.id} успешно создал рецепт {response.id}"
+    )
+    return response
+
+
+@recipe_router.patch(
+    "/{id}/upload",
+    status_code=status.HTTP_200_OK,
+    summary="Обновление рецепта с загрузкой картинки файлом",
+    description=(
+        "Доступно только автору данного рецепта. Новая картинка передается "
+        "файлом в теле multipart/form-data, поле image необязательно."
+    ),
+    openapi_extra=RECIPE_FORM_OPENAPI,
+)
+async def update_recipe_with_upload(
+    request: Request,
+    db: DBDep,
+    current_user: UserDep,
+    id: int,
+) -> RecipeRead:
+    form_parser = RecipeFormParser(request, media_io=media_io)
+    try:
+        await form_parser.parse()
+        response = await RecipeService(db).update_recipe(
+            current_user=current_user,
+            id=id,
+            recipe_data=form_parser.to_schema(RecipeUpdateRequest),
+            image_upload=form_parser.image,
+        )
+    except OnlyAuthorCanEditRecipeException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=ex.detail)
+    except ImageTooLargeException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=ex.detail
+        )
+    except UnsupportedImageTypeException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=ex.detail
+        )
+    except (
+        InvalidImageException,
+        InvalidRecipeFormException,
+        MainDataRecipeAtModifyingException,
+        TagNotFoundException,
+        IngredientNotFoundException,
+        RecipeNotFoundException,
+    ) as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
+    finally:
+        if form_parser.image is not None:
+            form_parser.image.discard()
+    logger.info(f"Пользователь с id {current_user.id} успешно обновил рецепт {id}")
     return response
 
 
@@ -207,7 +384,7 @@ async def make_recipe_favorite(
     except RecipeNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
-    logger.info(f"Пользователь {current_user.email} добавил рецепт {id} в избранное")
+    logger.info(f"Пользователь с id {current_user.id} добавил рецепт {id} в избранное")
     return response
 
 
@@ -226,13 +403,61 @@ async def cancel_favorite_recipe(
     try:
         await RecipeService(db).cancel_favorite_recipe(id=id, current_user=current_user)
         logger.info(
-            f"Пользователь {current_user.email} удалил рецепт {id} из избранного"
+            f"Пользователь с id {current_user.id} удалил рецепт {id} из избранного"
         )
     except RecipeNotFavoritedException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
 
 
+@favorite_recipe_router.post(
+    "/favorite",
+    summary="Добавить рецепты в избранное",
+    description=(
+        "Добавление нескольких рецептов одним запросом. Для каждого id "
+        "возвращается статус: added, already_added или not_found."
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def add_recipes_to_favorites(
+    db: DBDep,
+    current_user: UserDep,
+    recipe_ids: RecipeIdsRequest,
+) -> list[RecipeBulkResultRead]:
+    response = await RecipeService(db).add_recipes_to_favorites(
+        ids=recipe_ids.ids, current_user=current_user
+    )
+    logger.info(
+        f"Пользователь с id {current_user.id} добавил рецепты {recipe_ids.ids} "
+        "в избранное"
+    )
+    return response
+
+
+@favorite_recipe_router.delete(
+    "/favorite",
+    summary="Удалить рецепты из избранного",
+    description=(
+        "Удаление нескольких рецептов одним запросом. Для каждого id "
+        "возвращается статус: removed или not_found."
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def remove_recipes_from_favorites(
+    db: DBDep,
+    current_user: UserDep,
+    recipe_ids: RecipeIdsRequest,
+) -> list[RecipeBulkResultRead]:
+    response = await RecipeService(db).remove_recipes_from_favorites(
+        ids=recipe_ids.ids, current_user=current_user
+    )
+    logger.info(
+        f"Пользователь с id {current_user.id} удалил рецепты {recipe_ids.ids} "
+        "из избранного"
+    )
+    return response
+
+
 shopping_cart_router = APIRouter(
     prefix=ROUTER_PREFIX,
     tags=[
@@ -245,11 +470,36 @@ shopping_cart_router = APIRouter(
     "/download_shopping_cart",
     status_code=status.HTTP_200_OK,
     summary="Скачать список покупок",
-    description="Скачать файл со списком покупок.",
+    description="Скачать файл со списком покупок в формате pdf, csv или txt.",
 )
-async def download_shopping_cart(db: DBDep, current_user: UserDep):
-    logger.info(f"Пользователь {current_user.email} сгенерировал список покупок")
-    return await RecipeService(db).download_shopping_cart(current_user=current_user)
+async def download_shopping_cart(
+    request: Request,
+    db: DBDep,
+    current_user: UserDep,
+    format: Literal["pdf", "csv", "txt"] = Query(
+        default="pdf", title="Формат списка покупок"
+    ),
+):
+    try:
+        response = await RecipeService(db).download_shopping_cart(
+            current_user=current_user,
+            format=format,
+            if_none_match=request.headers.get("if-none-match"),
+        )
+    except ShoppingListRendererBusyException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ex.detail,
+            headers={"Retry-After": str(constants.PDF_RENDER_RETRY_AFTER)},
+        )
+    except ShoppingListRenderException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=ex.detail
+        )
+    logger.info(f"Пользователь с id {current_user.id} сгенерировал список покупок")
+    return response
 
 
 @shopping_cart_router.post(
@@ -275,7 +525,7 @@ async def add_recipe_to_shopping_cart(
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
     logger.info(
-        f"Пользователь {current_user.email} добавил рецепт {id} в список покупок"
+        f"Пользователь с id {current_user.id} добавил рецепт {id} в список покупок"
     )
     return response
 
@@ -297,8 +547,76 @@ async def remove_recipe_from_shopping_cart(
             id=id, current_user=current_user
         )
         logger.info(
-            f"Пользователь {current_user.email} удалил рецепт {id} из списка покупок"
+            f"Пользователь с id {current_user.id} удалил рецепт {id} из списка покупок"
         )
     except RecipeNotInShoppingListException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
+
+
+@shopping_cart_router.post(
+    "/shopping_cart",
+    summary="Добавить рецепты в список покупок",
+    description=(
+        "Добавление нескольких рецептов одним запросом. Для каждого id "
+        "возвращается статус: added, already_added или not_found."
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def add_recipes_to_shopping_cart(
+    db: DBDep,
+    current_user: UserDep,
+    recipe_ids: RecipeIdsRequest,
+) -> list[RecipeBulkResultRead]:
+    response = await RecipeService(db).add_recipes_to_shopping_cart(
+        ids=recipe_ids.ids, current_user=current_user
+    )
+    logger.info(
+        f"Пользователь с id {current_user.id} добавил рецепты {recipe_ids.ids} "
+        "в список покупок"
+    )
+    return response
+
+
+@shopping_cart_router.delete(
+    "/shopping_cart",
+    summary="Удалить рецепты из списка покупок",
+    description=(
+        "Удаление нескольких рецептов одним запросом. Для каждого id "
+        "возвращается статус: removed или not_found."
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def remove_recipes_from_shopping_cart(
+    db: DBDep,
+    current_user: UserDep,
+    recipe_ids: RecipeIdsRequest,
+) -> list[RecipeBulkResultRead]:
+    response = await RecipeService(db).remove_recipes_from_shopping_cart(
+        ids=recipe_ids.ids, current_user=current_user
+    )
+    logger.info(
+        f"Пользователь с id {current_user.id} удалил рецепты {recipe_ids.ids} "
+        "из списка покупок"
+    )
+    return response
+
+
+@shopping_cart_router.post(
+    "/shopping_cart/from_favorites",
+    summary="Добавить все избранные рецепты в список покупок",
+    description="Доступно только авторизованным пользователям",
+    status_code=status.HTTP_200_OK,
+)
+async def add_favorites_to_shopping_cart(
+    db: DBDep,
+    current_user: UserDep,
+) -> list[RecipeBulkResultRead]:
+    response = await RecipeService(db).add_favorites_to_shopping_cart(
+        current_user=current_user
+    )
+    logger.info(
+        f"Пользователь с id {current_user.id} добавил избранные рецепты "
+        "в список покупок"
+    )
+    return response
@@ -5,6 +5,7 @@ from loguru import logger
 from starlette.requests import Request
 
 from backend.src.api.dependencies import DBDep, UserDep
+from backend.src.exceptions.base import InvalidCursorException
 from backend.src.exceptions.subscriptions import (
     UniqueConstraintSubscriptionException,
     FollowingYourselfException,
@@ -38,14 +39,29 @@ async def get_my_subscriptions(
     recipes_limit: int | None = Query(
         default=None, title="Количество объектов внутри поля recipes."
     ),
+    cursor: str | None = Query(
+        default=None,
+        title="Курсор страницы",
+        description=(
+            "Включает постраничный вывод по курсору. Для первой страницы "
+            "передается пустое значение, для следующих - значение из ссылки next. "
+            "Поле count заполняется только на первой странице, на следующих "
+            "оно равно null."
+        ),
+    ),
 ) -> SubscriptionListRead | None:
-    response = await SubscriptionService(db).get_my_subscriptions(
-        current_user=current_user,
-        router_prefix=ROUTER_PREFIX,
-        page=page,
-        limit=limit,
-        recipes_limit=recipes_limit,
-    )
+    try:
+        response = await SubscriptionService(db).get_my_subscriptions(
+            current_user=current_user,
+            router_prefix=ROUTER_PREFIX,
+            page=page,
+            limit=limit,
+            recipes_limit=recipes_limit,
+            cursor=cursor,
+        )
+    except InvalidCursorException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
     logger.info(api_success_log(user=current_user, request=request.url))
     return response
 
@@ -77,7 +93,7 @@ async def subscribe(
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=ex.detail)
     logger.info(
-        f"Пользователь {current_user.email} успешно подписался на пользователя {subscription.email}"
+        f"Пользователь с id {current_user.id} успешно подписался на пользователя {subscription.email}"
     )
     return subscription
 
@@ -96,7 +112,7 @@ async def unsubscribe(
             user_id=user_id, current_user=current_user
         )
         logger.info(
-            f"Пользователь {current_user.email} успешно отписался от пользователя с id {user_id}"
+            f"Пользователь с id {current_user.id} успешно отписался от пользователя с id {user_id}"
         )
     except SubscriptionNotFoundException as ex:
         logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
@@ -2,10 +2,18 @@ from fastapi import APIRouter, Query, status, HTTPException, Response, Request
 from loguru import logger
 from starlette.status import HTTP_404_NOT_FOUND, HTTP_400_BAD_REQUEST
 
-from backend.src.api.dependencies import DBDep, UserDep, OptionalUserDep
+from backend.src.api.dependencies import (
+    DBDep,
+    UserDep,
+    OptionalUserDep,
+    token_revocation,
+)
+from backend.src.constants import PASSWORD_HASH_RETRY_AFTER
+from backend.src.exceptions.base import InvalidCursorException
 from backend.src.exceptions.users import (
     IncorrectPasswordException,
     IncorrectTokenException,
+    PasswordHasherBusyException,
     UserNotFoundException,
     UserAlreadyExistsException,
 )
@@ -46,10 +54,28 @@ async def get_user_list(
     current_user: OptionalUserDep,
     page: int | None = Query(default=None, title="Номер страницы"),
     limit: int | None = Query(default=None, title="Количество объектов на странице"),
+    cursor: str | None = Query(
+        default=None,
+        title="Курсор страницы",
+        description=(
+            "Включает постраничный вывод по курсору. Для первой страницы "
+            "передается пустое значение, для следующих - значение из ссылки next. "
+            "Поле count заполняется только на первой странице, на следующих "
+            "оно равно null."
+        ),
+    ),
 ) -> UserListRead:
-    response = await UserService(db).get_user_list(
-        current_user=current_user, router_prefix=ROUTER_PREFIX, page=page, limit=limit
-    )
+    try:
+        response = await UserService(db).get_user_list(
+            current_user=current_user,
+            router_prefix=ROUTER_PREFIX,
+            page=page,
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidCursorException as ex:
+        logger.warning(api_exception_log(user=current_user, request=request.url, ex=ex))
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
     logger.info(api_success_log(user=current_user, request=request.url))
     return response
 
@@ -97,6 +123,13 @@ async def create_new_user(
     except UserAlreadyExistsException as ex:
         logger.warning(f"При создать пользователя возникла ошибка: {ex.detail}")
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
+    except PasswordHasherBusyException as ex:
+        logger.warning(f"При создании пользователя возникла ошибка: {ex.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ex.detail,
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
     logger.info(f"Пользователь {response.username} успешно создан")
     return response
 
@@ -120,6 +153,15 @@ async def login_user(
             f"При попытке аутентификации пользователя {data.email} был введен неверный пароль"
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
+    except PasswordHasherBusyException as ex:
+        logger.warning(
+            f"Ошибка при аутентификации пользователя {data.email}: {ex.detail}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ex.detail,
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
     logger.info(f"Пользователь {data.email} успешно аутентифицировался")
     return {"auth_token": access_token}
 
@@ -132,10 +174,11 @@ async def login_user(
 async def logout(response: Response, user: UserDep):
     try:
         response.delete_cookie("auth_token")
-        logger.info(f"Пользователь {user.email} вышел из системы")
+        await token_revocation.revoke(user.token_id, user.token_expire)
+        logger.info(f"Пользователь с id {user.id} вышел из системы")
     except IncorrectTokenException as ex:
         logger.warning(
-            f"Ошибка при выходе из системы пользователя {user.email}, текст ошибки: {ex.detail}"
+            f"Ошибка при выходе из системы пользователя с id {user.id}, текст ошибки: {ex.detail}"
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ex.detail)
 
@@ -155,7 +198,16 @@ async def change_password(
         )
     except IncorrectPasswordException as ex:
         logger.warning(
-            f"Ошибка при смене пароль у пользователя {current_user.email}, текст ошибки: {ex.detail}"
+            f"Ошибка при смене пароль у пользователя с id {current_user.id}, текст ошибки: {ex.detail}"
         )
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ex.detail)
-    logger.info(f"Пользователь {current_user.email} успешно сменил пароль")
+    except PasswordHasherBusyException as ex:
+        logger.warning(
+            f"Ошибка при смене пароля у пользователя с id {current_user.id}: {ex.detail}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ex.detail,
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+    logger.info(f"Пользователь с id {current_user.id} успешно сменил пароль")
@@ -15,6 +15,12 @@ class Settings(BaseSettings):
     REDIS_PORT: int
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     ALGORITHM: str
+    MEDIA_IO_CONCURRENCY: int = 4
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_CONCURRENCY: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    VERIFIED_TOKEN_CACHE_SIZE: int = 1024
+    TOKEN_REVOCATION_ENABLED: bool = False
 
     @property
     def DB_URL(self) -> str:
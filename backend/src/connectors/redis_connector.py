@@ -21,9 +21,38 @@ class RedisManager:
     async def get(self, key: str):
         return await self.redis.get(key)
 
+    async def mget(self, *keys: str):
+        return await self.redis.mget(*keys)
+
+    async def incr(self, key: str):
+        return await self.redis.incr(key)
+
     async def delete(self, key: str):
         return await self.redis.delete(key)
 
+    async def delete_by_pattern(self, pattern: str):
+        async for key in self.redis.scan_iter(match=pattern):
+            await self.redis.delete(key)
+
+    async def smismember(self, key: str, *members) -> list[bool]:
+        result = await self.redis.smismember(key, members)
+        return [bool(flag) for flag in result]
+
+    async def replace_set(self, key: str, *members, expire: int = None):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.sadd(key, *members)
+            if expire:
+                pipe.expire(key, expire)
+            await pipe.execute()
+
+    async def eval(self, script: str, keys: list[str], *args):
+        return await self.redis.eval(script, len(keys), *keys, *args)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.redis is not None
+
     async def close(self):
         if self.redis:
             await self.redis.close()
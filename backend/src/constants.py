@@ -6,3 +6,32 @@ PARAMS_MAX_LENGTH = 200
 USER_PARAMS_MAX_LENGTH = 150
 MOUNT_PATH = "/media/recipes/images"
 MAX_EMAIL_LENGTH = 254
+DB_INTEGER_MIN = -(2**31)
+DB_INTEGER_MAX = 2**31 - 1
+RECIPE_CACHE_VERSION = 3
+RECIPE_CACHE_EXPIRE = 60 * 60 * 24
+SUBSCRIPTION_CACHE_VERSION = 2
+SUBSCRIPTION_CACHE_EXPIRE = 60 * 60
+USER_COUNT_CACHE_EXPIRE = 60 * 5
+IMAGE_HASH_LENGTH = 64
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_FORM_FIELDS_MAX_SIZE = 64 * 1024
+UPLOAD_TMP_MAX_AGE = 60 * 60
+RECIPE_BULK_MAX_SIZE = 100
+IMAGE_DERIVATIVE_SIZES = {"thumbnail": 150, "card": 300, "full": 1200}
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = 2
+WKHTMLTOPDF_PATH = "/usr/bin/wkhtmltopdf"
+PDF_RENDER_CONCURRENCY = 2
+PDF_RENDER_QUEUE_SIZE = 8
+PDF_RENDER_TIMEOUT = 30
+PDF_RENDER_RETRY_AFTER = 5
+PASSWORD_HASH_RETRY_AFTER = 1
+USER_ROLE = "user"
+SUPERUSER_ROLE = "admin"
+VERIFIED_TOKEN_CACHE_TTL = 60
+TOKEN_REVOCATION_BATCH_DELAY = 0.002
+SHOPPING_LIST_CACHE_MAX_BYTES = 100 * 1024 * 1024
+SHOPPING_LIST_CACHE_TTL = 60 * 60 * 24
+SHOPPING_LIST_CACHE_CLEANUP_INTERVAL = 60 * 10
+COUNTERS_RECONCILE_ATTEMPTS = 5
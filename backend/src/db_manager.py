@@ -1,3 +1,4 @@
+from backend.src.repositories.counters import CounterRepository
 from backend.src.repositories.ingredients import (
     IngredientAmountRepository,
     IngredientRepository,
@@ -9,6 +10,13 @@ from backend.src.repositories.tags import RecipeTagRepository, TagRepository
 from backend.src.repositories.users import UserRepository
 from backend.src.repositories.favorite_recipes import FavoriteRecipeRepository
 from backend.src.repositories.shopping_cart import ShoppingCartRepository
+from backend.src.repositories.shopping_list_totals import (
+    ShoppingListTotalRepository,
+)
+from backend.src.repositories.utils.transaction_hooks import (
+    run_after_commit,
+    run_after_rollback,
+)
 
 
 class DBManager:
@@ -28,11 +36,17 @@ class DBManager:
         self.images = ImageRepository(self.session)
         self.favorite_recipes = FavoriteRecipeRepository(self.session)
         self.shopping_cart = ShoppingCartRepository(self.session)
+        self.shopping_list_totals = ShoppingListTotalRepository(self.session)
+        self.counters = CounterRepository(self.session)
         return self
 
     async def __aexit__(self, *args):
         await self.session.rollback()
+        await run_after_rollback(self.session)
         await self.session.close()
 
     async def commit(self):
+        """Фиксация транзакции и запуск отложенных до нее действий,
+        например записи файлов картинок."""
         await self.session.commit()
+        await run_after_commit(self.session)
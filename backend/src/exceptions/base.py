@@ -11,3 +11,7 @@ class ObjectAlreadyExistsException(FoodgramBaseException):
 
 class ObjectNotFoundException(FoodgramBaseException):
     detail = "Объект не найден"
+
+
+class InvalidCursorException(FoodgramBaseException):
+    detail = "Некорректное значение параметра cursor"
@@ -27,3 +27,27 @@ class RecipeNotFavoritedException(FoodgramBaseException):
 
 class RecipeNotInShoppingListException(FoodgramBaseException):
     detail = "Рецепт не найден в списке покупок"
+
+
+class ImageTooLargeException(FoodgramBaseException):
+    detail = "Размер картинки превышает допустимый."
+
+
+class UnsupportedImageTypeException(FoodgramBaseException):
+    detail = "Допустимые форматы картинки: png, jpeg, gif, webp."
+
+
+class InvalidImageException(FoodgramBaseException):
+    detail = "Неверный формат картинки"
+
+
+class InvalidRecipeFormException(FoodgramBaseException):
+    detail = "Некорректное тело запроса multipart/form-data."
+
+
+class ShoppingListRendererBusyException(FoodgramBaseException):
+    detail = "Сервис создания списков покупок перегружен, повторите запрос позже."
+
+
+class ShoppingListRenderException(FoodgramBaseException):
+    detail = "Не удалось создать список покупок."
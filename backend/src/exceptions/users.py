@@ -21,6 +21,10 @@ class ExpiredTokenException(FoodgramBaseException):
     detail = "Необходимо авторизоваться"
 
 
+class RevokedTokenException(FoodgramBaseException):
+    detail = "Токен отозван, необходимо авторизоваться"
+
+
 class OnlyForAdminException(FoodgramBaseException):
     detail = "Доступно только администраторам"
 
@@ -31,3 +35,7 @@ class UserAlreadyExistsException(FoodgramBaseException):
 
 class AuthRequiredException(IncorrectTokenException):
     pass
+
+
+class PasswordHasherBusyException(FoodgramBaseException):
+    detail = "Сервис проверки паролей перегружен, повторите запрос позже."
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from contextlib import asynccontextmanager
@@ -27,7 +28,16 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from backend.src.constants import MAX_EMAIL_LENGTH
-from backend.src.setup import redis_manager
+from backend.src.constants import SHOPPING_LIST_CACHE_CLEANUP_INTERVAL
+from backend.src.setup import (
+    image_derivatives,
+    media_io,
+    password_manager,
+    redis_manager,
+    shopping_list_cache,
+)
+from backend.src.utils.image_upload import remove_stale_uploads
+from backend.src.utils.pdf_shopping_list import remove_legacy_shopping_lists
 
 
 origins = [
@@ -40,8 +50,21 @@ origins = [
 async def lifespan(app: FastAPI):
     await redis_manager.connect()
     FastAPICache.init(RedisBackend(redis_manager.redis), prefix="fastapi-cache")
+    stale_uploads = await media_io.run(remove_stale_uploads)
+    if stale_uploads:
+        logger.info(f"Удалено незавершенных загрузок картинок: {stale_uploads}")
+    legacy_shopping_lists = await media_io.run(remove_legacy_shopping_lists)
+    if legacy_shopping_lists:
+        logger.info(f"Удалено старых списков покупок: {legacy_shopping_lists}")
+    cache_janitor = asyncio.create_task(
+        shopping_list_cache.run_janitor(SHOPPING_LIST_CACHE_CLEANUP_INTERVAL)
+    )
     yield
+    cache_janitor.cancel()
     await redis_manager.close()
+    image_derivatives.shutdown()
+    media_io.shutdown()
+    password_manager.shutdown()
 
 
 app = FastAPI(lifespan=lifespan, dependencies=logging_configuration())
@@ -0,0 +1,55 @@
+"""unique ingredient amount
+
+Revision ID: 02
+Revises: 01
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "02"
+down_revision: Union[str, None] = "01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Связи рецептов переводятся на первую запись из группы дубликатов,
+    # после чего остальные записи удаляются.
+    op.execute(
+        """
+        WITH duplicates AS (
+            SELECT id, min(id) OVER (PARTITION BY ingredient_id, amount) AS keep_id
+            FROM ingredientamount
+        )
+        UPDATE recipeingredient
+        SET ingredient_amount_id = duplicates.keep_id
+        FROM duplicates
+        WHERE recipeingredient.ingredient_amount_id = duplicates.id
+        AND duplicates.id <> duplicates.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM ingredientamount
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, min(id) OVER (PARTITION BY ingredient_id, amount) AS keep_id
+                FROM ingredientamount
+            ) duplicates
+            WHERE id <> keep_id
+        )
+        """
+    )
+    op.create_unique_constraint(
+        "unique ingredient amount", "ingredientamount", ["ingredient_id", "amount"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("unique ingredient amount", "ingredientamount", type_="unique")
@@ -0,0 +1,233 @@
+"""content addressed images
+
+Revision ID: 03
+Revises: 02
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import pathlib
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from PIL import Image, UnidentifiedImageError
+
+
+# revision identifiers, used by Alembic.
+revision: str = "03"
+down_revision: Union[str, None] = "02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 100
+# Путь и форматы зафиксированы на момент ревизии и не зависят от кода
+# приложения, который может измениться после нее.
+MEDIA_PATH = str(
+    pathlib.Path(__file__).resolve().parents[2] / "media" / "recipes" / "images"
+)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def _image_extension(image_bytes):
+    """Формат картинки по первым байтам содержимого."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return extension
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _image_bytes(name, image_base64):
+    """Содержимое картинки из строки base64, а если ее нет - из файла."""
+    if image_base64 and ";base64," in image_base64:
+        try:
+            return base64.b64decode(image_base64.split(";base64,", 1)[1])
+        except (ValueError, binascii.Error):
+            pass
+    image_path = f"{MEDIA_PATH}/{name}"
+    if os.path.exists(image_path):
+        with open(image_path, "rb") as image_file:
+            return image_file.read()
+    return None
+
+
+def _image_size(image_bytes):
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None, None
+
+
+def _write_image(image_name, image_bytes):
+    image_path = f"{MEDIA_PATH}/{image_name}"
+    if os.path.exists(image_path):
+        return
+    temp_path = f"{MEDIA_PATH}/.migration-{image_name}"
+    with open(temp_path, "wb") as image_file:
+        image_file.write(image_bytes)
+    os.replace(temp_path, image_path)
+
+
+def upgrade() -> None:
+    op.add_column("image", sa.Column("hash", sa.String(length=64), nullable=True))
+    op.add_column("image", sa.Column("size", sa.Integer(), nullable=True))
+    op.add_column("image", sa.Column("mime", sa.String(length=200), nullable=True))
+    op.add_column("image", sa.Column("width", sa.Integer(), nullable=True))
+    op.add_column("image", sa.Column("height", sa.Integer(), nullable=True))
+    op.add_column(
+        "image",
+        sa.Column("ref_count", sa.Integer(), server_default="1", nullable=False),
+    )
+
+    # Картинки переносятся из БД на диск пачками, файл получает имя
+    # по sha256 содержимого. Старые файлы удаляются в самом конце.
+    connection = op.get_bind()
+    files_to_delete = set()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(
+                "SELECT id, name, base64 FROM image WHERE id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            image_bytes = _image_bytes(row.name, row.base64)
+            if image_bytes is None:
+                # Картинки нет ни в БД, ни на диске: запись остается
+                # со старым именем и уникальным хэшем от него.
+                extension = row.name.rsplit(".", 1)[-1]
+                values = {
+                    "name": row.name,
+                    "hash": hashlib.sha256(row.name.encode()).hexdigest(),
+                    "size": 0,
+                    "mime": f"image/{extension}",
+                    "width": None,
+                    "height": None,
+                }
+            else:
+                image_hash = hashlib.sha256(image_bytes).hexdigest()
+                extension = (
+                    _image_extension(image_bytes) or (row.name.rsplit(".", 1)[-1])
+                )
+                width, height = _image_size(image_bytes)
+                values = {
+                    "name": f"{image_hash}.{extension}",
+                    "hash": image_hash,
+                    "size": len(image_bytes),
+                    "mime": f"image/{extension}",
+                    "width": width,
+                    "height": height,
+                }
+                _write_image(values["name"], image_bytes)
+                if row.name != values["name"]:
+                    files_to_delete.add(row.name)
+            connection.execute(
+                sa.text(
+                    "UPDATE image SET name = :name, hash = :hash, size = :size, "
+                    "mime = :mime, width = :width, height = :height WHERE id = :id"
+                ),
+                {"id": row.id, **values},
+            )
+
+    # Рецепты с одинаковыми картинками переводятся на первую запись из группы
+    # дубликатов, счетчик ссылок пересчитывается, записи без рецептов удаляются.
+    op.execute(
+        """
+        WITH duplicates AS (
+            SELECT id, min(id) OVER (PARTITION BY hash) AS keep_id
+            FROM image
+        )
+        UPDATE recipe
+        SET image = duplicates.keep_id
+        FROM duplicates
+        WHERE recipe.image = duplicates.id
+        AND duplicates.id <> duplicates.keep_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE image
+        SET ref_count = (SELECT count(*) FROM recipe WHERE recipe.image = image.id)
+        """
+    )
+    orphan_names = (
+        connection.execute(
+            sa.text("DELETE FROM image WHERE ref_count = 0 RETURNING name")
+        )
+        .scalars()
+        .all()
+    )
+    kept_names = set(
+        connection.execute(sa.text("SELECT name FROM image")).scalars().all()
+    )
+    files_to_delete.update(orphan_names)
+    files_to_delete -= kept_names
+
+    op.alter_column("image", "hash", nullable=False)
+    op.alter_column("image", "size", nullable=False)
+    op.alter_column("image", "mime", nullable=False)
+    op.create_unique_constraint("unique image hash", "image", ["hash"])
+    op.drop_column("image", "base64")
+
+    for image_name in files_to_delete:
+        image_path = f"{MEDIA_PATH}/{image_name}"
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+
+def downgrade() -> None:
+    op.add_column(
+        "image",
+        sa.Column("base64", sa.VARCHAR(), server_default="", nullable=False),
+    )
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(
+                "SELECT id, name, mime FROM image WHERE id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            image_bytes = _image_bytes(row.name, None)
+            if image_bytes is None:
+                continue
+            connection.execute(
+                sa.text("UPDATE image SET base64 = :base64 WHERE id = :id"),
+                {
+                    "id": row.id,
+                    "base64": f"data:{row.mime};base64,"
+                    + base64.b64encode(image_bytes).decode("utf-8"),
+                },
+            )
+    op.alter_column("image", "base64", server_default=None)
+    op.drop_constraint("unique image hash", "image", type_="unique")
+    op.drop_column("image", "ref_count")
+    op.drop_column("image", "height")
+    op.drop_column("image", "width")
+    op.drop_column("image", "mime")
+    op.drop_column("image", "size")
+    op.drop_column("image", "hash")
@@ -0,0 +1,34 @@
+"""image derivatives
+
+Revision ID: 04
+Revises: 03
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "04"
+down_revision: Union[str, None] = "03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Копии существующих картинок создаются командой
+    # poe generate_image_derivatives.
+    op.add_column(
+        "image",
+        sa.Column(
+            "has_derivatives", sa.Boolean(), server_default="false", nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("image", "has_derivatives")
@@ -0,0 +1,34 @@
+"""recipe ingredient recipe index
+
+Revision ID: 05
+Revises: 04
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "05"
+down_revision: Union[str, None] = "04"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Поиск рецептов корзины по user_id уже покрыт индексом уникального
+    # ограничения shoppingcart (user_id, recipe_id), индекс нужен для
+    # соединения с ингредиентами рецептов.
+    op.create_index(
+        op.f("ix_recipeingredient_recipe_id"),
+        "recipeingredient",
+        ["recipe_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_recipeingredient_recipe_id"), table_name="recipeingredient")
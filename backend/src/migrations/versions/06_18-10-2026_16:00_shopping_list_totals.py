@@ -0,0 +1,57 @@
+"""shopping list totals
+
+Revision ID: 06
+Revises: 05
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "06"
+down_revision: Union[str, None] = "05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shoppinglisttotal",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("ingredient_id", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Integer(), nullable=False),
+        sa.Column("recipes_count", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["ingredient_id"], ["ingredient.id"], ondelete="cascade"
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="cascade"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id", "ingredient_id", name="unique shopping list ingredient"
+        ),
+    )
+    # Суммы для уже существующих списков покупок.
+    op.execute(
+        """
+        INSERT INTO shoppinglisttotal
+            (user_id, ingredient_id, total_amount, recipes_count)
+        SELECT shoppingcart.user_id, ingredientamount.ingredient_id,
+            sum(ingredientamount.amount), count(DISTINCT shoppingcart.recipe_id)
+        FROM shoppingcart
+        JOIN recipeingredient
+            ON recipeingredient.recipe_id = shoppingcart.recipe_id
+        JOIN ingredientamount
+            ON ingredientamount.id = recipeingredient.ingredient_amount_id
+        GROUP BY shoppingcart.user_id, ingredientamount.ingredient_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("shoppinglisttotal")
@@ -0,0 +1,28 @@
+"""recipe author index
+
+Revision ID: 07
+Revises: 06
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "07"
+down_revision: Union[str, None] = "06"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Последние рецепты автора для списка подписок читаются по индексу
+    # в обратном порядке id, число рецептов автора - только по индексу.
+    op.create_index("ix_recipe_author_id", "recipe", ["author", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recipe_author_id", table_name="recipe")
@@ -0,0 +1,56 @@
+"""denormalized counters
+
+Revision ID: 08
+Revises: 07
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "08"
+down_revision: Union[str, None] = "07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USER_COUNTERS = {
+    "recipes_count": ("recipe", "author"),
+    "followers_count": ("subscription", "author_id"),
+    "following_count": ("subscription", "subscriber_id"),
+}
+RECIPE_COUNTERS = {
+    "favorites_count": ("favoriterecipe", "recipe_id"),
+    "shopping_cart_count": ("shoppingcart", "recipe_id"),
+}
+
+
+def upgrade() -> None:
+    for table, counters in (("user", USER_COUNTERS), ("recipe", RECIPE_COUNTERS)):
+        for counter in counters:
+            op.add_column(
+                table,
+                sa.Column(counter, sa.Integer(), server_default="0", nullable=False),
+            )
+        # Значения счетчиков для уже существующих данных.
+        for counter, (source, column) in counters.items():
+            op.execute(
+                f"""
+                UPDATE "{table}" SET {counter} = actual.count
+                FROM (
+                    SELECT {column} AS id, count(*) AS count
+                    FROM {source} GROUP BY {column}
+                ) AS actual
+                WHERE "{table}".id = actual.id
+                """
+            )
+
+
+def downgrade() -> None:
+    for table, counters in (("user", USER_COUNTERS), ("recipe", RECIPE_COUNTERS)):
+        for counter in counters:
+            op.drop_column(table, counter)
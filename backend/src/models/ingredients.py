@@ -28,11 +28,15 @@ class IngredientAmountModel(Base):
         secondary="recipeingredient", back_populates="ingredient_amount"
     )
 
+    __table_args__ = (
+        UniqueConstraint("ingredient_id", "amount", name="unique ingredient amount"),
+    )
+
 
 class RecipeIngredientModel(Base):
     ingredient_amount_id: Mapped[int] = mapped_column(
         ForeignKey("ingredientamount.id", ondelete="cascade", onupdate="cascade")
     )
     recipe_id: Mapped[int] = mapped_column(
-        ForeignKey("recipe.id", ondelete="cascade", onupdate="cascade")
+        ForeignKey("recipe.id", ondelete="cascade", onupdate="cascade"), index=True
     )
@@ -1,9 +1,16 @@
 import typing
 
-from sqlalchemy import CheckConstraint, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    CheckConstraint,
+    ForeignKey,
+    Index,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from backend.src.constants import PARAMS_MAX_LENGTH
+from backend.src.constants import IMAGE_HASH_LENGTH, PARAMS_MAX_LENGTH
 from backend.src.db import Base
 
 if typing.TYPE_CHECKING:
@@ -14,9 +21,17 @@ if typing.TYPE_CHECKING:
 
 class ImageModel(Base):
     name: Mapped[str]
-    base64: Mapped[str]
+    hash: Mapped[str] = mapped_column(String(IMAGE_HASH_LENGTH))
+    size: Mapped[int]
+    mime: Mapped[str] = mapped_column(String(PARAMS_MAX_LENGTH))
+    width: Mapped[int | None]
+    height: Mapped[int | None]
+    ref_count: Mapped[int] = mapped_column(default=1, server_default="1")
+    has_derivatives: Mapped[bool] = mapped_column(default=False, server_default="false")
     recipe: Mapped[list["RecipeModel"]] = relationship(back_populates="image_info")
 
+    __table_args__ = (UniqueConstraint("hash", name="unique image hash"),)
+
 
 class RecipeModel(Base):
     author: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="cascade"))
@@ -39,11 +54,14 @@ class RecipeModel(Base):
         back_populates="recipe"
     )
     image_info: Mapped["ImageModel"] = relationship(back_populates="recipe")
+    favorites_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    shopping_cart_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     __table_args__ = (
         CheckConstraint(
             sqltext="cooking_time > 0", name="check_cooking_time_non_negative"
         ),
+        Index("ix_recipe_author_id", "author", "id"),
     )
 
 
@@ -66,3 +84,24 @@ class ShoppingCartModel(UserRecipeBaseModel):
     __table_args__ = (
         UniqueConstraint("user_id", "recipe_id", name="unique recipe in shopping cart"),
     )
+
+
+class ShoppingListTotalModel(Base):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при добавлении и удалении рецептов из списка покупок,
+    recipes_count - число рецептов списка, в которых есть ингредиент.
+    """
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="cascade"))
+    ingredient_id: Mapped[int] = mapped_column(
+        ForeignKey("ingredient.id", ondelete="cascade")
+    )
+    total_amount: Mapped[int]
+    recipes_count: Mapped[int]
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "ingredient_id", name="unique shopping list ingredient"
+        ),
+    )
@@ -19,4 +19,7 @@ class UserModel(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=True)
+    recipes_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    followers_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    following_count: Mapped[int] = mapped_column(default=0, server_default="0")
     recipe: Mapped[list["RecipeModel"]] = relationship(back_populates="author_info")
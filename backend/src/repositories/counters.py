@@ -0,0 +1,92 @@
+from sqlalchemy import ARRAY, Integer, any_, case, cast, exists, func, select, update
+
+from backend.src.models.recipes import (
+    FavoriteRecipeModel,
+    RecipeModel,
+    ShoppingCartModel,
+)
+from backend.src.models.subscriptions import SubscriptionModel
+from backend.src.models.users import UserModel
+from backend.src.repositories.base import BaseRepository
+
+
+class CounterRepository(BaseRepository):
+    """Денормализованные счетчики пользователей и рецептов.
+
+    Счетчики меняются в той же транзакции, что и строки, которые они
+    считают, поэтому профиль и карточка рецепта читают их без агрегации.
+    Для каждого счетчика указаны таблица и столбец, по которым он
+    пересчитывается при сверке.
+    """
+
+    user_counters = {
+        "recipes_count": RecipeModel.author,
+        "followers_count": SubscriptionModel.author_id,
+        "following_count": SubscriptionModel.subscriber_id,
+    }
+    recipe_counters = {
+        "favorites_count": FavoriteRecipeModel.recipe_id,
+        "shopping_cart_count": ShoppingCartModel.recipe_id,
+    }
+
+    async def change(self, model, counter: str, ids: list[int], delta: int):
+        """Изменение счетчика counter у объектов model с id из ids на delta."""
+        if not ids:
+            return
+        column = getattr(model, counter)
+        await self.session.execute(
+            update(model)
+            .values({counter: column + delta})
+            .filter(model.id == any_(cast(list(ids), ARRAY(Integer))))
+        )
+
+    async def change_subscription(self, author_id: int, subscriber_id: int, delta):
+        """Счетчики подписчиков автора и подписок подписчика одним UPDATE."""
+        await self.session.execute(
+            update(UserModel)
+            .values(
+                followers_count=UserModel.followers_count
+                + case((UserModel.id == author_id, delta), else_=0),
+                following_count=UserModel.following_count
+                + case((UserModel.id == subscriber_id, delta), else_=0),
+            )
+            .filter(UserModel.id.in_((author_id, subscriber_id)))
+        )
+
+    async def _reconcile_counter(self, model, counter: str, source_column) -> int:
+        column = getattr(model, counter)
+        actual = (
+            select(source_column.label("id"), func.count().label("count"))
+            .group_by(source_column)
+            .subquery()
+        )
+        counted = await self.session.execute(
+            update(model)
+            .values({counter: actual.c.count})
+            .filter(model.id == actual.c.id, column != actual.c.count)
+        )
+        empty = await self.session.execute(
+            update(model)
+            .values({counter: 0})
+            .filter(column != 0, ~exists().where(source_column == model.id))
+        )
+        return counted.rowcount + empty.rowcount
+
+    async def reconcile(self) -> dict[str, int]:
+        """Пересчет всех счетчиков по исходным таблицам.
+
+        Выполняется в транзакции REPEATABLE READ, иначе счет по снимку
+        исходной таблицы может перезаписать параллельное изменение
+        счетчика (см. utils/reconcile_counters.py). Возвращается число
+        исправленных строк для каждого счетчика.
+        """
+        fixed = dict()
+        for model, counters in (
+            (UserModel, self.user_counters),
+            (RecipeModel, self.recipe_counters),
+        ):
+            for counter, source_column in counters.items():
+                fixed[counter] = await self._reconcile_counter(
+                    model, counter, source_column
+                )
+        return fixed
@@ -1,15 +1,23 @@
-from sqlalchemy import insert, select, delete
+from sqlalchemy import ARRAY, Integer, any_, cast, insert, literal, select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import NoResultFound
 
 from backend.src.constants import MAIN_URL, MOUNT_PATH
 from backend.src.models.recipes import FavoriteRecipeModel, ImageModel, RecipeModel
 from backend.src.repositories.base import BaseRepository
+from backend.src.repositories.counters import CounterRepository
 from backend.src.schemas.recipes import FavoriteRecipeRead
 
 
 class FavoriteRecipeRepository(BaseRepository):
     model = FavoriteRecipeModel
     schema = FavoriteRecipeRead
+    counter = "favorites_count"
+
+    async def _change_counter(self, recipe_ids: list[int], delta: int):
+        await CounterRepository(self.session).change(
+            RecipeModel, self.counter, recipe_ids, delta
+        )
 
     async def create(self, data):
         """Добавление рецепта в избранное."""
@@ -20,6 +28,7 @@ class FavoriteRecipeRepository(BaseRepository):
         )
         favorite_recipe_id = await self.session.execute(make_recipe_favorite_stmt)
         favorite_recipe_id = favorite_recipe_id.scalars().one()
+        await self._change_counter([favorite_recipe_id], 1)
         favorite_recipe_info_stmt = (
             select(
                 RecipeModel.id,
@@ -40,11 +49,79 @@ class FavoriteRecipeRepository(BaseRepository):
             cooking_time=favorite_recipe_info.cooking_time,
         )
 
+    @staticmethod
+    def recipes_by_ids(recipe_ids: list[int]):
+        """Существующие рецепты из списка id."""
+        return select(RecipeModel.id).filter(
+            RecipeModel.id == any_(cast(recipe_ids, ARRAY(Integer)))
+        )
+
+    @staticmethod
+    def favorite_recipes(user_id: int):
+        """Рецепты из избранного пользователя."""
+        return select(FavoriteRecipeModel.recipe_id.label("id")).filter(
+            FavoriteRecipeModel.user_id == user_id
+        )
+
+    async def add_many(self, user_id: int, recipes_stmt) -> dict[int, bool]:
+        """Добавление рецептов из recipes_stmt одним INSERT ... SELECT.
+
+        Уже добавленные рецепты пропускаются через ON CONFLICT DO NOTHING.
+        Возвращается словарь id рецепта -> был ли он добавлен сейчас,
+        рецептов, которых нет в БД, в нем нет.
+        """
+        requested = recipes_stmt.cte("requested")
+        inserted = (
+            pg_insert(self.model)
+            .from_select(
+                ["user_id", "recipe_id"],
+                select(literal(user_id), requested.c.id),
+            )
+            .on_conflict_do_nothing()
+            .returning(self.model.recipe_id)
+            .cte("inserted")
+        )
+        stmt = (
+            select(
+                requested.c.id,
+                inserted.c.recipe_id.is_not(None).label("added"),
+            )
+            .select_from(requested)
+            .outerjoin(inserted, inserted.c.recipe_id == requested.c.id)
+        )
+        result = await self.session.execute(stmt)
+        result = dict(result.all())
+        await self._change_counter(
+            [recipe_id for recipe_id, added in result.items() if added], 1
+        )
+        return result
+
+    async def remove_many(self, user_id: int, recipe_ids: list[int]) -> list[int]:
+        """Удаление рецептов одним запросом, возвращаются id удаленных."""
+        stmt = (
+            delete(self.model)
+            .filter(
+                self.model.user_id == user_id,
+                self.model.recipe_id == any_(cast(recipe_ids, ARRAY(Integer))),
+            )
+            .returning(self.model.recipe_id)
+        )
+        result = await self.session.execute(stmt)
+        removed_ids = result.scalars().all()
+        await self._change_counter(removed_ids, -1)
+        return removed_ids
+
     async def delete(self, **filter_by):
         """Удаление рецепта из избранного."""
-        stmt = delete(self.model).filter_by(**filter_by).returning(self.model.id)
+        stmt = (
+            delete(self.model)
+            .filter_by(**filter_by)
+            .returning(self.model.id, self.model.recipe_id)
+        )
         result = await self.session.execute(stmt)
         try:
-            return result.scalars().one()
+            result = result.one()
         except NoResultFound:
             raise NoResultFound
+        await self._change_counter([result.recipe_id], -1)
+        return result.id
@@ -1,16 +1,16 @@
-from sqlalchemy import delete, select
+from sqlalchemy import ARRAY, Integer, any_, cast, delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 
 from backend.src.base import (
     IngredientAmountModel,
     IngredientModel,
     RecipeIngredientModel,
 )
+from backend.src.exceptions.ingredients import IngredientNotFoundException
 from backend.src.repositories.base import BaseRepository
 from backend.src.schemas.ingredients import (
-    IngredientAmountCreate,
     IngredientAmountRead,
     IngredientRead,
-    RecipeIngredientAmountCreate,
     RecipeIngredientAmountRead,
 )
 
@@ -38,67 +38,86 @@ class IngredientAmountRepository(BaseRepository):
     model = IngredientAmountModel
     schema = IngredientAmountRead
 
-    async def add_recipe_ingredients(self, ingredients_data, recipe_id, db):
-        """Добавление ингредиентов рецепту."""
-        ingredients_amount_list_to_create: list[IngredientAmountCreate] = list()
-        existing_ingredients_amount_ids: list[int] = list()
-        ingredients_amount_list_response: list[RecipeIngredientAmountRead] = list()
-        for obj in ingredients_data:
-            current_ingredient_amount = await db.ingredients_amount.get_one_or_none(
-                ingredient_id=obj.ingredient_id, amount=obj.amount
-            )
-            if current_ingredient_amount:
-                existing_ingredients_amount_ids.append(current_ingredient_amount.id)
-            else:
-                ingredients_amount_list_to_create.append(
-                    IngredientAmountCreate(
-                        ingredient_id=obj.ingredient_id, amount=obj.amount
-                    )
-                )
-            current_ingredient = await db.ingredients.get_one_or_none(
-                id=obj.ingredient_id
+    async def add_recipe_ingredients(self, ingredients_data, recipe_id, db=None):
+        """Добавление ингредиентов рецепту.
+
+        Данные ингредиентов получаются одним запросом, недостающие пары
+        (ингредиент, количество) создаются через INSERT ... ON CONFLICT
+        DO NOTHING, уже существующие перечитываются одним запросом.
+        Записи ingredientamount общие для всех рецептов.
+        """
+        ingredient_ids = [obj.ingredient_id for obj in ingredients_data]
+        ingredients_stmt = select(IngredientModel).filter(
+            IngredientModel.id == any_(cast(ingredient_ids, ARRAY(Integer)))
+        )
+        ingredients = await self.session.execute(ingredients_stmt)
+        ingredients = {obj.id: obj for obj in ingredients.scalars().all()}
+        if len(ingredients) != len(set(ingredient_ids)):
+            raise IngredientNotFoundException
+
+        amount_pairs = {(obj.ingredient_id, obj.amount) for obj in ingredients_data}
+        new_amounts_stmt = (
+            insert(self.model)
+            .values(
+                [
+                    {"ingredient_id": ingredient_id, "amount": amount}
+                    for ingredient_id, amount in amount_pairs
+                ]
             )
-            ingredients_amount_list_response.append(
-                RecipeIngredientAmountRead(
-                    id=current_ingredient.id,
-                    name=current_ingredient.name,
-                    measurement_unit=current_ingredient.measurement_unit,
-                    amount=obj.amount,
+            .on_conflict_do_nothing(index_elements=["ingredient_id", "amount"])
+            .returning(self.model.id, self.model.ingredient_id, self.model.amount)
+        )
+        new_amounts = await self.session.execute(new_amounts_stmt)
+        amount_ids = {
+            (obj.ingredient_id, obj.amount): obj.id for obj in new_amounts.all()
+        }
+        existing_pairs = amount_pairs - amount_ids.keys()
+        if existing_pairs:
+            existing_amounts_stmt = select(
+                self.model.id, self.model.ingredient_id, self.model.amount
+            ).filter(
+                tuple_(self.model.ingredient_id, self.model.amount).in_(
+                    list(existing_pairs)
                 )
             )
-        if ingredients_amount_list_to_create:
-            ingredients_amount_ids = await db.ingredients_amount.bulk_create(
-                ingredients_amount_list_to_create
+            existing_amounts = await self.session.execute(existing_amounts_stmt)
+            amount_ids |= {
+                (obj.ingredient_id, obj.amount): obj.id
+                for obj in existing_amounts.all()
+            }
+
+        recipe_ingredients_stmt = insert(RecipeIngredientModel).values(
+            [
+                {
+                    "recipe_id": recipe_id,
+                    "ingredient_amount_id": amount_ids[(obj.ingredient_id, obj.amount)],
+                }
+                for obj in ingredients_data
+            ]
+        )
+        await self.session.execute(recipe_ingredients_stmt)
+        return [
+            RecipeIngredientAmountRead(
+                id=obj.ingredient_id,
+                name=ingredients[obj.ingredient_id].name,
+                measurement_unit=ingredients[obj.ingredient_id].measurement_unit,
+                amount=obj.amount,
             )
-            ingredients_amount_ids += existing_ingredients_amount_ids
-        else:
-            ingredients_amount_ids = existing_ingredients_amount_ids
-        recipe_ingredients_amount_data = [
-            RecipeIngredientAmountCreate(recipe_id=recipe_id, ingredient_amount_id=_id)
-            for _id in ingredients_amount_ids
+            for obj in ingredients_data
         ]
-        await db.recipe_ingredient_amount.bulk_create(recipe_ingredients_amount_data)
-        return ingredients_amount_list_response
 
-    async def change_recipe_ingredients(self, ingredients_data, recipe_id, db):
-        """Изменение ингредиентов рецепта."""
-        ingredients_amount_stmt = (
-            select(RecipeIngredientModel.ingredient_amount_id)
-            .filter_by(recipe_id=recipe_id)
-            .scalar_subquery()
-        )
-        current_ingredient_ids_stmt = select(
-            IngredientAmountModel.id, IngredientAmountModel.ingredient_id
-        ).filter(IngredientAmountModel.id.in_(ingredients_amount_stmt))
-        current_ingredients = await self.session.execute(current_ingredient_ids_stmt)
-        current_ingredients = current_ingredients.mappings().all()
-        current_ingredient_amount_ids = [obj.id for obj in current_ingredients]
-        ingredients_to_del_stmt = delete(IngredientAmountModel).filter(
-            IngredientAmountModel.id.in_(current_ingredient_amount_ids)
+    async def change_recipe_ingredients(self, ingredients_data, recipe_id, db=None):
+        """Изменение ингредиентов рецепта.
+
+        Удаляются только связи рецепта с ингредиентами: записи
+        ingredientamount могут использоваться другими рецептами.
+        """
+        recipe_ingredients_to_del_stmt = delete(RecipeIngredientModel).filter_by(
+            recipe_id=recipe_id
         )
-        await self.session.execute(ingredients_to_del_stmt)
+        await self.session.execute(recipe_ingredients_to_del_stmt)
         new_ingredients = await self.add_recipe_ingredients(
-            ingredients_data=ingredients_data, recipe_id=recipe_id, db=db
+            ingredients_data=ingredients_data, recipe_id=recipe_id
         )
         return new_ingredients
 
@@ -1,13 +1,27 @@
-import os
-import pathlib
+from collections import defaultdict
 
 from fastapi import HTTPException, status
 from loguru import logger
-from sqlalchemy import and_, delete, insert, select, update, desc
+from sqlalchemy import (
+    Text,
+    case,
+    cast,
+    delete,
+    desc,
+    exists,
+    func,
+    insert,
+    literal_column,
+    null,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import selectinload
 
-from backend.src.constants import MAIN_URL, MOUNT_PATH
+from backend.src.constants import IMAGE_DERIVATIVE_SIZES, MAIN_URL, MOUNT_PATH
+from backend.src.db import async_session_maker
 from backend.src.exceptions.ingredients import IngredientNotFoundException
 from backend.src.exceptions.recipes import (
     MainDataRecipeAtModifyingException,
@@ -25,16 +39,28 @@ from backend.src.models.recipes import (
     RecipeModel,
     ShoppingCartModel,
 )
-from backend.src.models.subscriptions import SubscriptionModel
 from backend.src.models.tags import RecipeTagModel, TagModel
 from backend.src.models.users import UserModel
 from backend.src.repositories.base import BaseRepository
+from backend.src.repositories.counters import CounterRepository
+from backend.src.repositories.shopping_list_totals import ShoppingListTotalRepository
 from backend.src.repositories.utils.ingredients import (
     check_ingredient_duplicates_for_recipe,
 )
-from backend.src.repositories.utils.paginator import url_paginator
+from backend.src.repositories.utils.paginator import (
+    cursor_paginator,
+    decode_cursor,
+    encode_cursor,
+    url_paginator,
+)
+from backend.src.repositories.utils.transaction_hooks import (
+    after_commit,
+    after_rollback,
+)
+from backend.src.repositories.utils.viewer_state import ViewerStateResolver
 from backend.src.schemas.recipes import (
     CheckRecipeRead,
+    ImageCreate,
     ImageRead,
     RecipeCreate,
     RecipeCreateRequest,
@@ -43,13 +69,95 @@ from backend.src.schemas.recipes import (
     RecipeUpdateRequest,
 )
 from backend.src.schemas.users import FollowedUserRead
-from backend.src.utils.image_manager import ImageManager
+from backend.src.setup import image_derivatives, media_io
+from backend.src.utils.image_derivatives import (
+    image_variant_urls,
+    remove_image_files,
+)
+from backend.src.utils.image_upload import UploadedImage
 
 
 class ImageRepository(BaseRepository):
     model = ImageModel
     schema = ImageRead
 
+    async def lock_hash(self, image_hash: str):
+        """Блокировка картинки с содержимым image_hash до конца транзакции.
+
+        Файлы картинок с одинаковым содержимым имеют одно имя, блокировка
+        не дает удалению файла забытой картинки разойтись с повторной
+        загрузкой тех же байтов.
+        """
+        await self.session.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(image_hash)))
+        )
+
+    async def exists(self, image_hash: str) -> bool:
+        stmt = select(exists().where(self.model.hash == image_hash))
+        result = await self.session.execute(stmt)
+        return result.scalar()
+
+    async def acquire(self, image_data: ImageCreate) -> ImageRead:
+        """Получение записи картинки по ее содержимому.
+
+        Новая картинка добавляется в БД, для уже известной увеличивается
+        счетчик ссылающихся на нее рецептов.
+        """
+        await self.lock_hash(image_data.hash)
+        stmt = (
+            pg_insert(self.model)
+            .values(**image_data.model_dump())
+            .on_conflict_do_update(
+                constraint="unique image hash",
+                set_={"ref_count": self.model.ref_count + 1},
+            )
+            .returning(self.model)
+        )
+        result = await self.session.execute(stmt)
+        return self.schema.model_validate(result.scalars().one(), from_attributes=True)
+
+    async def generate_derivatives(self, image: ImageRead) -> bool:
+        """Создание уменьшенных копий картинки в пуле процессов."""
+        if image.has_derivatives:
+            return True
+        if not await image_derivatives.generate(image.name):
+            logger.warning(f"Не удалось создать копии изображения {image.name}")
+            return False
+        await self.mark_derivatives([image.id])
+        return True
+
+    async def mark_derivatives(self, ids: list[int]):
+        """Отметка о том, что копии картинок созданы."""
+        stmt = (
+            update(self.model)
+            .filter(self.model.id.in_(ids))
+            .values(has_derivatives=True)
+        )
+        await self.session.execute(stmt)
+
+    async def release(self, id: int) -> str | None:
+        """Уменьшение счетчика ссылок на картинку.
+
+        Запись без ссылок удаляется, в этом случае возвращается имя файла,
+        который больше не нужен.
+        """
+        delete_stmt = (
+            delete(self.model)
+            .filter_by(id=id)
+            .filter(self.model.ref_count <= 1)
+            .returning(self.model.name)
+        )
+        result = await self.session.execute(delete_stmt)
+        image_name = result.scalars().one_or_none()
+        if image_name is None:
+            update_stmt = (
+                update(self.model)
+                .filter_by(id=id)
+                .values(ref_count=self.model.ref_count - 1)
+            )
+            await self.session.execute(update_stmt)
+        return image_name
+
 
 class RecipeRepository(BaseRepository):
     model = RecipeModel
@@ -66,169 +174,472 @@ class RecipeRepository(BaseRepository):
         limit,
         page,
         router_prefix,
+        cursor=None,
     ):
         """Получение отфильтрованного списка рецептов."""
-        filtered_recipe_id_list_stmt = (
-            select(self.model.id)
-            .join(UserModel, UserModel.id == self.model.author)
-            .outerjoin(
-                SubscriptionModel,
-                and_(
-                    UserModel.id == SubscriptionModel.subscriber_id,
-                    self.model.author == SubscriptionModel.author_id,
-                ),
+        filter_conditions = await self.get_filter_conditions(
+            current_user=current_user,
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            tags=tags,
+            author=author,
+        )
+        query_params = {
+            "author": author,
+            "tags": tags,
+            "is_favorited": is_favorited,
+            "is_in_shopping_cart": is_in_shopping_cart,
+        }
+        if cursor is not None:
+            return await self._get_filtered_by_cursor(
+                filter_conditions=filter_conditions,
+                current_user=current_user,
+                cursor=cursor,
+                limit=limit,
+                router_prefix=router_prefix,
+                query_params=query_params,
             )
-            .join(RecipeTagModel, RecipeTagModel.recipe_id == self.model.id)
-            .join(TagModel, TagModel.id == RecipeTagModel.tag_id)
+        recipe_page_stmt = (
+            select(self.model.id, func.count().over().label("recipes_count"))
+            .filter(*filter_conditions)
+            .order_by(desc(self.model.id))
+            .limit(limit)
+            .offset((page - 1) * limit)
+        )
+        recipe_page = await self.session.execute(recipe_page_stmt)
+        recipe_page = recipe_page.mappings().all()
+        if recipe_page:
+            recipes_count = recipe_page[0].recipes_count
+        else:
+            recipes_count = await self._count_filtered(filter_conditions)
+        filtered_recipe_list = await self.get_list_by_ids(
+            recipe_ids=[obj.id for obj in recipe_page], current_user=current_user
         )
+        paginator_values = url_paginator(
+            limit=limit,
+            page=page,
+            count=recipes_count,
+            router_prefix=router_prefix,
+            query_params=query_params,
+        )
+        result = RecipeListRead(
+            count=recipes_count,
+            next=paginator_values["next"],
+            previous=paginator_values["previous"],
+            results=filtered_recipe_list,
+        )
+        return result
+
+    async def get_filter_conditions(
+        self, current_user, is_favorited, is_in_shopping_cart, tags, author
+    ):
+        """Построение условий фильтрации рецептов.
+
+        Каждый фильтр добавляет только собственное полусоединение (EXISTS),
+        поэтому строки рецептов не размножаются и не требуют DISTINCT.
+        Слаги тегов заранее переводятся в id, чтобы не соединяться с tag.
+        """
+        filter_conditions = list()
+        if tags:
+            tag_ids_stmt = select(TagModel.id).filter(TagModel.slug.in_(tags))
+            tag_ids = await self.session.execute(tag_ids_stmt)
+            tag_ids = tag_ids.scalars().all()
+            filter_conditions.append(
+                exists().where(
+                    RecipeTagModel.recipe_id == self.model.id,
+                    RecipeTagModel.tag_id.in_(tag_ids),
+                )
+            )
+        if author:
+            filter_conditions.append(self.model.author == author)
         if current_user:
             if is_favorited:
-                filtered_recipe_id_list_stmt = filtered_recipe_id_list_stmt.join(
-                    FavoriteRecipeModel,
-                    and_(
+                filter_conditions.append(
+                    exists().where(
                         FavoriteRecipeModel.recipe_id == self.model.id,
                         FavoriteRecipeModel.user_id == current_user.id,
-                    ),
+                    )
                 )
             if is_in_shopping_cart:
-                filtered_recipe_id_list_stmt = filtered_recipe_id_list_stmt.join(
-                    ShoppingCartModel,
-                    and_(
+                filter_conditions.append(
+                    exists().where(
                         ShoppingCartModel.recipe_id == self.model.id,
                         ShoppingCartModel.user_id == current_user.id,
-                    ),
-                )
-        if tags:
-            filtered_recipe_id_list_stmt = filtered_recipe_id_list_stmt.filter(
-                TagModel.slug.in_(tags)
-            )
-        if author:
-            filtered_recipe_id_list_stmt = filtered_recipe_id_list_stmt.filter(
-                self.model.author == author
-            ).order_by(desc("id"))
-        recipe_id_list = await self.session.execute(filtered_recipe_id_list_stmt)
-        recipe_id_list_result = recipe_id_list.unique().scalars().all()
-        _from, _to = (page - 1) * limit, (page - 1) * limit + limit
-        filtered_recipe_id_list = recipe_id_list_result[_from:_to]
-        filtered_recipe_list = list()
-        for recipe_id in filtered_recipe_id_list:
-            filtered_recipe_list.append(
-                await self.get_one_or_none(
-                    current_user=current_user, id=recipe_id, db=db
+                    )
                 )
+        return filter_conditions
+
+    async def _get_filtered_by_cursor(
+        self,
+        filter_conditions,
+        current_user,
+        cursor,
+        limit,
+        router_prefix,
+        query_params,
+    ):
+        """Страница отфильтрованных рецептов, следующих за курсором.
+
+        Количество рецептов считается только для первой страницы: полный
+        count(*) на каждой странице сделал бы ее стоимость зависимой от
+        размера выборки, на следующих страницах count равен None.
+        """
+        recipe_page_stmt = (
+            select(self.model.id)
+            .filter(*filter_conditions)
+            .order_by(desc(self.model.id))
+            .limit(limit + 1)
+        )
+        current_cursor = decode_cursor(cursor)
+        if current_cursor:
+            recipe_page_stmt = recipe_page_stmt.filter(
+                self.model.id < current_cursor.id
             )
-        recipes_count = len(recipe_id_list_result)
-        paginator_values = url_paginator(
-            limit=limit, page=page, count=recipes_count, router_prefix=router_prefix
+        recipe_page = await self.session.execute(recipe_page_stmt)
+        recipe_ids = recipe_page.scalars().all()
+        next_cursor = None
+        if len(recipe_ids) > limit:
+            recipe_ids = recipe_ids[:limit]
+            next_cursor = encode_cursor(sort_key=recipe_ids[-1], id=recipe_ids[-1])
+        paginator_values = cursor_paginator(
+            limit=limit,
+            next_cursor=next_cursor,
+            router_prefix=router_prefix,
+            query_params=query_params,
         )
-        result = RecipeListRead(
+        recipes_count = None
+        if current_cursor is None:
+            recipes_count = await self._count_filtered(filter_conditions)
+        return RecipeListRead(
             count=recipes_count,
             next=paginator_values["next"],
             previous=paginator_values["previous"],
-            results=filtered_recipe_list,
+            results=await self.get_list_by_ids(
+                recipe_ids=recipe_ids, current_user=current_user
+            ),
         )
-        return result
 
-    async def get_one_or_none(self, id, current_user, db):
-        """Получение репепта по id если он существует."""
-        try:
-            ingredient_list_stmt = (
-                (
-                    select(
-                        IngredientAmountModel.amount,
-                        IngredientModel.id,
-                        IngredientModel.measurement_unit,
-                        IngredientModel.name,
-                    ).filter(RecipeIngredientModel.recipe_id == id)
-                )
-                .outerjoin(
-                    RecipeIngredientModel,
-                    IngredientAmountModel.id
-                    == (RecipeIngredientModel.ingredient_amount_id),
-                )
-                .outerjoin(
-                    IngredientModel,
-                    IngredientModel.id == IngredientAmountModel.ingredient_id,
-                )
+    async def _count_filtered(self, filter_conditions):
+        """Количество рецептов, удовлетворяющих фильтрам."""
+        recipes_count_stmt = (
+            select(func.count()).select_from(self.model).filter(*filter_conditions)
+        )
+        recipes_count = await self.session.execute(recipes_count_stmt)
+        return recipes_count.scalars().one()
+
+    async def get_list_by_ids(self, recipe_ids, current_user=None):
+        """Получение списка рецептов по их id за фиксированное число запросов.
+
+        Порядок рецептов в ответе совпадает с порядком recipe_ids.
+        """
+        if not recipe_ids:
+            return list()
+        recipe_body_stmt = (
+            select(
+                self.model.id,
+                self.model.name,
+                self.model.text,
+                self.model.cooking_time,
+                self.model.favorites_count,
+                self.model.shopping_cart_count,
+                UserModel.id.label("author_id"),
+                UserModel.email,
+                UserModel.username,
+                UserModel.first_name,
+                UserModel.last_name,
+                UserModel.recipes_count,
+                UserModel.followers_count,
+                UserModel.following_count,
+                ImageModel.name.label("image_name"),
+                ImageModel.hash.label("image_hash"),
+                ImageModel.has_derivatives,
             )
+            .join(UserModel, UserModel.id == self.model.author)
+            .join(ImageModel, ImageModel.id == self.model.image)
+            .filter(self.model.id.in_(recipe_ids))
+        )
+        recipe_body_result = await self.session.execute(recipe_body_stmt)
+        recipe_body_result = recipe_body_result.mappings().all()
 
-            ingredient_list_result = await self.session.execute(ingredient_list_stmt)
-            ingredient_list_result = ingredient_list_result.unique().mappings().all()
-            recipe_body_stmt = (
-                select(self.model)
-                .filter(
-                    RecipeModel.id == id,
-                )
-                .options(
-                    selectinload(self.model.tags),
-                    selectinload(self.model.author_info).load_only(
-                        UserModel.username,
-                        UserModel.id,
-                        UserModel.first_name,
-                        UserModel.last_name,
-                        UserModel.email,
-                    ),
-                    selectinload(self.model.is_favorited),
-                    selectinload(self.model.is_in_shopping_cart),
-                )
+        recipe_tags_stmt = (
+            select(RecipeTagModel.recipe_id, TagModel)
+            .join(TagModel, TagModel.id == RecipeTagModel.tag_id)
+            .filter(RecipeTagModel.recipe_id.in_(recipe_ids))
+            .order_by(TagModel.id)
+        )
+        recipe_tags_result = await self.session.execute(recipe_tags_stmt)
+        tags_by_recipe = defaultdict(list)
+        for recipe_id, tag in recipe_tags_result.all():
+            tags_by_recipe[recipe_id].append(tag)
+
+        ingredient_list_stmt = (
+            select(
+                RecipeIngredientModel.recipe_id,
+                IngredientAmountModel.amount,
+                IngredientModel.id,
+                IngredientModel.measurement_unit,
+                IngredientModel.name,
             )
-            recipe_body_result = await self.session.execute(recipe_body_stmt)
-            recipe_body_result = recipe_body_result.scalars().one()
-            recipe_image = await db.images.get_one_or_none(id=recipe_body_result.image)
-            recipe_image_url = f"{MAIN_URL}{MOUNT_PATH}" f"/{recipe_image.name}"
-            author_schema_response = FollowedUserRead.model_validate(
-                recipe_body_result.author_info, from_attributes=True
+            .join(
+                IngredientAmountModel,
+                IngredientAmountModel.id == RecipeIngredientModel.ingredient_amount_id,
             )
-            if current_user:
-                subs = await db.subscriptions.get_one_or_none(
-                    author_id=recipe_body_result.author_info.id,
-                    subscriber_id=current_user.id,
-                )
-                if subs:
-                    author_schema_response.is_subscribed = True
-            response = self.schema(
-                id=recipe_body_result.id,
-                tags=recipe_body_result.tags,
-                author=author_schema_response,
-                ingredients=ingredient_list_result,
-                name=recipe_body_result.name,
-                image=recipe_image_url,
-                text=recipe_body_result.text,
-                cooking_time=recipe_body_result.cooking_time,
+            .join(
+                IngredientModel,
+                IngredientModel.id == IngredientAmountModel.ingredient_id,
             )
-            if current_user:
-                if recipe_body_result.is_favorited:
-                    for elem in recipe_body_result.is_favorited:
-                        if elem.user_id == current_user.id:
-                            response.is_favorited = True
-                if recipe_body_result.is_in_shopping_cart:
-                    for elem in recipe_body_result.is_in_shopping_cart:
-                        if elem.user_id == current_user.id:
-                            response.is_in_shopping_cart = True
-            return response
-        except NoResultFound:
+            .filter(RecipeIngredientModel.recipe_id.in_(recipe_ids))
+            .order_by(RecipeIngredientModel.id)
+        )
+        ingredient_list_result = await self.session.execute(ingredient_list_stmt)
+        ingredients_by_recipe = defaultdict(list)
+        for obj in ingredient_list_result.mappings().all():
+            ingredients_by_recipe[obj.recipe_id].append(obj)
+
+        recipes_by_id = dict()
+        for obj in recipe_body_result:
+            author = FollowedUserRead(
+                id=obj.author_id,
+                email=obj.email,
+                username=obj.username,
+                first_name=obj.first_name,
+                last_name=obj.last_name,
+                recipes_count=obj.recipes_count,
+                followers_count=obj.followers_count,
+                following_count=obj.following_count,
+            )
+            recipes_by_id[obj.id] = self.schema(
+                id=obj.id,
+                tags=tags_by_recipe[obj.id],
+                author=author,
+                ingredients=ingredients_by_recipe[obj.id],
+                name=obj.name,
+                image=f"{MAIN_URL}{MOUNT_PATH}/{obj.image_name}",
+                image_variants=image_variant_urls(obj.image_hash, obj.has_derivatives),
+                text=obj.text,
+                cooking_time=obj.cooking_time,
+                favorites_count=obj.favorites_count,
+                shopping_cart_count=obj.shopping_cart_count,
+            )
+        recipe_list = [
+            recipes_by_id[recipe_id]
+            for recipe_id in recipe_ids
+            if recipe_id in recipes_by_id
+        ]
+        if current_user:
+            await self.apply_viewer_state(recipe_list, user_id=current_user.id)
+        return recipe_list
+
+    async def apply_counters(self, recipes):
+        """Актуальные счетчики рецептов и их авторов в уже собранных
+        рецептах, например взятых из кэша, одним запросом по id."""
+        if not recipes:
+            return recipes
+        counters_stmt = (
+            select(
+                self.model.id,
+                self.model.favorites_count,
+                self.model.shopping_cart_count,
+                UserModel.recipes_count,
+                UserModel.followers_count,
+                UserModel.following_count,
+            )
+            .join(UserModel, UserModel.id == self.model.author)
+            .filter(self.model.id.in_([recipe.id for recipe in recipes]))
+        )
+        counters = await self.session.execute(counters_stmt)
+        counters = {obj.id: obj for obj in counters.all()}
+        for recipe in recipes:
+            obj = counters.get(recipe.id)
+            if obj is None:
+                continue
+            recipe.favorites_count = obj.favorites_count
+            recipe.shopping_cart_count = obj.shopping_cart_count
+            recipe.author.recipes_count = obj.recipes_count
+            recipe.author.followers_count = obj.followers_count
+            recipe.author.following_count = obj.following_count
+        return recipes
+
+    async def apply_viewer_state(self, recipes, user_id):
+        """Проставление флагов пользователя в уже собранных рецептах."""
+        return await ViewerStateResolver(self.session, user_id).apply(recipes)
+
+    async def get_one_or_none(self, id, current_user, db=None):
+        """Получение репепта по id если он существует.
+
+        Ответ целиком собирается в Postgres одним запросом через
+        json_build_object и json_agg и валидируется из JSON-строки.
+        """
+        viewer_state = ViewerStateResolver(
+            self.session, current_user.id if current_user else None
+        )
+        recipe_json = func.json_build_object(
+            "id",
+            self.model.id,
+            "name",
+            self.model.name,
+            "text",
+            self.model.text,
+            "cooking_time",
+            self.model.cooking_time,
+            "image",
+            func.concat(f"{MAIN_URL}{MOUNT_PATH}/", ImageModel.name),
+            "image_variants",
+            self._image_variants_json(),
+            "author",
+            self._author_json(viewer_state),
+            "tags",
+            self._tags_json(),
+            "ingredients",
+            self._ingredients_json(),
+            "is_favorited",
+            viewer_state.is_favorited(self.model.id),
+            "is_in_shopping_cart",
+            viewer_state.is_in_shopping_cart(self.model.id),
+            "favorites_count",
+            self.model.favorites_count,
+            "shopping_cart_count",
+            self.model.shopping_cart_count,
+        )
+        recipe_stmt = (
+            select(cast(recipe_json, Text))
+            .select_from(self.model)
+            .join(UserModel, UserModel.id == self.model.author)
+            .join(ImageModel, ImageModel.id == self.model.image)
+            .filter(self.model.id == id)
+        )
+        recipe_result = await self.session.execute(recipe_stmt)
+        recipe_result = recipe_result.scalars().one_or_none()
+        if recipe_result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Рецепт не найден."
             )
+        return self.schema.model_validate_json(recipe_result)
 
-    async def create(self, recipe_data: RecipeCreateRequest, db, current_user_id: int):
-        """Создание нового рецепта."""
-        _recipe_data = RecipeCreate(
-            **recipe_data.model_dump(),
-            author=current_user_id,
+    def _author_json(self, viewer_state):
+        return func.json_build_object(
+            "id",
+            UserModel.id,
+            "email",
+            UserModel.email,
+            "username",
+            UserModel.username,
+            "first_name",
+            UserModel.first_name,
+            "last_name",
+            UserModel.last_name,
+            "recipes_count",
+            UserModel.recipes_count,
+            "followers_count",
+            UserModel.followers_count,
+            "following_count",
+            UserModel.following_count,
+            "is_subscribed",
+            viewer_state.is_subscribed(UserModel.id),
         )
-        try:
-            image_base64 = _recipe_data.image
-            generated_image_name = ImageManager().create_random_name(image_base64)
-            while await self.check_image_name(generated_image_name):
-                generated_image_name = ImageManager().create_random_name(image_base64)
-
-            image_url = f"{MAIN_URL}{MOUNT_PATH}" f"/{generated_image_name}"
-            image_id = await self.create_image(
-                name=generated_image_name, base64=image_base64
+
+    def _tags_json(self):
+        tag_json = func.json_build_object(
+            "id",
+            TagModel.id,
+            "name",
+            TagModel.name,
+            "color",
+            TagModel.color,
+            "slug",
+            TagModel.slug,
+        )
+        return (
+            select(
+                func.coalesce(
+                    func.json_agg(aggregate_order_by(tag_json, TagModel.id)),
+                    literal_column("'[]'::json"),
+                )
+            )
+            .select_from(RecipeTagModel)
+            .join(TagModel, TagModel.id == RecipeTagModel.tag_id)
+            .filter(RecipeTagModel.recipe_id == self.model.id)
+            .scalar_subquery()
+        )
+
+    def _image_variants_json(self):
+        variant_urls = list()
+        for variant in IMAGE_DERIVATIVE_SIZES:
+            variant_urls.extend(
+                (
+                    variant,
+                    func.concat(
+                        f"{MAIN_URL}{MOUNT_PATH}/",
+                        ImageModel.hash,
+                        f"_{variant}.webp",
+                    ),
+                )
+            )
+        return case(
+            (ImageModel.has_derivatives, func.json_build_object(*variant_urls)),
+            else_=null(),
+        )
+
+    def _ingredients_json(self):
+        ingredient_json = func.json_build_object(
+            "id",
+            IngredientModel.id,
+            "name",
+            IngredientModel.name,
+            "measurement_unit",
+            IngredientModel.measurement_unit,
+            "amount",
+            IngredientAmountModel.amount,
+        )
+        return (
+            select(
+                func.coalesce(
+                    func.json_agg(
+                        aggregate_order_by(ingredient_json, RecipeIngredientModel.id)
+                    ),
+                    literal_column("'[]'::json"),
+                )
             )
+            .select_from(RecipeIngredientModel)
+            .join(
+                IngredientAmountModel,
+                IngredientAmountModel.id == RecipeIngredientModel.ingredient_amount_id,
+            )
+            .join(
+                IngredientModel,
+                IngredientModel.id == IngredientAmountModel.ingredient_id,
+            )
+            .filter(RecipeIngredientModel.recipe_id == self.model.id)
+            .scalar_subquery()
+        )
+
+    async def create(
+        self,
+        recipe_data: RecipeCreateRequest,
+        db,
+        current_user_id: int,
+        image_upload=None,
+    ):
+        """Создание нового рецепта.
 
-            _recipe_data.image = image_id
+        Картинка передается строкой base64 в recipe_data.image или
+        загруженным файлом image_upload, который переносится на место
+        без чтения в память. Файл публикуется только после commit.
+        """
+        if image_upload is None:
+            image_upload = await media_io.run(
+                UploadedImage.from_base64, recipe_data.image
+            )
+        after_rollback(self.session, lambda: media_io.run(image_upload.discard))
+        image_data = await media_io.run(image_upload.describe)
+        try:
+            image = await db.images.acquire(image_data)
+            image_url = f"{MAIN_URL}{MOUNT_PATH}/{image.name}"
+            _recipe_data = RecipeCreate(
+                **recipe_data.model_dump(exclude={"image"}),
+                image=image.id,
+                author=current_user_id,
+            )
             new_obj_stmt = (
                 insert(self.model)
                 .values(**_recipe_data.model_dump())
@@ -236,8 +647,8 @@ class RecipeRepository(BaseRepository):
             )
             recipe_result = await self.session.execute(new_obj_stmt)
             recipe_result = recipe_result.scalars().one()
-            logger.info(
-                f"Изображение {generated_image_name} для рецепта {recipe_result.id} успешно создано"
+            await CounterRepository(self.session).change(
+                UserModel, "recipes_count", [current_user_id], 1
             )
             user_result = await db.users.get_one_or_none(
                 user_id=recipe_result.author, current_user_id=recipe_result.id
@@ -270,9 +681,6 @@ class RecipeRepository(BaseRepository):
             except Exception:
                 raise TagNotFoundException
 
-        ImageManager().base64_to_file(
-            base64_string=image_base64, image_name=generated_image_name
-        )
         response = self.schema(
             name=recipe_result.name,
             text=recipe_result.text,
@@ -282,69 +690,63 @@ class RecipeRepository(BaseRepository):
             tags=tags_result,
             ingredients=ingredients_result,
             image=image_url,
+            image_variants=image_variant_urls(image.hash, image.has_derivatives),
+        )
+        self._publish_image_after_commit(
+            recipe=response, image=image, image_upload=image_upload
         )
         logger.info(f"Рецепт с id {recipe_result.id} успешно создан")
         return response
 
-    async def update(self, db, recipe_data: RecipeUpdateRequest, id: int):
-        """Обновление рецепта по его id."""
-        recipe_image_id_stmt = (
-            select(RecipeModel.image).filter_by(id=id).scalar_subquery()
+    async def update(
+        self, db, recipe_data: RecipeUpdateRequest, id: int, image_upload=None
+    ):
+        """Обновление рецепта по его id.
+
+        Новая картинка передается строкой base64 в recipe_data.image или
+        загруженным файлом image_upload. Файлы меняются только после commit.
+        """
+        if image_upload is None and recipe_data.image:
+            image_upload = await media_io.run(
+                UploadedImage.from_base64, recipe_data.image
+            )
+        if image_upload is not None:
+            after_rollback(self.session, lambda: media_io.run(image_upload.discard))
+        current_image_stmt = (
+            select(ImageModel)
+            .join(self.model, self.model.image == ImageModel.id)
+            .filter(self.model.id == id)
         )
-        current_image_stmt = select(ImageModel).filter(
-            ImageModel.id == recipe_image_id_stmt,
+        current_image = await self.session.execute(current_image_stmt)
+        image = ImageRead.model_validate(
+            current_image.scalars().one(), from_attributes=True
         )
-        file_to_delete = await self.session.execute(current_image_stmt)
-        file_to_delete = file_to_delete.scalars().one()
+        current_image_id = image.id
+        image_data = None
+        if image_upload is not None:
+            image_data = await media_io.run(image_upload.describe)
         try:
-            if recipe_data.image:
-                media_path = pathlib.Path(__file__).parent.parent.resolve()
-                image_to_delete = f"{media_path}{MOUNT_PATH}/{file_to_delete.name}"
-                if os.path.exists(image_to_delete):
-                    os.remove(image_to_delete)
-                logger.info(
-                    f"Изображение {file_to_delete.name} для рецета с id {id} успешно удалено"
-                )
-                image_base64 = recipe_data.image
-                generated_image_name = ImageManager().create_random_name(image_base64)
-                while await self.check_image_name(generated_image_name):
-                    generated_image_name = ImageManager().create_random_name(
-                        image_base64
-                    )
-                image_url = f"{MAIN_URL}{MOUNT_PATH}" f"/{generated_image_name}"
-                image_id = await self.create_image(
-                    name=generated_image_name, base64=image_base64
-                )
-                ImageManager().base64_to_file(
-                    base64_string=image_base64, image_name=generated_image_name
-                )
-                logger.info(
-                    f"Изображение {generated_image_name} для рецета с id {id} успешно создано"
-                )
-                recipe_data.image = image_id
-                updated_image_stmt = (
-                    update(ImageModel)
-                    .filter_by(id=file_to_delete.id)
-                    .values(name=generated_image_name, base64=image_base64)
-                    .returning(ImageModel)
-                )
-                await self.session.execute(updated_image_stmt)
-
-            else:
-                image_url = f"{MAIN_URL}{MOUNT_PATH}" f"/{file_to_delete.name}"
+            recipe_values = dict(
+                name=recipe_data.name,
+                text=recipe_data.text,
+                cooking_time=recipe_data.cooking_time,
+            )
+            if image_data is not None:
+                image = await db.images.acquire(image_data)
+                recipe_values["image"] = image.id
+            image_url = f"{MAIN_URL}{MOUNT_PATH}/{image.name}"
 
             updated_recipe_stmt = (
                 update(self.model)
                 .filter_by(id=id)
-                .values(
-                    name=recipe_data.name,
-                    text=recipe_data.text,
-                    cooking_time=recipe_data.cooking_time,
-                )
+                .values(**recipe_values)
                 .returning(self.model)
             )
             updated_recipe = await self.session.execute(updated_recipe_stmt)
             updated_recipe = updated_recipe.scalars().one()
+            image_to_delete = None
+            if image_data is not None:
+                image_to_delete = await db.images.release(current_image_id)
             user_result = await db.users.get_one_or_none(
                 user_id=updated_recipe.author, current_user_id=updated_recipe.id
             )
@@ -357,11 +759,13 @@ class RecipeRepository(BaseRepository):
                 _ingredients_data = await check_ingredient_duplicates_for_recipe(
                     ingredients_data=ingredients_data
                 )
+                await db.shopping_list_totals.remove_recipe(recipe_id=id)
                 ingredients_result = (
                     await db.ingredients_amount.change_recipe_ingredients(
                         ingredients_data=_ingredients_data, recipe_id=id, db=db
                     )
                 )
+                await db.shopping_list_totals.add_recipe(recipe_id=id)
             except Exception:
                 raise IngredientNotFoundException
 
@@ -374,6 +778,7 @@ class RecipeRepository(BaseRepository):
                 )
             except Exception:
                 raise TagNotFoundException
+
         response = self.schema(
             name=updated_recipe.name,
             text=updated_recipe.text,
@@ -383,68 +788,94 @@ class RecipeRepository(BaseRepository):
             tags=tags_result,
             ingredients=ingredients_result,
             image=image_url,
+            image_variants=image_variant_urls(image.hash, image.has_derivatives),
+            favorites_count=updated_recipe.favorites_count,
+            shopping_cart_count=updated_recipe.shopping_cart_count,
+        )
+        self._publish_image_after_commit(
+            recipe=response,
+            image=image,
+            image_upload=image_upload,
+            image_to_delete=image_to_delete,
         )
         logger.info(f"Рецепт с id {updated_recipe.id} успешно обновлен")
         return response
 
     async def delete(self, id):
-        """Удаление рецепта по его id."""
-        recipe_ingredient_amount_ids_stmt = select(
-            RecipeIngredientModel.ingredient_amount_id
-        ).filter_by(recipe_id=id)
-        recipe_ingredient_amount_ids = await self.session.execute(
-            recipe_ingredient_amount_ids_stmt
-        )
-        recipe_ingredient_amount_ids = recipe_ingredient_amount_ids.scalars().all()
+        """Удаление рецепта по его id.
+
+        Связи с ингредиентами удаляются каскадно, сами записи ingredientamount
+        общие для всех рецептов и остаются в БД. Ингредиенты рецепта
+        вычитаются из сумм списков покупок, в которых он был. Файл картинки удаляется,
+        только если на нее не ссылаются другие рецепты. Строка рецепта
+        блокируется заранее, чтобы параллельное добавление в список покупок
+        не прибавило ингредиенты после их вычитания.
+        """
+        await self.session.execute(
+            select(self.model.id).filter_by(id=id).with_for_update()
+        )
+        await ShoppingListTotalRepository(self.session).remove_recipe(recipe_id=id)
         recipe_to_delete_stmt = (
-            delete(self.model).filter_by(id=id).returning(self.model.image)
-        )
-        recipe_image_id = await self.session.execute(recipe_to_delete_stmt)
-        recipe_image_id = recipe_image_id.scalars().one()
-        recipe_image_to_delete_stmt = (
-            delete(ImageModel).filter_by(id=recipe_image_id).returning(ImageModel.name)
-        )
-        image_name_to_delete = await self.session.execute(recipe_image_to_delete_stmt)
-        image_name_to_delete = image_name_to_delete.scalars().one()
-        media_path = pathlib.Path(__file__).parent.parent.resolve()
-        image_to_delete = f"{media_path}{MOUNT_PATH}/{image_name_to_delete}"
-        if os.path.exists(image_to_delete):
-            os.remove(image_to_delete)
-            logger.info(
-                f"Изображение {image_name_to_delete} для рецета с id {id} успешно удалено"
-            )
-        recipe_ingredient_amount_ids_to_delete = list()
-        for id in recipe_ingredient_amount_ids:
-            current_obj_stmt = select(
-                RecipeIngredientModel.ingredient_amount_id
-            ).filter_by(ingredient_amount_id=id)
-            current_obj = await self.session.execute(current_obj_stmt)
-            current_obj = current_obj.scalars().one_or_none()
-            if not current_obj:
-                recipe_ingredient_amount_ids_to_delete.append(id)
-        if recipe_ingredient_amount_ids_to_delete:
-            ids_to_delete = delete(IngredientAmountModel).filter(
-                IngredientAmountModel.id.in_(recipe_ingredient_amount_ids_to_delete)
+            delete(self.model)
+            .filter_by(id=id)
+            .returning(self.model.image, self.model.author)
+        )
+        recipe_to_delete = await self.session.execute(recipe_to_delete_stmt)
+        recipe_to_delete = recipe_to_delete.one()
+        await CounterRepository(self.session).change(
+            UserModel, "recipes_count", [recipe_to_delete.author], -1
+        )
+        image_name_to_delete = await ImageRepository(self.session).release(
+            recipe_to_delete.image
+        )
+        if image_name_to_delete is not None:
+            after_commit(
+                self.session,
+                lambda: self._remove_image_files(image_name_to_delete),
             )
-            await self.session.execute(ids_to_delete)
-            logger.info(f"Рецепт с id {id} успешно удален")
-
-    async def check_image_name(self, new_image_name: str):
-        """Проверка уникальности названия картинки."""
-        image_stmt = select(ImageModel).filter_by(name=new_image_name)
-        result = await self.session.execute(image_stmt)
-        return result.scalars().one_or_none()
-
-    async def create_image(self, name, base64):
-        """Создание записи в БД с данными (названием и
-        исходных base64) новой картинки."""
-        image_stmt = (
-            insert(ImageModel)
-            .values({"name": name, "base64": base64})
-            .returning(ImageModel.id)
-        )
-        image_result = await self.session.execute(image_stmt)
-        return image_result.scalars().one()
+        logger.info(f"Рецепт с id {id} успешно удален")
+
+    def _publish_image_after_commit(
+        self, recipe, image: ImageRead, image_upload=None, image_to_delete=None
+    ):
+        """Изменение файлов картинки рецепта после фиксации транзакции.
+
+        Новый файл переносится на место, для картинки создаются уменьшенные
+        копии, а файлы картинки, на которую больше нет ссылок, удаляются.
+        Ссылки на копии проставляются в уже собранный ответ.
+        """
+
+        async def publish():
+            if image_upload is not None:
+                await media_io.run(image_upload.save)
+                logger.info(f"Изображение {image.name} успешно сохранено")
+            async with async_session_maker() as session:
+                if await ImageRepository(session).generate_derivatives(image):
+                    await session.commit()
+                    recipe.image_variants = image_variant_urls(image.hash, True)
+            if image_to_delete is not None:
+                await self._remove_image_files(image_to_delete)
+
+        after_commit(self.session, publish)
+
+    @staticmethod
+    async def _remove_image_files(image_name: str):
+        """Удаление файлов картинки, на которую больше нет ссылок.
+
+        Выполняется в отдельной короткой транзакции под блокировкой
+        по содержимому картинки: если за это время те же байты загрузили
+        заново и запись картинки появилась снова, файлы остаются.
+        """
+        image_hash = image_name.rsplit(".", 1)[0]
+        async with async_session_maker() as session:
+            images = ImageRepository(session)
+            await images.lock_hash(image_hash)
+            if await images.exists(image_hash):
+                logger.info(f"Изображение {image_name} загружено повторно")
+                return
+            await media_io.run(remove_image_files, image_name)
+            await session.commit()
+        logger.info(f"Изображение {image_name} успешно удалено")
 
     async def check_recipe_exists(self, id: int):
         """Проверка на наличие рецепта в бд с указанным id."""
@@ -1,70 +1,128 @@
+from fastapi import Response, status
 from fastapi.responses import FileResponse
-from sqlalchemy import func, select, delete
+from sqlalchemy import select, delete
 from sqlalchemy.exc import NoResultFound
 
-from backend.src.models.ingredients import (
-    IngredientAmountModel,
-    IngredientModel,
-    RecipeIngredientModel,
-)
-from backend.src.models.recipes import ShoppingCartModel
+from backend.src.models.recipes import RecipeModel, ShoppingCartModel
 from backend.src.models.users import UserModel
 from backend.src.repositories.favorite_recipes import FavoriteRecipeRepository
+from backend.src.repositories.shopping_list_totals import ShoppingListTotalRepository
 from backend.src.schemas.recipes import ShoppingCartRecipeRead
-from backend.src.utils.pdf_shopping_list import create_shopping_list
+from backend.src.setup import shopping_list_cache, shopping_list_renderer
 
 
 class ShoppingCartRepository(FavoriteRecipeRepository):
     model = ShoppingCartModel
     schema = ShoppingCartRecipeRead
+    counter = "shopping_cart_count"
 
-    async def get_shopping_cart(self, user_id):
-        """Ответ со списком покупок в формате pdf."""
-        user_product_list_stmt = (
-            select(
-                IngredientModel.name,
-                (func.count(IngredientModel.name) * IngredientAmountModel.amount).label(
-                    "total_amount"
-                ),
-                IngredientModel.measurement_unit,
-            )
-            .select_from(RecipeIngredientModel)
-            .group_by(IngredientModel.id, IngredientAmountModel.amount)
-            .filter(self.model.user_id == user_id)
-            .join(self.model, RecipeIngredientModel.recipe_id == self.model.recipe_id)
-            .join(
-                IngredientAmountModel,
-                IngredientAmountModel.id
-                == (RecipeIngredientModel.ingredient_amount_id),
+    async def _lock_recipes(self, recipes_stmt):
+        """Блокировка рецептов FOR SHARE до конца транзакции.
+
+        Изменение рецепта держит блокировку его строки, поэтому добавление
+        в список покупок дождется фиксации новых ингредиентов и прибавит
+        к суммам уже их, а не старые количества.
+        """
+        stmt = (
+            select(RecipeModel.id)
+            .filter(RecipeModel.id.in_(recipes_stmt))
+            .order_by(RecipeModel.id)
+            .with_for_update(read=True)
+        )
+        await self.session.execute(stmt)
+
+    async def create(self, data):
+        """Добавление рецепта в список покупок с пересчетом сумм
+        ингредиентов пользователя."""
+        await self._lock_recipes(self.recipes_by_ids([data.recipe_id]))
+        shopping_cart_recipe = await super().create(data)
+        await ShoppingListTotalRepository(self.session).add_recipe(
+            recipe_id=data.recipe_id, user_id=data.user_id
+        )
+        return shopping_cart_recipe
+
+    async def add_many(self, user_id: int, recipes_stmt) -> dict[int, bool]:
+        """Добавление рецептов в список покупок одним запросом с пересчетом
+        сумм ингредиентов по добавленным рецептам."""
+        await self._lock_recipes(recipes_stmt)
+        result = await super().add_many(user_id, recipes_stmt)
+        added_ids = [recipe_id for recipe_id, added in result.items() if added]
+        if added_ids:
+            await ShoppingListTotalRepository(self.session).add_recipes(
+                recipe_ids=added_ids, user_id=user_id
             )
-            .join(
-                IngredientModel,
-                IngredientModel.id == IngredientAmountModel.ingredient_id,
+        return result
+
+    async def remove_many(self, user_id: int, recipe_ids: list[int]) -> list[int]:
+        """Удаление рецептов из списка покупок одним запросом с пересчетом
+        сумм ингредиентов."""
+        removed_ids = await super().remove_many(user_id, recipe_ids)
+        if removed_ids:
+            await ShoppingListTotalRepository(self.session).remove_recipes(
+                recipe_ids=removed_ids, user_id=user_id
             )
+        return removed_ids
+
+    async def stream_shopping_list(self, user_id):
+        """Строки списка покупок по мере чтения из БД."""
+        product_list = await self.session.stream(
+            ShoppingListTotalRepository(self.session).get_list_stmt(user_id)
         )
+        async for elem in product_list.mappings():
+            yield elem
+
+    async def get_username(self, user_id: int) -> str:
+        """Имя пользователя для заголовка списка покупок."""
         username_stmt = select(UserModel.username).filter_by(id=user_id)
         username = await self.session.execute(username_stmt)
-        username = username.scalars().one()
-        product_list = await self.session.execute(user_product_list_stmt)
-        result_list = [
-            f'{elem["name"].capitalize()} - {elem["total_amount"]} {elem["measurement_unit"]}'
-            for elem in product_list.mappings().all()
-        ]
-        pdf_file = create_shopping_list(data=result_list, username=username)
-        return FileResponse(
-            path=pdf_file,
-            media_type="multipart/form-data",
-            headers={
-                "Content-Type": "application/pdf",
-                "Content-Disposition": f'attachment; filename={pdf_file.split("/")[-1]}',
-            },
+        return username.scalars().one()
+
+    async def get_shopping_cart(self, user_id, if_none_match: str | None = None):
+        """Ответ со списком покупок в формате pdf.
+
+        Список читается из сохраненных сумм ингредиентов пользователя.
+        Документ кэшируется по списку продуктов: при неизменной
+        корзине отдается готовый файл, а при совпадении ETag из
+        If-None-Match - ответ 304 без тела.
+        """
+        username = await self.get_username(user_id)
+        result_list = await self.session.execute(
+            ShoppingListTotalRepository(self.session).get_list_stmt(user_id)
         )
+        result_list = result_list.scalars().all()
+        key = shopping_list_cache.make_key(user_id, username, result_list, "pdf")
+        headers = {
+            "Content-Disposition": "attachment; filename=shopping_list.pdf",
+            "ETag": shopping_list_cache.make_etag(key),
+            "Cache-Control": "private, no-cache",
+        }
+        if if_none_match and headers["ETag"] in (
+            tag.strip() for tag in if_none_match.split(",")
+        ):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        pdf_file = await shopping_list_cache.get(key, "pdf")
+        if pdf_file is not None:
+            return FileResponse(
+                path=pdf_file, media_type="application/pdf", headers=headers
+            )
+        pdf, timing = await shopping_list_renderer.create_shopping_list(
+            data=result_list, username=username
+        )
+        await shopping_list_cache.put(key, "pdf", pdf)
+        headers["Server-Timing"] = timing.server_timing
+        return Response(content=pdf, media_type="application/pdf", headers=headers)
 
     async def delete(self, **filter_by):
-        """Удаление рецепта из списка покупок."""
+        """Удаление рецепта из списка покупок с пересчетом сумм
+        ингредиентов пользователя."""
         stmt = delete(self.model).filter_by(**filter_by).returning(self.model)
         sub_to_delete = await self.session.execute(stmt)
         try:
-            return sub_to_delete.scalars().one()
+            sub_to_delete = sub_to_delete.scalars().one()
         except NoResultFound:
             raise NoResultFound
+        await self._change_counter([sub_to_delete.recipe_id], -1)
+        await ShoppingListTotalRepository(self.session).remove_recipe(
+            recipe_id=sub_to_delete.recipe_id, user_id=sub_to_delete.user_id
+        )
+        return sub_to_delete
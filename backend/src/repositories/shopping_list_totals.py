@@ -0,0 +1,208 @@
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    any_,
+    cast,
+    delete,
+    func,
+    literal,
+    select,
+    true,
+    union,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.src.models.ingredients import (
+    IngredientAmountModel,
+    IngredientModel,
+    RecipeIngredientModel,
+)
+from backend.src.models.recipes import ShoppingCartModel, ShoppingListTotalModel
+from backend.src.repositories.base import BaseRepository
+
+
+class ShoppingListTotalRepository(BaseRepository):
+    """Суммы ингредиентов в списках покупок пользователей.
+
+    При добавлении рецепта в список покупок его ингредиенты прибавляются
+    к суммам пользователя, при удалении - вычитаются, поэтому для выгрузки
+    списка не нужно заново соединять корзину со всеми ингредиентами.
+    """
+
+    model = ShoppingListTotalModel
+
+    @staticmethod
+    def _recipe_amounts(recipe_ids: list[int]):
+        return (
+            select(
+                IngredientAmountModel.ingredient_id,
+                func.sum(IngredientAmountModel.amount).label("amount"),
+                func.count(RecipeIngredientModel.recipe_id.distinct()).label(
+                    "recipes_count"
+                ),
+            )
+            .join(
+                RecipeIngredientModel,
+                RecipeIngredientModel.ingredient_amount_id == IngredientAmountModel.id,
+            )
+            .filter(
+                RecipeIngredientModel.recipe_id
+                == any_(cast(recipe_ids, ARRAY(Integer)))
+            )
+            .group_by(IngredientAmountModel.ingredient_id)
+            .subquery()
+        )
+
+    @staticmethod
+    def _user(user_id: int):
+        return select(literal(user_id).label("user_id")).subquery()
+
+    @staticmethod
+    def _cart_users(recipe_id: int):
+        """Все пользователи, у которых рецепт в списке покупок."""
+        return (
+            select(ShoppingCartModel.user_id)
+            .filter(ShoppingCartModel.recipe_id == recipe_id)
+            .subquery()
+        )
+
+    async def _add(self, amounts, users):
+        stmt = insert(self.model).from_select(
+            ["user_id", "ingredient_id", "total_amount", "recipes_count"],
+            select(
+                users.c.user_id,
+                amounts.c.ingredient_id,
+                amounts.c.amount,
+                amounts.c.recipes_count,
+            ).select_from(users.join(amounts, true())),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique shopping list ingredient",
+            set_={
+                "total_amount": self.model.total_amount + stmt.excluded.total_amount,
+                "recipes_count": self.model.recipes_count + stmt.excluded.recipes_count,
+            },
+        )
+        await self.session.execute(stmt)
+
+    async def _remove(self, amounts, users):
+        await self.session.execute(
+            update(self.model)
+            .values(
+                total_amount=self.model.total_amount - amounts.c.amount,
+                recipes_count=self.model.recipes_count - amounts.c.recipes_count,
+            )
+            .filter(
+                self.model.ingredient_id == amounts.c.ingredient_id,
+                self.model.user_id.in_(select(users.c.user_id)),
+            )
+        )
+        await self.session.execute(
+            delete(self.model).filter(
+                self.model.recipes_count <= 0,
+                self.model.user_id.in_(select(users.c.user_id)),
+            )
+        )
+
+    async def add_recipe(self, recipe_id: int, user_id: int | None = None):
+        """Прибавление ингредиентов рецепта к суммам пользователя или всех
+        пользователей, у которых рецепт в списке покупок."""
+        users = self._cart_users(recipe_id) if user_id is None else self._user(user_id)
+        await self._add(self._recipe_amounts([recipe_id]), users)
+
+    async def remove_recipe(self, recipe_id: int, user_id: int | None = None):
+        """Вычитание ингредиентов рецепта из сумм, ингредиенты, которых
+        больше нет ни в одном рецепте списка, удаляются."""
+        users = self._cart_users(recipe_id) if user_id is None else self._user(user_id)
+        await self._remove(self._recipe_amounts([recipe_id]), users)
+
+    async def add_recipes(self, recipe_ids: list[int], user_id: int):
+        """Прибавление ингредиентов нескольких рецептов к суммам пользователя."""
+        await self._add(self._recipe_amounts(recipe_ids), self._user(user_id))
+
+    async def remove_recipes(self, recipe_ids: list[int], user_id: int):
+        """Вычитание ингредиентов нескольких рецептов из сумм пользователя."""
+        await self._remove(self._recipe_amounts(recipe_ids), self._user(user_id))
+
+    def get_list_stmt(self, user_id: int):
+        """Список покупок пользователя: строки отсортированы и
+        отформатированы как "Название - количество единица"."""
+        name = func.concat(
+            func.upper(func.left(IngredientModel.name, 1)),
+            func.lower(func.substr(IngredientModel.name, 2)),
+        ).label("name")
+        return (
+            select(
+                func.concat(
+                    name,
+                    " - ",
+                    self.model.total_amount,
+                    " ",
+                    IngredientModel.measurement_unit,
+                ).label("line"),
+                name,
+                self.model.total_amount,
+                IngredientModel.measurement_unit,
+            )
+            .join(IngredientModel, IngredientModel.id == self.model.ingredient_id)
+            .filter(self.model.user_id == user_id)
+            .order_by(
+                func.lower(IngredientModel.name), IngredientModel.measurement_unit
+            )
+        )
+
+    @staticmethod
+    def _computed_totals_stmt(user_id: int | None = None):
+        """Суммы, посчитанные заново по спискам покупок."""
+        stmt = (
+            select(
+                ShoppingCartModel.user_id,
+                IngredientAmountModel.ingredient_id,
+                func.sum(IngredientAmountModel.amount).label("total_amount"),
+                func.count(ShoppingCartModel.recipe_id.distinct()).label(
+                    "recipes_count"
+                ),
+            )
+            .join(
+                RecipeIngredientModel,
+                RecipeIngredientModel.recipe_id == ShoppingCartModel.recipe_id,
+            )
+            .join(
+                IngredientAmountModel,
+                IngredientAmountModel.id == RecipeIngredientModel.ingredient_amount_id,
+            )
+            .group_by(ShoppingCartModel.user_id, IngredientAmountModel.ingredient_id)
+        )
+        if user_id is not None:
+            stmt = stmt.filter(ShoppingCartModel.user_id == user_id)
+        return stmt
+
+    async def rebuild(self, user_id: int | None = None):
+        """Пересчет сумм с нуля для пользователя или для всех."""
+        delete_stmt = delete(self.model)
+        if user_id is not None:
+            delete_stmt = delete_stmt.filter(self.model.user_id == user_id)
+        await self.session.execute(delete_stmt)
+        await self.session.execute(
+            insert(self.model).from_select(
+                ["user_id", "ingredient_id", "total_amount", "recipes_count"],
+                self._computed_totals_stmt(user_id),
+            )
+        )
+
+    async def get_inconsistent_users(self) -> list[int]:
+        """id пользователей, у которых сохраненные суммы расходятся
+        с посчитанными заново."""
+        stored = select(
+            self.model.user_id,
+            self.model.ingredient_id,
+            self.model.total_amount,
+            self.model.recipes_count,
+        )
+        computed = self._computed_totals_stmt()
+        difference = union(stored.except_(computed), computed.except_(stored))
+        difference = difference.subquery()
+        stmt = select(difference.c.user_id).distinct().order_by(difference.c.user_id)
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
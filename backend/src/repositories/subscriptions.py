@@ -1,7 +1,21 @@
+from collections import defaultdict
+
 from asyncpg import ForeignKeyViolationError, UniqueViolationError
-from sqlalchemy import delete, func, insert, select
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    and_,
+    any_,
+    cast,
+    delete,
+    desc,
+    func,
+    insert,
+    select,
+    true,
+    tuple_,
+)
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from sqlalchemy.orm import load_only
 
 from backend.src.constants import MAIN_URL, MOUNT_PATH
 from backend.src.exceptions.subscriptions import (
@@ -10,22 +24,167 @@ from backend.src.exceptions.subscriptions import (
     SubscriptionNotFoundException,
 )
 from backend.src.exceptions.users import UserNotFoundException
-from backend.src.models.recipes import RecipeModel
+from backend.src.models.recipes import ImageModel, RecipeModel
 from backend.src.models.subscriptions import SubscriptionModel
 from backend.src.models.users import UserModel
 from backend.src.repositories.base import BaseRepository
-from backend.src.repositories.utils.paginator import url_paginator
+from backend.src.repositories.counters import CounterRepository
+from backend.src.repositories.utils.paginator import (
+    cursor_paginator,
+    decode_cursor,
+    encode_cursor,
+    url_paginator,
+)
+from backend.src.repositories.utils.transaction_hooks import after_commit
 from backend.src.schemas.subscriptions import SubscriptionCreate, SubscriptionListRead
 from backend.src.schemas.users import (
     FollowedUserRead,
     FollowedUserWithRecipiesRead,
     ShortRecipeRead,
 )
+from backend.src.utils.image_derivatives import image_variant_urls
+from backend.src.utils.subscription_cache import SubscriptionGraphCache
 
 
 class SubscriptionRepository(BaseRepository):
     model = SubscriptionModel
     schema = FollowedUserRead
+    graph_cache = SubscriptionGraphCache()
+    followed_user_columns = (
+        UserModel.id,
+        UserModel.email,
+        UserModel.username,
+        UserModel.first_name,
+        UserModel.last_name,
+        UserModel.recipes_count,
+        UserModel.followers_count,
+        UserModel.following_count,
+    )
+
+    async def get_following_ids(self, subscriber_id: int) -> list[int]:
+        """id всех авторов, на которых подписан пользователь."""
+        stmt = select(self.model.author_id).filter(
+            self.model.subscriber_id == subscriber_id
+        )
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
+    async def get_all_follows(self) -> dict[int, list[int]]:
+        """Подписки всех пользователей: id подписчика и id авторов."""
+        stmt = select(self.model.subscriber_id, self.model.author_id).order_by(
+            self.model.subscriber_id
+        )
+        result = await self.session.execute(stmt)
+        follows = defaultdict(list)
+        for subscriber_id, author_id in result.all():
+            follows[subscriber_id].append(author_id)
+        return dict(follows)
+
+    async def get_subscribed_author_ids(
+        self, subscriber_id: int, author_ids
+    ) -> set[int]:
+        """id авторов из author_ids, на которых подписан пользователь.
+
+        Подписки читаются из кэша в Redis, при промахе все подписки
+        пользователя загружаются в кэш из БД. Без Redis выполняется
+        запрос только по переданным авторам.
+        """
+        author_ids = list(author_ids)
+        if not author_ids:
+            return set()
+        subscribed = await self.graph_cache.get_subscribed(subscriber_id, author_ids)
+        if subscribed is not None:
+            return subscribed
+        if self.graph_cache.enabled:
+            version = await self.graph_cache.get_version(subscriber_id)
+            following_ids = await self.get_following_ids(subscriber_id)
+            await self.graph_cache.load(subscriber_id, following_ids, version=version)
+            return set(following_ids).intersection(author_ids)
+        stmt = select(self.model.author_id).filter(
+            self.model.subscriber_id == subscriber_id,
+            self.model.author_id == any_(cast(author_ids, ARRAY(Integer))),
+        )
+        result = await self.session.execute(stmt)
+        return set(result.scalars().all())
+
+    async def get_authors_recipes(
+        self, author_ids: list[int], recipes_limit: int | None
+    ) -> dict[int, list[ShortRecipeRead]]:
+        """Последние recipes_limit рецептов каждого автора.
+
+        Рецепты выбираются боковым подзапросом с LIMIT по индексу
+        (author, id), поэтому стоимость не зависит от того, сколько всего
+        рецептов у автора. Без recipes_limit возвращаются все рецепты.
+        """
+        if not author_ids:
+            return {}
+        latest_recipes = (
+            select(
+                RecipeModel.id,
+                RecipeModel.name,
+                RecipeModel.cooking_time,
+                RecipeModel.image,
+            )
+            .filter(RecipeModel.author == UserModel.id)
+            .order_by(desc(RecipeModel.id))
+        )
+        if recipes_limit is not None:
+            latest_recipes = latest_recipes.limit(max(recipes_limit, 0))
+        latest_recipes = latest_recipes.lateral("latest_recipes")
+        recipes_stmt = (
+            select(
+                UserModel.id.label("author_id"),
+                latest_recipes.c.id,
+                latest_recipes.c.name,
+                latest_recipes.c.cooking_time,
+                ImageModel.name.label("image"),
+                ImageModel.hash.label("image_hash"),
+                ImageModel.has_derivatives,
+            )
+            .select_from(UserModel)
+            .join(latest_recipes, true())
+            .join(ImageModel, ImageModel.id == latest_recipes.c.image)
+            .filter(UserModel.id == any_(cast(author_ids, ARRAY(Integer))))
+            .order_by(UserModel.id, desc(latest_recipes.c.id))
+        )
+        recipes_result = await self.session.execute(recipes_stmt)
+        recipes = defaultdict(list)
+        for recipe in recipes_result.all():
+            recipes[recipe.author_id].append(
+                ShortRecipeRead(
+                    image=f"{MAIN_URL}{MOUNT_PATH}/{recipe.image}",
+                    image_variants=image_variant_urls(
+                        recipe.image_hash, recipe.has_derivatives
+                    ),
+                    id=recipe.id,
+                    name=recipe.name,
+                    cooking_time=recipe.cooking_time,
+                )
+            )
+        return dict(recipes)
+
+    async def _followed_users(
+        self, authors, recipes_limit: int | None
+    ) -> list[FollowedUserWithRecipiesRead]:
+        """Авторы с последними рецептами и счетчиками."""
+        recipes = await self.get_authors_recipes(
+            author_ids=[obj.id for obj in authors], recipes_limit=recipes_limit
+        )
+        return [
+            FollowedUserWithRecipiesRead(
+                email=obj.email,
+                id=obj.id,
+                username=obj.username,
+                first_name=obj.first_name,
+                last_name=obj.last_name,
+                is_subscribed=True,
+                recipes=recipes.get(obj.id, []),
+                recipes_count=obj.recipes_count,
+                followers_count=obj.followers_count,
+                following_count=obj.following_count,
+            )
+            for obj in authors
+        ]
 
     async def get_user_subs(
         self,
@@ -35,77 +194,77 @@ class SubscriptionRepository(BaseRepository):
         page: int,
         recipes_limit: int,
         router_prefix: str,
+        cursor: str | None = None,
     ):
-        """Получение списка подписок пользователя."""
-        author_ids = (
-            select(self.model.author_id)
-            .filter_by(subscriber_id=user_id)
-            .scalar_subquery()
-        )
-        user_subs_count_stmt = (
-            select(func.coalesce(func.count("*").label("subs_count"), 0))
-            .select_from(self.model)
-            .filter_by(subscriber_id=user_id)
-            .group_by(self.model.subscriber_id)
-        )
-        user_subs_count = await self.session.execute(user_subs_count_stmt)
-        user_subs_count = user_subs_count.scalars().one_or_none()
-        if not user_subs_count:
-            user_subs_count = 0
+        """Получение списка подписок пользователя.
+
+        При выводе по курсору число подписок возвращается только
+        на первой странице.
+        """
         user_subs_stmt = (
-            select(UserModel)
-            .filter(UserModel.id.in_(author_ids))
-            .limit(limit)
-            .outerjoin(RecipeModel, RecipeModel.author == UserModel.id)
-            .options(
-                load_only(
-                    UserModel.id,
-                    UserModel.email,
-                    UserModel.username,
-                    UserModel.first_name,
-                    UserModel.last_name,
-                )
-                .selectinload(UserModel.recipe)
-                .load_only(
-                    RecipeModel.id,
-                    RecipeModel.name,
-                    RecipeModel.image,
-                    RecipeModel.cooking_time,
-                )
-                .selectinload(RecipeModel.image_info)
+            select(*self.followed_user_columns, self.model.id.label("subscription_id"))
+            .join(
+                self.model,
+                and_(
+                    self.model.author_id == UserModel.id,
+                    self.model.subscriber_id == user_id,
+                ),
             )
+            .order_by(self.model.id, UserModel.id)
         )
-        if offset:
-            user_subs_stmt = user_subs_stmt.offset(offset)
-        user_subs_result = await self.session.execute(user_subs_stmt)
-        user_subs_result = user_subs_result.unique().scalars().all()
-        paginator_values = url_paginator(
-            limit=limit, page=page, count=user_subs_count, router_prefix=router_prefix
-        )
-        result_list = list()
-        for obj in user_subs_result:
-            recipe_list = list()
-            for recipe in obj.recipe:
-                recipe_list.append(
-                    ShortRecipeRead(
-                        image=(f"{MAIN_URL}{MOUNT_PATH}/{recipe.image_info.name}"),
-                        id=recipe.id,
-                        name=recipe.name,
-                        cooking_time=recipe.cooking_time,
-                    )
+        current_cursor = None
+        if cursor is not None:
+            current_cursor = decode_cursor(cursor)
+            if current_cursor:
+                user_subs_stmt = user_subs_stmt.filter(
+                    tuple_(self.model.id, UserModel.id)
+                    > tuple_(current_cursor.sort_key, current_cursor.id)
                 )
-            result_list.append(
-                FollowedUserWithRecipiesRead(
-                    email=obj.email,
-                    id=obj.id,
-                    username=obj.username,
-                    first_name=obj.first_name,
-                    last_name=obj.last_name,
-                    is_subscribed=True,
-                    recipes=recipe_list[:recipes_limit],
-                    recipes_count=len(recipe_list),
+            user_subs_stmt = user_subs_stmt.limit(limit + 1)
+        else:
+            user_subs_stmt = user_subs_stmt.limit(limit)
+            if offset:
+                user_subs_stmt = user_subs_stmt.offset(offset)
+        user_subs_result = await self.session.execute(user_subs_stmt)
+        user_subs_result = user_subs_result.all()
+        user_subs_count = None
+        if current_cursor is None:
+            user_subs_count_stmt = (
+                select(func.coalesce(func.count("*").label("subs_count"), 0))
+                .select_from(self.model)
+                .filter_by(subscriber_id=user_id)
+                .group_by(self.model.subscriber_id)
+            )
+            user_subs_count = await self.session.execute(user_subs_count_stmt)
+            user_subs_count = user_subs_count.scalars().one_or_none()
+            if not user_subs_count:
+                user_subs_count = 0
+        query_params = {"recipes_limit": recipes_limit}
+        if cursor is not None:
+            next_cursor = None
+            if len(user_subs_result) > limit:
+                user_subs_result = user_subs_result[:limit]
+                next_cursor = encode_cursor(
+                    sort_key=user_subs_result[-1].subscription_id,
+                    id=user_subs_result[-1].id,
                 )
+            paginator_values = cursor_paginator(
+                limit=limit,
+                next_cursor=next_cursor,
+                router_prefix=router_prefix,
+                query_params=query_params,
+            )
+        else:
+            paginator_values = url_paginator(
+                limit=limit,
+                page=page,
+                count=user_subs_count,
+                router_prefix=router_prefix,
+                query_params=query_params,
             )
+        result_list = await self._followed_users(
+            authors=user_subs_result, recipes_limit=recipes_limit
+        )
         response = SubscriptionListRead(
             count=user_subs_count,
             next=paginator_values["next"],
@@ -131,59 +290,37 @@ class SubscriptionRepository(BaseRepository):
                 raise UserNotFoundException
             elif isinstance(ex.orig.__cause__, UniqueViolationError):
                 raise UniqueConstraintSubscriptionException
-        user_info_stmt = (
-            select(UserModel)
-            .filter(UserModel.id == new_sub_result)
-            .outerjoin(RecipeModel, RecipeModel.author == UserModel.id)
-            .options(
-                load_only(
-                    UserModel.id,
-                    UserModel.email,
-                    UserModel.username,
-                    UserModel.first_name,
-                    UserModel.last_name,
-                )
-                .selectinload(UserModel.recipe)
-                .load_only(
-                    RecipeModel.id,
-                    RecipeModel.name,
-                    RecipeModel.image,
-                    RecipeModel.cooking_time,
-                )
-                .selectinload(RecipeModel.image_info)
-            )
+        await CounterRepository(self.session).change_subscription(
+            author_id=data.author_id, subscriber_id=data.subscriber_id, delta=1
         )
-
-        user_info = await self.session.execute(user_info_stmt)
-        user_info = user_info.unique().scalars().one()
-        recipe_list = list()
-        if user_info.recipe:
-            for recipe in user_info.recipe:
-                recipe_list.append(
-                    ShortRecipeRead(
-                        image=(f"{MAIN_URL}{MOUNT_PATH}/{recipe.image_info.name}"),
-                        id=recipe.id,
-                        name=recipe.name,
-                        cooking_time=recipe.cooking_time,
-                    )
-                )
-        sub_response = FollowedUserWithRecipiesRead(
-            email=user_info.email,
-            id=user_info.id,
-            username=user_info.username,
-            first_name=user_info.first_name,
-            last_name=user_info.last_name,
-            is_subscribed=True,
-            recipes=recipe_list[:recipes_limit],
-            recipes_count=len(recipe_list),
+        after_commit(
+            self.session,
+            lambda: self.graph_cache.invalidate(data.subscriber_id),
+        )
+        author_stmt = select(*self.followed_user_columns).filter(
+            UserModel.id == new_sub_result
+        )
+        author = await self.session.execute(author_stmt)
+        followed_users = await self._followed_users(
+            authors=author.all(), recipes_limit=recipes_limit
         )
-        return sub_response
+        return followed_users[0]
 
     async def delete(self, **filter_by):
         """Удаление подписки."""
         stmt = delete(self.model).filter_by(**filter_by).returning(self.model)
         sub_to_delete = await self.session.execute(stmt)
         try:
-            return sub_to_delete.scalars().one()
+            sub_to_delete = sub_to_delete.scalars().one()
         except NoResultFound:
             raise SubscriptionNotFoundException
+        await CounterRepository(self.session).change_subscription(
+            author_id=sub_to_delete.author_id,
+            subscriber_id=sub_to_delete.subscriber_id,
+            delta=-1,
+        )
+        after_commit(
+            self.session,
+            lambda: self.graph_cache.invalidate(sub_to_delete.subscriber_id),
+        )
+        return sub_to_delete
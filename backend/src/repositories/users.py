@@ -1,26 +1,36 @@
 from datetime import datetime, timezone, timedelta
+from uuid import uuid4
 
 import jwt
-from passlib.context import CryptContext
 from sqlalchemy import func, select
 from sqlalchemy.exc import NoResultFound
 
 from backend.src.config import settings
+from backend.src.constants import SUPERUSER_ROLE, USER_ROLE
 from backend.src.exceptions.users import (
     IncorrectPasswordException,
     IncorrectTokenException,
     UserNotFoundException,
 )
-from backend.src.models.subscriptions import SubscriptionModel
 from backend.src.models.users import UserModel
 from backend.src.repositories.base import BaseRepository
-from backend.src.repositories.utils.paginator import url_paginator
+from backend.src.repositories.subscriptions import SubscriptionRepository
+from backend.src.repositories.utils.transaction_hooks import after_commit
+from backend.src.repositories.utils.paginator import (
+    cursor_paginator,
+    decode_cursor,
+    encode_cursor,
+    url_paginator,
+)
 from backend.src.schemas.users import (
     FollowedUserRead,
     UserCreateResponse,
     UserListRead,
+    UserPasswordChangeRequest,
     UserWithHashedPasswordRead,
 )
+from backend.src.setup import password_manager
+from backend.src.utils.user_count_cache import UserCountCache
 
 
 class UserRepository(BaseRepository):
@@ -34,24 +44,51 @@ class UserRepository(BaseRepository):
         router_prefix: str,
         user_id: int | None = None,
         offset: int | None = None,
+        cursor: str | None = None,
     ):
-        """Получение списка пользователей."""
-        user_list_stmt = select(self.model).order_by(self.model.id).limit(limit)
-        if offset:
+        """Получение списка пользователей.
+
+        При выводе по курсору общее число пользователей возвращается
+        только на первой странице.
+        """
+        user_list_stmt = select(
+            self.model.id,
+            self.model.email,
+            self.model.username,
+            self.model.first_name,
+            self.model.last_name,
+            self.model.recipes_count,
+            self.model.followers_count,
+            self.model.following_count,
+        ).order_by(self.model.id)
+        current_cursor = None
+        if cursor is not None:
+            current_cursor = decode_cursor(cursor)
+            if current_cursor:
+                user_list_stmt = user_list_stmt.filter(
+                    self.model.id > current_cursor.id
+                )
+            user_list_stmt = user_list_stmt.limit(limit + 1)
+        else:
+            user_list_stmt = user_list_stmt.limit(limit)
+        if offset and cursor is None:
             user_list_stmt = user_list_stmt.offset(offset)
-        users_count_stmt = select(func.count("*").label("user_count")).select_from(
-            self.model
-        )
+        user_list = await self.session.execute(user_list_stmt)
+        user_list = user_list.all()
+        next_cursor = None
+        if cursor is not None and len(user_list) > limit:
+            user_list = user_list[:limit]
+            next_cursor = encode_cursor(sort_key=user_list[-1].id, id=user_list[-1].id)
+        subscribed_ids = set()
         if user_id:
-            sub_ids_stmt = select(SubscriptionModel.author_id).filter_by(
-                subscriber_id=user_id
+            subscribed_ids = await SubscriptionRepository(
+                self.session
+            ).get_subscribed_author_ids(
+                subscriber_id=user_id, author_ids=[obj.id for obj in user_list]
             )
-            sub_ids = await self.session.execute(sub_ids_stmt)
-            sub_ids = sub_ids.scalars().all()
-        user_list = await self.session.execute(user_list_stmt)
-        user_list = user_list.scalars().all()
-        users_count = await self.session.execute(users_count_stmt)
-        users_count = users_count.scalars().one()
+        users_count = None
+        if current_cursor is None:
+            users_count = await self.get_users_count()
         user_list_result = list()
         for obj in user_list:
             current_obj = FollowedUserRead(
@@ -60,16 +97,20 @@ class UserRepository(BaseRepository):
                 id=obj.id,
                 first_name=obj.first_name,
                 last_name=obj.last_name,
+                is_subscribed=obj.id in subscribed_ids,
+                recipes_count=obj.recipes_count,
+                followers_count=obj.followers_count,
+                following_count=obj.following_count,
             )
-            if user_id:
-                if obj.id not in sub_ids:
-                    current_obj.is_subscribed = False
-            else:
-                current_obj.is_subscribed = False
             user_list_result.append(current_obj)
-        paginator_values = url_paginator(
-            limit=limit, page=page, count=users_count, router_prefix=router_prefix
-        )
+        if cursor is not None:
+            paginator_values = cursor_paginator(
+                limit=limit, next_cursor=next_cursor, router_prefix=router_prefix
+            )
+        else:
+            paginator_values = url_paginator(
+                limit=limit, page=page, count=users_count, router_prefix=router_prefix
+            )
         response = UserListRead(
             count=users_count,
             next=paginator_values["next"],
@@ -78,6 +119,29 @@ class UserRepository(BaseRepository):
         )
         return response
 
+    async def get_users_count(self) -> int:
+        """Общее число пользователей: из кэша или запросом count(*)."""
+        user_count_cache = UserCountCache()
+        users_count = await user_count_cache.get()
+        if users_count is None:
+            users_count_stmt = select(func.count()).select_from(self.model)
+            users_count = await self.session.execute(users_count_stmt)
+            users_count = users_count.scalars().one()
+            await user_count_cache.set(users_count)
+        return users_count
+
+    async def create(self, data):
+        """Создание пользователя со сбросом кэша числа пользователей."""
+        new_user = await super().create(data)
+        after_commit(self.session, UserCountCache().invalidate)
+        return new_user
+
+    async def _is_subscribed(self, author_id: int, subscriber_id: int) -> bool:
+        subscribed_ids = await SubscriptionRepository(
+            self.session
+        ).get_subscribed_author_ids(subscriber_id=subscriber_id, author_ids=[author_id])
+        return author_id in subscribed_ids
+
     async def get_one(self, **filter_by):
         """Получение пользователя."""
         current_user_id = filter_by["current_user_id"]
@@ -88,6 +152,9 @@ class UserRepository(BaseRepository):
             self.model.last_name,
             self.model.username,
             self.model.email,
+            self.model.recipes_count,
+            self.model.followers_count,
+            self.model.following_count,
         ).filter_by(id=user_id)
         user_result = await self.session.execute(stmt)
 
@@ -95,17 +162,9 @@ class UserRepository(BaseRepository):
             user_result = user_result.mappings().one()
             result = FollowedUserRead.model_validate(user_result, from_attributes=True)
             if current_user_id:
-                if_subscribed_stmt = (
-                    select(SubscriptionModel)
-                    .select_from(SubscriptionModel)
-                    .filter_by(author_id=user_id, subscriber_id=current_user_id)
+                result.is_subscribed = await self._is_subscribed(
+                    author_id=user_id, subscriber_id=current_user_id
                 )
-                if_subscribed_result = await self.session.execute(if_subscribed_stmt)
-                if_subscribed_result = if_subscribed_result.scalars().one_or_none()
-                if if_subscribed_result:
-                    result.is_subscribed = True
-                    return result
-                return result
             return result
         except NoResultFound:
             raise UserNotFoundException
@@ -119,19 +178,11 @@ class UserRepository(BaseRepository):
 
         if user_result:
             result = FollowedUserRead.model_validate(user_result, from_attributes=True)
+            result.is_subscribed = False
             if current_user_id:
-                if_subscribed_stmt = (
-                    select(SubscriptionModel)
-                    .select_from(SubscriptionModel)
-                    .filter_by(author_id=user_id, subscriber_id=current_user_id)
+                result.is_subscribed = await self._is_subscribed(
+                    author_id=user_id, subscriber_id=current_user_id
                 )
-                if_subscribed_result = await self.session.execute(if_subscribed_stmt)
-                if_subscribed_result = if_subscribed_result.scalars().one_or_none()
-                if not if_subscribed_result:
-                    result.is_subscribed = False
-                    return result
-                return result
-            result.is_subscribed = False
             return result
 
     async def get_user_hashed_password(self, **filter_by):
@@ -146,33 +197,42 @@ class UserRepository(BaseRepository):
                 result, from_attributes=True
             )
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
     async def create_access_token(self, data) -> str:
-        """Создание JWT токена."""
+        """Создание JWT токена.
+
+        В токене только id пользователя, роль, срок действия и
+        идентификатор токена для отзыва. Если стоимость хеша пароля
+        отличается от настроенной, пароль хешируется заново и сохраняется
+        в той же транзакции.
+        """
         user = await self.get_user_hashed_password(email=data.email)
         if not user:
             raise UserNotFoundException
-        if not self.verify_password(data.password, user.hashed_password):
+        verified, new_hashed_password = await password_manager.verify_and_update(
+            data.password, user.hashed_password
+        )
+        if not verified:
             raise IncorrectPasswordException
-        to_encode = user.model_dump()
+        if new_hashed_password is not None:
+            await self.update(
+                id=user.id,
+                data=UserPasswordChangeRequest(hashed_password=new_hashed_password),
+                exclude_unset=True,
+            )
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-        to_encode |= {"exp": expire}
+        to_encode = {
+            "sub": str(user.id),
+            "role": SUPERUSER_ROLE if user.is_superuser else USER_ROLE,
+            "exp": expire,
+            "jti": uuid4().hex,
+        }
         encoded_jwt = jwt.encode(
             to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
         )
         return encoded_jwt
 
-    def hash_password(self, password: str) -> str:
-        """Хеширование пароля."""
-        return self.pwd_context.hash(password)
-
-    def verify_password(self, plain_password, hashed_password):
-        """Верификация пароля."""
-        return self.pwd_context.verify(plain_password, hashed_password)
-
     @staticmethod
     def decode_token(token: str) -> dict:
         """Получение данных пользователя из JWT токена."""
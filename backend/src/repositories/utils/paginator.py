@@ -1,19 +1,70 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
 from backend.src.constants import MAIN_URL
+from backend.src.exceptions.base import InvalidCursorException
+from backend.src.schemas.base import PaginationCursor
+
+
+def _clean_query_params(query_params):
+    """Отбрасывание пустых параметров фильтрации."""
+    if not query_params:
+        return dict()
+    return {
+        key: value
+        for key, value in query_params.items()
+        if value is not None and value != 0 and value != []
+    }
 
 
-def url_paginator(page, limit, count, router_prefix):
+def url_paginator(page, limit, count, router_prefix, query_params=None):
     url = f"{MAIN_URL}{router_prefix}"
+    query_params = _clean_query_params(query_params)
     next, previous = None, None
     if not page:
         page = 1
     if page * limit < count:
-        next = url + f"?page={page+1}&limit={limit}"
+        next_params = {"page": page + 1, "limit": limit} | query_params
+        next = url + f"?{urlencode(next_params, doseq=True)}"
 
     if page != 1:
         if page == 2:
-            previous = url + f"?limit={limit}"
+            previous_params = {"limit": limit} | query_params
         else:
-            previous = url + f"?page={page-1}&limit={limit}"
+            previous_params = {"page": page - 1, "limit": limit} | query_params
+        previous = url + f"?{urlencode(previous_params, doseq=True)}"
     if (page - 1) * limit > count:
         previous = None
     return {"next": next, "previous": previous}
+
+
+def encode_cursor(sort_key, id) -> str:
+    """Кодирование ключа сортировки и id последнего объекта страницы."""
+    payload = json.dumps([sort_key, id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> PaginationCursor | None:
+    """Декодирование курсора. Пустой курсор соответствует первой странице."""
+    if not cursor:
+        return None
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        sort_key, id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return PaginationCursor(sort_key=sort_key, id=id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorException
+
+
+def cursor_paginator(limit, next_cursor, router_prefix, query_params=None):
+    """Ссылки для постраничного вывода по курсору."""
+    url = f"{MAIN_URL}{router_prefix}"
+    next = None
+    if next_cursor:
+        next_params = {"cursor": next_cursor, "limit": limit} | _clean_query_params(
+            query_params
+        )
+        next = url + f"?{urlencode(next_params, doseq=True)}"
+    return {"next": next, "previous": None}
@@ -0,0 +1,37 @@
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+AFTER_COMMIT_KEY = "after_commit"
+AFTER_ROLLBACK_KEY = "after_rollback"
+
+
+def after_commit(session: AsyncSession, callback):
+    """Регистрация корутинной функции, которая выполнится после commit."""
+    session.info.setdefault(AFTER_COMMIT_KEY, list()).append(callback)
+
+
+def after_rollback(session: AsyncSession, callback):
+    """Регистрация корутинной функции, которая выполнится после rollback."""
+    session.info.setdefault(AFTER_ROLLBACK_KEY, list()).append(callback)
+
+
+async def _run_hooks(session: AsyncSession, key: str):
+    callbacks = session.info.pop(key, list())
+    session.info.pop(
+        AFTER_ROLLBACK_KEY if key == AFTER_COMMIT_KEY else AFTER_COMMIT_KEY, None
+    )
+    for callback in callbacks:
+        try:
+            await callback()
+        except Exception:
+            # Транзакция уже завершена, ошибка хука не должна превращать
+            # успешный запрос в ответ с ошибкой.
+            logger.exception(f"Ошибка при выполнении {key} хука {callback}")
+
+
+async def run_after_commit(session: AsyncSession):
+    await _run_hooks(session, AFTER_COMMIT_KEY)
+
+
+async def run_after_rollback(session: AsyncSession):
+    await _run_hooks(session, AFTER_ROLLBACK_KEY)
@@ -1,26 +1,160 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
 from backend.src.config import settings
 import jwt
 
-from backend.src.exceptions.users import IncorrectTokenException, ExpiredTokenException
+from backend.src.exceptions.users import (
+    IncorrectTokenException,
+    ExpiredTokenException,
+    PasswordHasherBusyException,
+)
+
+
+class PasswordHashMetrics:
+    """Счетчики и время хеширования и проверки паролей."""
+
+    def __init__(self):
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.in_progress = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+
+    def observe(self, queue_seconds: float, hash_seconds: float):
+        self.completed += 1
+        self.total_queue_seconds += queue_seconds
+        self.total_hash_seconds += hash_seconds
+        self.max_queue_seconds = max(self.max_queue_seconds, queue_seconds)
+        self.max_hash_seconds = max(self.max_hash_seconds, hash_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "in_progress": self.in_progress,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "avg_hash_seconds": (
+                self.total_hash_seconds / self.completed if self.completed else 0.0
+            ),
+            "max_hash_seconds": self.max_hash_seconds,
+            "avg_queue_seconds": (
+                self.total_queue_seconds / self.completed if self.completed else 0.0
+            ),
+            "max_queue_seconds": self.max_queue_seconds,
+        }
 
 
 class PasswordManager:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    """Хеширование и проверка паролей bcrypt вне event loop.
+
+    bcrypt выполняется в отдельном пуле потоков, одновременно не больше
+    max_concurrency операций, еще max_queue могут ждать своей очереди.
+    Запросы сверх этого сразу получают PasswordHasherBusyException.
+    Хеши с другой стоимостью, чем rounds, считаются устаревшими и
+    пересчитываются при входе пользователя.
+    """
 
-    def hash_password(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+    def __init__(
+        self,
+        rounds: int = settings.BCRYPT_ROUNDS,
+        max_concurrency: int = settings.PASSWORD_HASH_CONCURRENCY,
+        max_queue: int = settings.PASSWORD_HASH_QUEUE_SIZE,
+    ):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.metrics = PasswordHashMetrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+        self._executor = None
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="password-hash"
+            )
+        return self._executor
 
+    async def _run(self, func, *args):
+        if self._pending >= self.max_concurrency + self.max_queue:
+            self.metrics.rejected += 1
+            raise PasswordHasherBusyException
+        self._pending += 1
+        self.metrics.queued += 1
+        self.metrics.max_queued = max(self.metrics.max_queued, self.metrics.queued)
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                self.metrics.queued -= 1
+                self.metrics.in_progress += 1
+                started_at = time.perf_counter()
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self._get_executor(), func, *args
+                    )
+                finally:
+                    self.metrics.in_progress -= 1
+        finally:
+            self._pending -= 1
+        self.metrics.observe(
+            queue_seconds=started_at - queued_at,
+            hash_seconds=time.perf_counter() - started_at,
+        )
+        return result
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify_password(self, plain_password, hashed_password) -> bool:
+        return await self._run(
+            self.pwd_context.verify, plain_password, hashed_password
+        )
+
+    async def verify_and_update(
+        self, plain_password, hashed_password
+    ) -> tuple[bool, str | None]:
+        """Проверка пароля и новый хеш, если у сохраненного устарела
+        стоимость. Если хеш не нужно менять, вместо него возвращается None."""
+        verified, new_hash = await self._run(
+            self.pwd_context.verify_and_update, plain_password, hashed_password
+        )
+        if new_hash is not None:
+            self.metrics.rehashed += 1
+        return verified, new_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
 
 def decode_token(token: str) -> dict:
     try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-    except jwt.exceptions.DecodeError:
-        raise IncorrectTokenException
+        return jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            options={"require": ["sub", "role", "exp", "jti"]},
+        )
     except jwt.exceptions.ExpiredSignatureError:
         raise ExpiredTokenException
+    except jwt.exceptions.InvalidTokenError:
+        raise IncorrectTokenException
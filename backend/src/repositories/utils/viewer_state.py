@@ -0,0 +1,111 @@
+from sqlalchemy import exists, false, literal, select, union_all
+
+from backend.src.models.recipes import FavoriteRecipeModel, ShoppingCartModel
+from backend.src.models.subscriptions import SubscriptionModel
+from backend.src.repositories.subscriptions import SubscriptionRepository
+from backend.src.schemas.recipes import RecipeViewerStateRead
+
+
+class ViewerStateResolver:
+    """Состояние рецептов для одного пользователя: избранное, список
+    покупок и подписка на автора.
+
+    Флаги проверяются по уникальным индексам (user_id, recipe_id) и
+    (author_id, subscriber_id), поэтому стоимость не зависит от того,
+    сколько пользователей отметили рецепт. Без пользователя все флаги
+    равны False и запросы не выполняются.
+    """
+
+    def __init__(self, session, user_id: int | None):
+        self.session = session
+        self.user_id = user_id
+
+    def _recipe_flag(self, model, recipe_id):
+        if not self.user_id:
+            return false()
+        return exists().where(
+            model.recipe_id == recipe_id, model.user_id == self.user_id
+        )
+
+    def is_favorited(self, recipe_id):
+        """Условие EXISTS для встраивания в запрос по рецептам."""
+        return self._recipe_flag(FavoriteRecipeModel, recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        """Условие EXISTS для встраивания в запрос по рецептам."""
+        return self._recipe_flag(ShoppingCartModel, recipe_id)
+
+    def is_subscribed(self, author_id):
+        """Условие EXISTS для встраивания в запрос по авторам."""
+        if not self.user_id:
+            return false()
+        return exists().where(
+            SubscriptionModel.author_id == author_id,
+            SubscriptionModel.subscriber_id == self.user_id,
+        )
+
+    async def resolve(self, recipe_ids, author_ids) -> RecipeViewerStateRead:
+        """Флаги для набора рецептов и их авторов одним запросом.
+
+        Если подключен кэш подписок, подписки на авторов проверяются в нем,
+        а в запросе остаются только избранное и список покупок.
+        """
+        if not self.user_id or not recipe_ids:
+            return RecipeViewerStateRead()
+        viewer_state = RecipeViewerStateRead()
+        subscriptions = SubscriptionRepository(self.session)
+        statements = [
+            select(
+                literal("favorite").label("kind"),
+                FavoriteRecipeModel.recipe_id.label("id"),
+            ).filter(
+                FavoriteRecipeModel.user_id == self.user_id,
+                FavoriteRecipeModel.recipe_id.in_(recipe_ids),
+            ),
+            select(
+                literal("shopping_cart").label("kind"),
+                ShoppingCartModel.recipe_id.label("id"),
+            ).filter(
+                ShoppingCartModel.user_id == self.user_id,
+                ShoppingCartModel.recipe_id.in_(recipe_ids),
+            ),
+        ]
+        if subscriptions.graph_cache.enabled:
+            viewer_state.subscribed_author_ids = (
+                await subscriptions.get_subscribed_author_ids(
+                    subscriber_id=self.user_id, author_ids=author_ids
+                )
+            )
+        else:
+            statements.append(
+                select(
+                    literal("subscription").label("kind"),
+                    SubscriptionModel.author_id.label("id"),
+                ).filter(
+                    SubscriptionModel.subscriber_id == self.user_id,
+                    SubscriptionModel.author_id.in_(author_ids),
+                )
+            )
+        viewer_state_result = await self.session.execute(union_all(*statements))
+        ids_by_kind = {
+            "favorite": viewer_state.favorited_ids,
+            "shopping_cart": viewer_state.in_shopping_cart_ids,
+            "subscription": viewer_state.subscribed_author_ids,
+        }
+        for kind, id in viewer_state_result.all():
+            ids_by_kind[kind].add(id)
+        return viewer_state
+
+    async def apply(self, recipes):
+        """Проставление флагов в уже собранных рецептах."""
+        viewer_state = await self.resolve(
+            recipe_ids=[recipe.id for recipe in recipes],
+            author_ids={recipe.author.id for recipe in recipes},
+        )
+        for recipe in recipes:
+            recipe.is_favorited = recipe.id in viewer_state.favorited_ids
+            recipe.is_in_shopping_cart = recipe.id in viewer_state.in_shopping_cart_ids
+            recipe.author.is_subscribed = (
+                recipe.author.id in viewer_state.subscribed_author_ids
+            )
+        return recipes
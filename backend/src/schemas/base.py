@@ -1,8 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from backend.src.constants import DB_INTEGER_MAX, DB_INTEGER_MIN
+
+
+class ImageVariantsRead(BaseModel):
+    thumbnail: str
+    card: str
+    full: str
 
 
 class ShortRecipeRead(BaseModel):
     id: int
     name: str
     image: str
+    image_variants: ImageVariantsRead | None = None
     cooking_time: int
+
+
+class PaginationCursor(BaseModel):
+    sort_key: int = Field(ge=DB_INTEGER_MIN, le=DB_INTEGER_MAX)
+    id: int = Field(ge=DB_INTEGER_MIN, le=DB_INTEGER_MAX)
@@ -1,6 +1,9 @@
+from typing import Literal
+
 from pydantic import BaseModel, ConfigDict, Field
 
-from backend.src.constants import PARAMS_MAX_LENGTH
+from backend.src.constants import PARAMS_MAX_LENGTH, RECIPE_BULK_MAX_SIZE
+from backend.src.schemas.base import ImageVariantsRead
 from backend.src.schemas.ingredients import (
     IngredientAmountCreateRequest,
     RecipeIngredientAmountRead,
@@ -47,7 +50,7 @@ class RecipeCreateRequest(RecipeCreateUpdateBaseRequest):
 
 class RecipeCreate(BaseRecipe):
     author: int
-    image: str
+    image: int
 
 
 class RecipeUpdateRequest(RecipeCreateUpdateBaseRequest):
@@ -66,10 +69,13 @@ class RecipeAfterCreateRead(RecipeCreate):
 
 
 class RecipeRead(RecipeAfterCreateRead):
+    image_variants: ImageVariantsRead | None = None
     tags: list[TagRead] = []
     ingredients: list[RecipeIngredientAmountRead] = []
     is_favorited: bool = False
     is_in_shopping_cart: bool = False
+    favorites_count: int = 0
+    shopping_cart_count: int = 0
 
 
 class CheckRecipeRead(BaseModel):
@@ -77,10 +83,19 @@ class CheckRecipeRead(BaseModel):
     id: int
 
 
-class ImageRead(BaseModel):
-    id: int
+class ImageCreate(BaseModel):
     name: str
-    base64: str
+    hash: str
+    size: int
+    mime: str
+    width: int | None = None
+    height: int | None = None
+
+
+class ImageRead(ImageCreate):
+    id: int
+    ref_count: int
+    has_derivatives: bool = False
 
 
 class FavoriteRecipeCreate(BaseModel):
@@ -103,8 +118,23 @@ class ShoppingCartRecipeRead(FavoriteRecipeRead):
     pass
 
 
+class RecipeIdsRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=RECIPE_BULK_MAX_SIZE)
+
+
+class RecipeBulkResultRead(BaseModel):
+    id: int
+    status: Literal["added", "already_added", "removed", "not_found"]
+
+
+class RecipeViewerStateRead(BaseModel):
+    favorited_ids: set[int] = set()
+    in_shopping_cart_ids: set[int] = set()
+    subscribed_author_ids: set[int] = set()
+
+
 class RecipeListRead(BaseModel):
-    count: int
+    count: int | None = None
     next: str | None = None
     previous: str | None = None
     results: list[RecipeRead] = []
@@ -11,7 +11,7 @@ class SubscriptionCreate(BaseModel):
 
 
 class SubscriptionListRead(BaseModel):
-    count: int
+    count: int | None = None
     next: str | None = "test123"
     previous: str | None = "test123"
     results: list[FollowedUserWithRecipiesRead] = []
@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-from pydantic import BaseModel, Field, model_validator, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, model_validator, EmailStr
 
 from backend.src.constants import USER_PARAMS_MAX_LENGTH, MAX_EMAIL_LENGTH
 from backend.src.schemas.base import ShortRecipeRead
@@ -30,8 +30,15 @@ class UserRead(BaseUser):
     id: int
 
 
-class UserReadWithRole(UserRead):
-    is_superuser: bool
+class UserReadWithRole(BaseModel):
+    """Пользователь из проверенного JWT токена."""
+
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    is_superuser: bool = False
+    token_id: str | None = None
+    token_expire: int | None = None
 
 
 class UserPasswordUpdate(BaseModel):
@@ -62,15 +69,17 @@ class UserCreateResponse(UserRead):
 
 class FollowedUserRead(UserRead):
     is_subscribed: bool = False
+    recipes_count: int = 0
+    followers_count: int = 0
+    following_count: int = 0
 
 
 class FollowedUserWithRecipiesRead(FollowedUserRead):
     recipes: list[ShortRecipeRead] = []
-    recipes_count: int = 0
 
 
 class UserListRead(BaseModel):
-    count: int
+    count: int | None = None
     next: str | None = None
     previous: str | None = None
     results: list[FollowedUserRead] = []
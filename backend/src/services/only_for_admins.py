@@ -1,6 +1,7 @@
 from backend.src.schemas.ingredients import IngredientCreate, IngredientRead
 from backend.src.schemas.tags import TagCreate, TagRead
 from backend.src.services.base import BaseService
+from backend.src.utils.recipe_cache import RecipeCache
 
 
 class OnlyForAdminService(BaseService):
@@ -17,7 +18,9 @@ class OnlyForAdminService(BaseService):
     async def delete_tag(self, id: int) -> None:
         await self.db.tags.delete(id=id)
         await self.db.commit()
+        await RecipeCache().invalidate_all()
 
     async def delete_ingredient(self, id: int) -> None:
         await self.db.ingredients.delete(id=id)
         await self.db.commit()
+        await RecipeCache().invalidate_all()
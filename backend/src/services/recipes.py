@@ -1,4 +1,5 @@
 from asyncpg import UniqueViolationError, ForeignKeyViolationError
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
 from backend.src.exceptions.recipes import (
@@ -18,9 +19,16 @@ from backend.src.schemas.recipes import (
     ShoppingCartRecipeCreate,
     FavoriteRecipeRead,
     FavoriteRecipeCreate,
+    RecipeBulkResultRead,
 )
 from backend.src.schemas.users import UserReadWithRole
 from backend.src.services.base import BaseService
+from backend.src.utils.image_upload import UploadedImage
+from backend.src.utils.recipe_cache import RecipeCache
+from backend.src.utils.shopping_list_export import (
+    SHOPPING_LIST_MEDIA_TYPES,
+    stream_shopping_list,
+)
 
 
 class RecipeService(BaseService):
@@ -34,35 +42,108 @@ class RecipeService(BaseService):
         is_in_shopping_cart: int = 0,
         page: int | None = None,
         limit: int | None = None,
+        cursor: str | None = None,
     ) -> RecipeListRead | None:
-        result = await self.db.recipes.get_filtered(
-            current_user=current_user,
-            is_favorited=is_favorited,
-            is_in_shopping_cart=is_in_shopping_cart,
-            tags=tags,
-            author=author,
-            db=self.db,
-            limit=limit,
-            page=page,
-            router_prefix=router_prefix,
+        """Список рецептов.
+
+        Страницы без фильтров по избранному и списку покупок не зависят
+        от пользователя и берутся из кэша, счетчики и флаги пользователя
+        проставляются поверх кэшированного ответа.
+        """
+        if current_user and (is_favorited or is_in_shopping_cart):
+            return await self.db.recipes.get_filtered(
+                current_user=current_user,
+                is_favorited=is_favorited,
+                is_in_shopping_cart=is_in_shopping_cart,
+                tags=tags,
+                author=author,
+                db=self.db,
+                limit=limit,
+                page=page,
+                router_prefix=router_prefix,
+                cursor=cursor,
+            )
+        recipe_cache = RecipeCache()
+        cache_key = await recipe_cache.get_list_key(
+            query_params={
+                "router_prefix": router_prefix,
+                "author": author,
+                "tags": tags,
+                "is_favorited": is_favorited,
+                "is_in_shopping_cart": is_in_shopping_cart,
+                "page": page,
+                "limit": limit,
+                "cursor": cursor,
+            }
         )
+        result = await recipe_cache.get(cache_key, RecipeListRead)
+        if result is not None:
+            await self.db.recipes.apply_counters(result.results)
+        else:
+            result = await self.db.recipes.get_filtered(
+                current_user=None,
+                is_favorited=is_favorited,
+                is_in_shopping_cart=is_in_shopping_cart,
+                tags=tags,
+                author=author,
+                db=self.db,
+                limit=limit,
+                page=page,
+                router_prefix=router_prefix,
+                cursor=cursor,
+            )
+            await recipe_cache.set(cache_key, result)
+        if current_user:
+            await self.db.recipes.apply_viewer_state(
+                result.results, user_id=current_user.id
+            )
         return result
 
     async def get_recipe(
         self, id: int, current_user: UserReadWithRole
     ) -> RecipeRead | None:
-        result = await self.db.recipes.get_one_or_none(
-            id=id, current_user=current_user, db=self.db
+        """Рецепт из кэша с флагами текущего пользователя.
+
+        При промахе рецепт вместе с флагами собирается одним запросом,
+        в кэш попадает его копия без флагов.
+        """
+        recipe_cache = RecipeCache()
+        cache_key = await recipe_cache.get_recipe_key(id=id)
+        result = await recipe_cache.get(cache_key, RecipeRead)
+        if result is not None:
+            await self.db.recipes.apply_counters([result])
+            if current_user:
+                await self.db.recipes.apply_viewer_state(
+                    [result], user_id=current_user.id
+                )
+            return result
+        result = await self.db.recipes.get_one_or_none(id=id, current_user=current_user)
+        await recipe_cache.set(
+            cache_key,
+            result.model_copy(
+                update={
+                    "is_favorited": False,
+                    "is_in_shopping_cart": False,
+                    "author": result.author.model_copy(update={"is_subscribed": False}),
+                }
+            ),
         )
         return result
 
     async def create_recipe(
-        self, current_user: UserReadWithRole, recipe_data: RecipeCreateRequest
+        self,
+        current_user: UserReadWithRole,
+        recipe_data: RecipeCreateRequest,
+        image_upload: UploadedImage | None = None,
     ):
         recipe = await self.db.recipes.create(
-            recipe_data=recipe_data, current_user_id=current_user.id, db=self.db
+            recipe_data=recipe_data,
+            current_user_id=current_user.id,
+            db=self.db,
+            image_upload=image_upload,
         )
         await self.db.commit()
+        await RecipeCache().invalidate_lists()
         return recipe
 
     async def update_recipe(
@@ -70,14 +151,16 @@ class RecipeService(BaseService):
         current_user: UserReadWithRole,
         id: int,
         recipe_data: RecipeUpdateRequest,
+        image_upload: UploadedImage | None = None,
     ) -> RecipeRead:
         check_recipe = await self.db.recipes.check_recipe_exists(id=id)
         if check_recipe.author != current_user.id:
             raise OnlyAuthorCanEditRecipeException
         recipe = await self.db.recipes.update(
-            recipe_data=recipe_data, id=id, db=self.db
+            recipe_data=recipe_data, id=id, db=self.db, image_upload=image_upload
         )
         await self.db.commit()
+        await RecipeCache().invalidate_recipe(id=id)
         return recipe
 
     async def delete_recipe(self, current_user: UserReadWithRole, id: int) -> None:
@@ -85,6 +168,7 @@ class RecipeService(BaseService):
         if check_recipe.author == current_user.id:
             recipe = await self.db.recipes.delete(id=id)
             await self.db.commit()
+            await RecipeCache().invalidate_recipe(id=id)
             return recipe
         else:
             raise OnlyAuthorCanEditRecipeException
@@ -118,9 +202,101 @@ class RecipeService(BaseService):
         except NoResultFound:
             raise RecipeNotFavoritedException
 
-    async def download_shopping_cart(self, current_user: UserReadWithRole):
+    @staticmethod
+    def _bulk_add_results(ids: list[int], added: dict[int, bool]):
+        return [
+            RecipeBulkResultRead(
+                id=id,
+                status=(
+                    "not_found"
+                    if id not in added
+                    else "added"
+                    if added[id]
+                    else "already_added"
+                ),
+            )
+            for id in dict.fromkeys(ids)
+        ]
+
+    @staticmethod
+    def _bulk_remove_results(ids: list[int], removed_ids: list[int]):
+        removed_ids = set(removed_ids)
+        return [
+            RecipeBulkResultRead(
+                id=id, status="removed" if id in removed_ids else "not_found"
+            )
+            for id in dict.fromkeys(ids)
+        ]
+
+    async def add_recipes_to_favorites(
+        self, ids: list[int], current_user: UserReadWithRole
+    ) -> list[RecipeBulkResultRead]:
+        added = await self.db.favorite_recipes.add_many(
+            user_id=current_user.id,
+            recipes_stmt=self.db.favorite_recipes.recipes_by_ids(ids),
+        )
+        await self.db.commit()
+        return self._bulk_add_results(ids, added)
+
+    async def remove_recipes_from_favorites(
+        self, ids: list[int], current_user: UserReadWithRole
+    ) -> list[RecipeBulkResultRead]:
+        removed_ids = await self.db.favorite_recipes.remove_many(
+            user_id=current_user.id, recipe_ids=ids
+        )
+        await self.db.commit()
+        return self._bulk_remove_results(ids, removed_ids)
+
+    async def add_recipes_to_shopping_cart(
+        self, ids: list[int], current_user: UserReadWithRole
+    ) -> list[RecipeBulkResultRead]:
+        added = await self.db.shopping_cart.add_many(
+            user_id=current_user.id,
+            recipes_stmt=self.db.shopping_cart.recipes_by_ids(ids),
+        )
+        await self.db.commit()
+        return self._bulk_add_results(ids, added)
+
+    async def remove_recipes_from_shopping_cart(
+        self, ids: list[int], current_user: UserReadWithRole
+    ) -> list[RecipeBulkResultRead]:
+        removed_ids = await self.db.shopping_cart.remove_many(
+            user_id=current_user.id, recipe_ids=ids
+        )
+        await self.db.commit()
+        return self._bulk_remove_results(ids, removed_ids)
+
+    async def add_favorites_to_shopping_cart(
+        self, current_user: UserReadWithRole
+    ) -> list[RecipeBulkResultRead]:
+        added = await self.db.shopping_cart.add_many(
+            user_id=current_user.id,
+            recipes_stmt=self.db.shopping_cart.favorite_recipes(current_user.id),
+        )
+        await self.db.commit()
+        return self._bulk_add_results(sorted(added), added)
+
+    async def download_shopping_cart(
+        self,
+        current_user: UserReadWithRole,
+        format: str = "pdf",
+        if_none_match: str | None = None,
+    ):
+        if format in SHOPPING_LIST_MEDIA_TYPES:
+            username = await self.db.shopping_cart.get_username(current_user.id)
+            return StreamingResponse(
+                stream_shopping_list(
+                    user_id=current_user.id,
+                    username=username,
+                    format=format,
+                ),
+                media_type=SHOPPING_LIST_MEDIA_TYPES[format],
+                headers={
+                    "Content-Disposition": f"attachment; filename=shopping_list.{format}"
+                },
+            )
         get_shopping_cart = await self.db.shopping_cart.get_shopping_cart(
-            user_id=current_user.id
+            user_id=current_user.id, if_none_match=if_none_match
         )
         return get_shopping_cart
 
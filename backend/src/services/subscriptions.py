@@ -12,6 +12,7 @@ class SubscriptionService(BaseService):
         page: int | None = None,
         limit: int | None = None,
         recipes_limit: int | None = None,
+        cursor: str | None = None,
     ) -> SubscriptionListRead | None:
         if not limit:
             limit = constants.PAGINATION_LIMIT
@@ -26,6 +27,7 @@ class SubscriptionService(BaseService):
             page=page,
             router_prefix=f"{router_prefix}/subscriptions",
             recipes_limit=recipes_limit,
+            cursor=cursor,
         )
         return user_subs
 
@@ -4,7 +4,6 @@ from backend.src.exceptions.users import (
     IncorrectPasswordException,
     UserAlreadyExistsException,
 )
-from backend.src.repositories.utils.users import PasswordManager
 from backend.src.schemas.users import (
     UserListRead,
     FollowedUserRead,
@@ -17,6 +16,7 @@ from backend.src.schemas.users import (
     UserReadWithRole,
 )
 from backend.src.services.base import BaseService
+from backend.src.setup import password_manager
 
 
 class UserService(BaseService):
@@ -26,6 +26,7 @@ class UserService(BaseService):
         router_prefix: str,
         page: int | None = None,
         limit: int | None = None,
+        cursor: str | None = None,
     ) -> UserListRead:
         if not limit:
             limit = constants.PAGINATION_LIMIT
@@ -44,6 +45,7 @@ class UserService(BaseService):
             offset=offset,
             page=page,
             router_prefix=router_prefix,
+            cursor=cursor,
         )
         return result
 
@@ -59,7 +61,7 @@ class UserService(BaseService):
         return user_to_get
 
     async def create_new_user(self, user_data: UserCreateRequest) -> UserCreateResponse:
-        hashed_password = PasswordManager().hash_password(user_data.password)
+        hashed_password = await password_manager.hash_password(user_data.password)
         try:
             _user_data = UserCreate(
                 username=user_data.username,
@@ -79,18 +81,19 @@ class UserService(BaseService):
         data: UserLoginRequest,
     ):
         access_token = await self.db.users.create_access_token(data=data)
+        await self.db.commit()
         return access_token
 
     async def change_password(
         self, password_data: UserPasswordUpdate, current_user: UserReadWithRole
     ) -> None:
         user = await self.db.users.get_user_hashed_password(id=current_user.id)
-        if not PasswordManager().verify_password(
+        if not await password_manager.verify_password(
             hashed_password=user.hashed_password,
             plain_password=password_data.current_password,
         ):
             raise IncorrectPasswordException
-        new_hashed_password = PasswordManager().hash_password(
+        new_hashed_password = await password_manager.hash_password(
             password_data.new_password
         )
         password_updated_data = UserPasswordChangeRequest(
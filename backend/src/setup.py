@@ -1,8 +1,34 @@
 from backend.src.connectors.redis_connector import RedisManager
 from backend.src.config import settings
+from backend.src.constants import (
+    SHOPPING_LIST_CACHE_MAX_BYTES,
+    SHOPPING_LIST_CACHE_TTL,
+)
+from backend.src.repositories.utils.users import PasswordManager
+from backend.src.utils.document_cache import DocumentCache
+from backend.src.utils.image_derivatives import ImageDerivativeGenerator
+from backend.src.utils.media_io import MediaIO
+from backend.src.utils.pdf_shopping_list import (
+    SHOPPING_CART_PATH,
+    ShoppingListRenderer,
+)
 
 
 redis_manager = RedisManager(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
 )
+image_derivatives = ImageDerivativeGenerator()
+media_io = MediaIO(max_workers=settings.MEDIA_IO_CONCURRENCY)
+shopping_list_renderer = ShoppingListRenderer()
+password_manager = PasswordManager(
+    rounds=settings.BCRYPT_ROUNDS,
+    max_concurrency=settings.PASSWORD_HASH_CONCURRENCY,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+shopping_list_cache = DocumentCache(
+    directory=SHOPPING_CART_PATH / "cache",
+    max_bytes=SHOPPING_LIST_CACHE_MAX_BYTES,
+    ttl=SHOPPING_LIST_CACHE_TTL,
+    media_io=media_io,
+)
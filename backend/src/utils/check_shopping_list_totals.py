@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+
+
+async def check_shopping_list_totals(fix: bool):
+    """Сверка сохраненных сумм списков покупок с посчитанными заново.
+
+    С флагом --fix суммы пользователей с расхождениями пересчитываются.
+    """
+    async with DBManager(session_factory=async_session_maker) as db:
+        user_ids = await db.shopping_list_totals.get_inconsistent_users()
+        if not user_ids:
+            print("Суммы списков покупок совпадают с корзинами пользователей")
+            return
+        print(f"Расхождения в списках покупок пользователей: {user_ids}")
+        if fix:
+            for user_id in user_ids:
+                await db.shopping_list_totals.rebuild(user_id=user_id)
+            await db.commit()
+            print(f"Суммы пересчитаны для пользователей: {len(user_ids)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Проверка сумм ингредиентов в списках покупок"
+    )
+    parser.add_argument("--fix", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(check_shopping_list_totals(args.fix))
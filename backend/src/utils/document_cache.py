@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from loguru import logger
+
+CACHE_FILE_PATTERN = re.compile(r"^\.?[0-9a-f]{64}\.")
+
+
+class DocumentCache:
+    """Дисковый кэш сгенерированных документов со списком покупок.
+
+    Ключ документа - sha256 от пользователя, списка продуктов и формата,
+    поэтому повторное скачивание неизменной корзины не требует нового
+    рендеринга. Время изменения файла - момент создания документа, по нему
+    считается срок жизни, время доступа обновляется при каждом попадании
+    в кэш и задает порядок вытеснения при превышении общего размера.
+    """
+
+    def __init__(self, directory, max_bytes: int, ttl: int, media_io):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.media_io = media_io
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Ключ документа по всем данным, от которых зависит его содержимое."""
+        payload = json.dumps(parts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def make_etag(key: str) -> str:
+        # Документ с тем же ключом может отличаться датой создания,
+        # поэтому ETag слабый: содержимое эквивалентно, но не побайтно.
+        return f'W/"{key}"'
+
+    def path(self, key: str, format: str) -> str:
+        return f"{self.directory}/{key}.{format}"
+
+    def temp_path(self, key: str, format: str) -> str:
+        return f"{self.directory}/.{key}.{uuid.uuid4().hex}.{format}.tmp"
+
+    def _get(self, key: str, format: str) -> str | None:
+        path = self.path(key, format)
+        try:
+            created_at = os.stat(path).st_mtime
+            if time.time() - created_at > self.ttl:
+                return None
+            os.utime(path, (time.time(), created_at))
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def get(self, key: str, format: str) -> str | None:
+        """Путь к документу из кэша или None, если его нет или он устарел."""
+        return await self.media_io.run(self._get, key, format)
+
+    def _put(self, key: str, format: str, content: bytes) -> str:
+        path = self.path(key, format)
+        temp_path = self.temp_path(key, format)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(temp_path, "wb") as document:
+            document.write(content)
+        os.replace(temp_path, path)
+        self._cleanup()
+        return path
+
+    async def put(self, key: str, format: str, content: bytes) -> str:
+        """Сохранение готового документа в кэш."""
+        return await self.media_io.run(self._put, key, format, content)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _cleanup(self) -> int:
+        now = time.time()
+        files = list()
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not CACHE_FILE_PATTERN.match(entry.name):
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl:
+                    self._remove(entry.path)
+                    removed += 1
+                elif not entry.name.endswith(".tmp"):
+                    files.append((stat.st_atime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_size <= self.max_bytes:
+                break
+            self._remove(path)
+            total_size -= size
+            removed += 1
+        return removed
+
+    async def cleanup(self) -> int:
+        """Удаление устаревших документов и вытеснение давно не
+        запрошенных, пока кэш не уложится в ограничение по размеру."""
+        return await self.media_io.run(self._cleanup)
+
+    async def run_janitor(self, interval: int):
+        """Периодическая очистка кэша, запускается при старте приложения."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    logger.info(f"Из кэша списков покупок удалено файлов: {removed}")
+            except Exception:
+                logger.exception("Ошибка при очистке кэша списков покупок")
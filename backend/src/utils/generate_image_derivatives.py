@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from sqlalchemy import select
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+from backend.src.models.recipes import ImageModel
+from backend.src.schemas.recipes import ImageRead
+from backend.src.setup import image_derivatives
+
+BATCH_SIZE = 50
+
+
+async def generate_missing_derivatives():
+    """Создание уменьшенных копий для картинок, у которых их еще нет.
+
+    Картинки обрабатываются пачками, пачка распределяется по процессам
+    пула, результат фиксируется в БД после каждой пачки.
+    """
+    last_id, generated, failed = 0, 0, 0
+    try:
+        while True:
+            async with DBManager(session_factory=async_session_maker) as db:
+                images_stmt = (
+                    select(ImageModel)
+                    .filter(ImageModel.id > last_id, ~ImageModel.has_derivatives)
+                    .order_by(ImageModel.id)
+                    .limit(BATCH_SIZE)
+                )
+                images = await db.session.execute(images_stmt)
+                images = [
+                    ImageRead.model_validate(image, from_attributes=True)
+                    for image in images.scalars().all()
+                ]
+                if not images:
+                    break
+                last_id = images[-1].id
+                results = await asyncio.gather(
+                    *[image_derivatives.generate(image.name) for image in images]
+                )
+                generated_ids = [
+                    image.id for image, result in zip(images, results) if result
+                ]
+                if generated_ids:
+                    await db.images.mark_derivatives(generated_ids)
+                    await db.commit()
+            generated += sum(results)
+            failed += len(results) - sum(results)
+            print(f"Обработано картинок: {generated + failed}")
+    finally:
+        image_derivatives.shutdown()
+    print(f"Копии созданы: {generated}, не удалось обработать: {failed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(generate_missing_derivatives())
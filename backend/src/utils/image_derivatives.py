@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from loguru import logger
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from backend.src.constants import (
+    IMAGE_DERIVATIVE_QUALITY,
+    IMAGE_DERIVATIVE_SIZES,
+    IMAGE_DERIVATIVE_WORKERS,
+    MAIN_URL,
+    MOUNT_PATH,
+)
+from backend.src.schemas.base import ImageVariantsRead
+from backend.src.utils.image_upload import MEDIA_PATH, remove_image_file
+
+
+def derivative_name(image_hash: str, variant: str) -> str:
+    return f"{image_hash}_{variant}.webp"
+
+
+def image_variant_urls(
+    image_hash: str, has_derivatives: bool
+) -> ImageVariantsRead | None:
+    """Ссылки на уменьшенные копии картинки, если они уже созданы."""
+    if not has_derivatives:
+        return None
+    return ImageVariantsRead(
+        **{
+            variant: f"{MAIN_URL}{MOUNT_PATH}/{derivative_name(image_hash, variant)}"
+            for variant in IMAGE_DERIVATIVE_SIZES
+        }
+    )
+
+
+def remove_image_files(image_name: str):
+    """Удаление файла картинки вместе с ее уменьшенными копиями."""
+    image_hash = image_name.rsplit(".", 1)[0]
+    remove_image_file(image_name)
+    for variant in IMAGE_DERIVATIVE_SIZES:
+        remove_image_file(derivative_name(image_hash, variant))
+
+
+def make_derivatives(image_name: str) -> bool:
+    """Создание уменьшенных копий картинки в формате WebP.
+
+    Выполняется в дочернем процессе: Pillow декодирует картинку целиком,
+    и на больших файлах это занимает заметное время процессора. Копия
+    вписывается в квадрат заданного размера с сохранением пропорций и
+    не увеличивается, уже существующие файлы не пересоздаются.
+    """
+    image_hash = image_name.rsplit(".", 1)[0]
+    try:
+        with Image.open(f"{MEDIA_PATH}/{image_name}") as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+            for variant, size in IMAGE_DERIVATIVE_SIZES.items():
+                variant_path = f"{MEDIA_PATH}/{derivative_name(image_hash, variant)}"
+                if os.path.exists(variant_path):
+                    continue
+                variant_image = image.copy()
+                variant_image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                temp_path = f"{variant_path}.{os.getpid()}.tmp"
+                variant_image.save(
+                    temp_path, format="WEBP", quality=IMAGE_DERIVATIVE_QUALITY
+                )
+                os.replace(temp_path, variant_path)
+    except (
+        Image.DecompressionBombError,
+        UnidentifiedImageError,
+        OSError,
+        ValueError,
+    ):
+        return False
+    return True
+
+
+class ImageDerivativeGenerator:
+    """Пул процессов для создания уменьшенных копий картинок.
+
+    Пул создается при первом обращении. Процессы запускаются через spawn,
+    чтобы не копировать состояние event loop и соединений родителя.
+    """
+
+    def __init__(self, max_workers: int = IMAGE_DERIVATIVE_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def generate(self, image_name: str) -> bool:
+        """Создание копий картинки без блокировки event loop."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), make_derivatives, image_name
+            )
+        except BrokenProcessPool:
+            logger.error(
+                f"Пул процессов для картинок аварийно завершен на {image_name}"
+            )
+            self._executor = None
+            return False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
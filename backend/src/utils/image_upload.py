@@ -0,0 +1,333 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import time
+
+from fastapi.exceptions import RequestValidationError
+from multipart.multipart import MultipartParser, parse_options_header
+from PIL import Image, UnidentifiedImageError
+from pydantic import ValidationError
+
+from backend.src.constants import (
+    IMAGE_MAX_SIZE,
+    MOUNT_PATH,
+    RECIPE_FORM_FIELDS_MAX_SIZE,
+    UPLOAD_TMP_MAX_AGE,
+)
+from backend.src.exceptions.recipes import (
+    ImageTooLargeException,
+    InvalidImageException,
+    InvalidRecipeFormException,
+    UnsupportedImageTypeException,
+)
+from backend.src.schemas.recipes import ImageCreate
+
+MEDIA_PATH = f"{pathlib.Path(__file__).parent.parent.resolve()}{MOUNT_PATH}"
+# Незавершенные загрузки пишутся рядом с картинками, но вне раздаваемой
+# директории: файл не доступен по ссылке, а os.replace остается атомарным.
+UPLOAD_TMP_PATH = os.path.join(os.path.dirname(MEDIA_PATH), ".uploads")
+IMAGE_SIGNATURE_LENGTH = 12
+
+
+def detect_image_extension(head: bytes) -> str | None:
+    """Определение формата картинки по первым байтам файла."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def create_upload_file() -> tuple[int, str]:
+    """Временный файл для загружаемой картинки."""
+    os.makedirs(UPLOAD_TMP_PATH, exist_ok=True)
+    return tempfile.mkstemp(prefix=".upload-", dir=UPLOAD_TMP_PATH)
+
+
+def remove_stale_uploads(max_age: int = UPLOAD_TMP_MAX_AGE) -> int:
+    """Удаление временных файлов загрузок, оставшихся после падения
+    процесса. Возвращается число удаленных файлов."""
+    if not os.path.isdir(UPLOAD_TMP_PATH):
+        return 0
+    removed = 0
+    deadline = time.time() - max_age
+    for entry in os.scandir(UPLOAD_TMP_PATH):
+        if not entry.name.startswith(".upload-"):
+            continue
+        try:
+            if entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def remove_image_file(image_name: str):
+    """Удаление файла картинки, на который больше не ссылается ни один рецепт."""
+    image_path = f"{MEDIA_PATH}/{image_name}"
+    if os.path.exists(image_path):
+        os.remove(image_path)
+
+
+class UploadedImage:
+    """Картинка, сохраненная во временный файл в UPLOAD_TMP_PATH.
+
+    Файлы картинок адресуются по содержимому: постоянное имя складывается
+    из sha256 байтов файла и расширения, поэтому одинаковые картинки
+    хранятся на диске один раз. Файл получает это имя атомарным
+    переименованием в save.
+    """
+
+    def __init__(self, path: str, extension: str, size: int, hash: str = None):
+        self.path = path
+        self.extension = extension
+        self.size = size
+        self.hash = hash
+
+    @classmethod
+    def from_base64(cls, base64_string: str, max_size: int = IMAGE_MAX_SIZE):
+        """Запись картинки из строки вида data:image/<формат>;base64,<данные>."""
+        if not isinstance(base64_string, str) or not base64_string.startswith(
+            "data:image"
+        ):
+            raise InvalidImageException
+        try:
+            _, image_string = base64_string.split(";base64,", 1)
+            image_bytes = base64.b64decode(image_string, validate=True)
+        except (ValueError, binascii.Error):
+            raise InvalidImageException
+        if len(image_bytes) > max_size:
+            raise ImageTooLargeException
+        extension = detect_image_extension(image_bytes[:IMAGE_SIGNATURE_LENGTH])
+        if extension is None:
+            raise UnsupportedImageTypeException
+        fd, path = create_upload_file()
+        with os.fdopen(fd, "wb") as image_file:
+            image_file.write(image_bytes)
+        return cls(
+            path=path,
+            extension=extension,
+            size=len(image_bytes),
+            hash=hashlib.sha256(image_bytes).hexdigest(),
+        )
+
+    @property
+    def name(self) -> str:
+        return f"{self.hash}.{self.extension}"
+
+    def describe(self) -> ImageCreate:
+        """Метаданные картинки для записи в БД.
+
+        Формат уже проверен по сигнатуре, размеры читаются Pillow только из
+        заголовка файла. Если заголовок поврежден, размеры не заполняются,
+        картинка с заявленным числом пикселей больше предела Pillow
+        отклоняется.
+        """
+        width, height = None, None
+        try:
+            with Image.open(self.path) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            raise InvalidImageException
+        except (UnidentifiedImageError, OSError):
+            pass
+        return ImageCreate(
+            name=self.name,
+            hash=self.hash,
+            size=self.size,
+            mime=f"image/{self.extension}",
+            width=width,
+            height=height,
+        )
+
+    def save(self):
+        os.replace(self.path, f"{MEDIA_PATH}/{self.name}")
+        self.path = None
+
+    def discard(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class RecipeFormParser:
+    """Потоковый разбор тела multipart/form-data с картинкой рецепта.
+
+    Картинка пишется на диск по частям по мере чтения запроса, формат
+    проверяется по сигнатуре первых байтов, размер - на каждой части,
+    поэтому слишком большой или чужой файл отклоняется до конца загрузки.
+    Остальные поля собираются в память с ограничением общего размера.
+    Если передан media_io, разбор частей с записью на диск выполняется
+    в его пуле потоков.
+    """
+
+    def __init__(
+        self,
+        request,
+        image_field: str = "image",
+        max_image_size: int = IMAGE_MAX_SIZE,
+        max_fields_size: int = RECIPE_FORM_FIELDS_MAX_SIZE,
+        media_io=None,
+    ):
+        self.request = request
+        self.media_io = media_io
+        self.image_field = image_field
+        self.max_image_size = max_image_size
+        self.max_fields_size = max_fields_size
+        self.fields: dict[str, list[str]] = dict()
+        self.image: UploadedImage | None = None
+        self._fields_size = 0
+        self._reset_part()
+
+    def _reset_part(self):
+        self._header_field = b""
+        self._header_value = b""
+        self._part_headers = dict()
+        self._part_name = None
+        self._part_value = bytearray()
+        self._image_file = None
+        self._image_head = b""
+        self._image_hash = None
+
+    def on_part_begin(self):
+        self._reset_part()
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._part_headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        disposition, options = parse_options_header(
+            self._part_headers.get(b"content-disposition", b"")
+        )
+        if disposition != b"form-data" or b"name" not in options:
+            raise InvalidRecipeFormException
+        self._part_name = options[b"name"].decode()
+        if self._part_name != self.image_field:
+            return
+        if self.image is not None or b"filename" not in options:
+            raise InvalidRecipeFormException
+        content_type = self._part_headers.get(b"content-type", b"")
+        if content_type and not content_type.startswith(b"image/"):
+            raise UnsupportedImageTypeException
+        fd, path = create_upload_file()
+        self._image_file = os.fdopen(fd, "wb")
+        self._image_hash = hashlib.sha256()
+        self.image = UploadedImage(path=path, extension=None, size=0)
+
+    def on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        if self._image_file is None:
+            self._fields_size += len(chunk)
+            if self._fields_size > self.max_fields_size:
+                raise InvalidRecipeFormException
+            self._part_value += chunk
+            return
+        self.image.size += len(chunk)
+        if self.image.size > self.max_image_size:
+            raise ImageTooLargeException
+        if self.image.extension is None:
+            self._image_head += chunk[:IMAGE_SIGNATURE_LENGTH]
+            if len(self._image_head) >= IMAGE_SIGNATURE_LENGTH:
+                self._check_image_head()
+        self._image_hash.update(chunk)
+        self._image_file.write(chunk)
+
+    def on_part_end(self):
+        if self._image_file is None:
+            self.fields.setdefault(self._part_name, list()).append(
+                self._part_value.decode()
+            )
+            return
+        self._image_file.close()
+        self._image_file = None
+        self.image.hash = self._image_hash.hexdigest()
+        if self.image.extension is None:
+            self._check_image_head()
+
+    def _check_image_head(self):
+        extension = detect_image_extension(self._image_head)
+        if extension is None:
+            raise UnsupportedImageTypeException
+        self.image.extension = extension
+
+    async def parse(self):
+        """Чтение тела запроса. Возвращает поля формы и картинку."""
+        content_type, options = parse_options_header(
+            self.request.headers.get("content-type", "")
+        )
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            raise InvalidRecipeFormException
+        content_length = self.request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            if int(content_length) > self.max_image_size + self.max_fields_size:
+                raise ImageTooLargeException
+        parser = MultipartParser(
+            options[b"boundary"],
+            callbacks={
+                "on_part_begin": self.on_part_begin,
+                "on_part_data": self.on_part_data,
+                "on_part_end": self.on_part_end,
+                "on_header_field": self.on_header_field,
+                "on_header_value": self.on_header_value,
+                "on_header_end": self.on_header_end,
+                "on_headers_finished": self.on_headers_finished,
+            },
+        )
+        try:
+            async for chunk in self.request.stream():
+                await self._run(parser.write, chunk)
+            await self._run(parser.finalize)
+        except Exception:
+            if self._image_file is not None:
+                self._image_file.close()
+            if self.image is not None:
+                self.image.discard()
+            raise
+        return self.fields, self.image
+
+    async def _run(self, func, *args):
+        if self.media_io is None:
+            return func(*args)
+        return await self.media_io.run(func, *args)
+
+    def to_schema(self, schema):
+        """Проверка полей формы схемой запроса рецепта.
+
+        Теги передаются повторяющимся полем tags, ингредиенты - полем
+        ingredients со списком в формате JSON.
+        """
+        data = {
+            key: values[0]
+            for key, values in self.fields.items()
+            if key not in ("tags", "ingredients")
+        }
+        data["tags"] = self.fields.get("tags", [])
+        try:
+            data["ingredients"] = json.loads(self.fields.get("ingredients", ["[]"])[0])
+            return schema.model_validate(data)
+        except json.JSONDecodeError:
+            raise InvalidRecipeFormException
+        except ValidationError as ex:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in ex.errors(include_url=False, include_context=False)
+                ]
+            )
@@ -0,0 +1,34 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MediaIO:
+    """Файловые операции с медиафайлами в ограниченном пуле потоков.
+
+    Запись, переименование и удаление файлов не выполняются в event loop:
+    под нагрузкой загрузками картинок они задерживали бы все остальные
+    запросы. Размер пула ограничивает число одновременных операций с диском.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="media-io"
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,24 +1,196 @@
+import asyncio
+import pathlib
+import shutil
+import time
 from datetime import datetime
 
 import jinja2
-import pdfkit
-from pytz import timezone
+from loguru import logger
 
+from backend.src.constants import (
+    PDF_RENDER_CONCURRENCY,
+    PDF_RENDER_QUEUE_SIZE,
+    PDF_RENDER_TIMEOUT,
+    WKHTMLTOPDF_PATH,
+)
+from backend.src.exceptions.recipes import (
+    ShoppingListRenderException,
+    ShoppingListRendererBusyException,
+)
 
-def create_shopping_list(data, username):
-    today_date = datetime.now().strftime("%d.%m.%Y %H:%M")
+SHOPPING_CART_PATH = pathlib.Path(__file__).parent.parent.resolve() / (
+    "media/shopping_cart"
+)
+SHOPPING_LIST_TEMPLATE = "base_shopping_list_template.html"
+# Раньше каждый pdf сохранялся сюда под уникальным именем и не удалялся.
+LEGACY_SHOPPING_LISTS_PATH = SHOPPING_CART_PATH / "shopping_lists"
 
-    context = {"username": username, "item_dict": data, "today_date": today_date}
 
-    template_loader = jinja2.FileSystemLoader("src/media/shopping_cart")
-    template_env = jinja2.Environment(loader=template_loader)
+def remove_legacy_shopping_lists(directory=LEGACY_SHOPPING_LISTS_PATH) -> int:
+    """Удаление директории со списками покупок, сохраненными до кэша
+    документов. После первого запуска директории нет, и вызов ничего
+    не делает. Возвращается число удаленных файлов."""
+    directory = pathlib.Path(directory)
+    if not directory.is_dir():
+        return 0
+    removed = sum(1 for path in directory.rglob("*") if path.is_file())
+    shutil.rmtree(directory)
+    return removed
 
-    html_template = "./base_shopping_list_template.html"
-    template = template_env.get_template(html_template)
-    output_text = template.render(context)
 
-    config = pdfkit.configuration(wkhtmltopdf="/usr/bin/wkhtmltopdf")
-    filename = f'{datetime.now(tz=timezone("Europe/Moscow")).strftime("%d.%m.%Y_%H:%M:%S")}_{username}_shopping_list.pdf'
-    output_pdf = f"src/media/shopping_cart/shopping_lists/{filename}"
-    pdfkit.from_string(output_text, output_pdf, configuration=config)
-    return output_pdf
+class RenderMetrics:
+    """Счетчики и время рендеринга списков покупок в pdf."""
+
+    def __init__(self):
+        self.rendered = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_progress = 0
+        self.queued = 0
+        self.total_render_seconds = 0.0
+        self.max_render_seconds = 0.0
+        self.last_render_seconds = 0.0
+        self.total_queue_seconds = 0.0
+
+    def observe(self, queue_seconds: float, render_seconds: float):
+        self.rendered += 1
+        self.total_queue_seconds += queue_seconds
+        self.total_render_seconds += render_seconds
+        self.last_render_seconds = render_seconds
+        self.max_render_seconds = max(self.max_render_seconds, render_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "in_progress": self.in_progress,
+            "queued": self.queued,
+            "avg_render_seconds": (
+                self.total_render_seconds / self.rendered if self.rendered else 0.0
+            ),
+            "max_render_seconds": self.max_render_seconds,
+            "last_render_seconds": self.last_render_seconds,
+            "avg_queue_seconds": (
+                self.total_queue_seconds / self.rendered if self.rendered else 0.0
+            ),
+        }
+
+
+class RenderTiming:
+    def __init__(self, queue_seconds: float, render_seconds: float):
+        self.queue_seconds = queue_seconds
+        self.render_seconds = render_seconds
+
+    @property
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing, время в миллисекундах."""
+        return (
+            f"pdf-queue;dur={self.queue_seconds * 1000:.1f}, "
+            f"pdf-render;dur={self.render_seconds * 1000:.1f}"
+        )
+
+
+class ShoppingListRenderer:
+    """Рендеринг списка покупок в pdf вне event loop.
+
+    Шаблон компилируется один раз. wkhtmltopdf запускается асинхронным
+    подпроцессом, одновременно выполняется не больше max_concurrency
+    конвертаций, еще max_queue запросов могут ждать своей очереди.
+    Запросы сверх этого сразу получают ShoppingListRendererBusyException.
+    """
+
+    def __init__(
+        self,
+        wkhtmltopdf: str = WKHTMLTOPDF_PATH,
+        max_concurrency: int = PDF_RENDER_CONCURRENCY,
+        max_queue: int = PDF_RENDER_QUEUE_SIZE,
+        timeout: float = PDF_RENDER_TIMEOUT,
+    ):
+        self.wkhtmltopdf = wkhtmltopdf
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.metrics = RenderMetrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+        self._template = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(SHOPPING_CART_PATH), autoescape=True
+        ).get_template(SHOPPING_LIST_TEMPLATE)
+
+    def render_html(self, data, username) -> str:
+        today_date = datetime.now().strftime("%d.%m.%Y %H:%M")
+        return self._template.render(
+            {"username": username, "item_dict": data, "today_date": today_date}
+        )
+
+    async def render_pdf(self, html: str) -> tuple[bytes, RenderTiming]:
+        """Конвертация html в pdf в памяти, без временных файлов."""
+        if self._pending >= self.max_concurrency + self.max_queue:
+            self.metrics.rejected += 1
+            raise ShoppingListRendererBusyException
+        self._pending += 1
+        self.metrics.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                self.metrics.queued -= 1
+                self.metrics.in_progress += 1
+                started_at = time.perf_counter()
+                try:
+                    pdf = await self._run_wkhtmltopdf(html)
+                except ShoppingListRenderException:
+                    self.metrics.failed += 1
+                    raise
+                finally:
+                    self.metrics.in_progress -= 1
+        finally:
+            self._pending -= 1
+        timing = RenderTiming(
+            queue_seconds=started_at - queued_at,
+            render_seconds=time.perf_counter() - started_at,
+        )
+        self.metrics.observe(timing.queue_seconds, timing.render_seconds)
+        logger.info(
+            f"Список покупок ({len(pdf)} байт) создан за "
+            f"{timing.render_seconds:.3f} c, ожидание в очереди "
+            f"{timing.queue_seconds:.3f} c"
+        )
+        return pdf, timing
+
+    async def _run_wkhtmltopdf(self, html: str) -> bytes:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.wkhtmltopdf,
+                "--quiet",
+                "--encoding",
+                "utf-8",
+                "-",
+                "-",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as ex:
+            logger.error(f"Не удалось запустить {self.wkhtmltopdf}: {ex}")
+            raise ShoppingListRenderException
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(html.encode()), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.error("Превышено время создания списка покупок")
+            raise ShoppingListRenderException
+        if process.returncode != 0:
+            logger.error(
+                f"wkhtmltopdf завершился с кодом {process.returncode}: "
+                f"{stderr.decode(errors='replace')}"
+            )
+            raise ShoppingListRenderException
+        return stdout
+
+    async def create_shopping_list(self, data, username) -> tuple[bytes, RenderTiming]:
+        """Создание pdf со списком покупок пользователя."""
+        return await self.render_pdf(self.render_html(data, username))
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+from backend.src.setup import redis_manager
+
+
+async def rebuild_subscription_cache():
+    """Восстановление кэша подписок в Redis по данным Postgres."""
+    await redis_manager.connect()
+    try:
+        async with DBManager(session_factory=async_session_maker) as db:
+            follows = await db.subscriptions.get_all_follows()
+            await db.subscriptions.graph_cache.rebuild(follows)
+        print(f"Кэш подписок восстановлен для пользователей: {len(follows)}")
+    finally:
+        await redis_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_subscription_cache())
@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+from backend.src.constants import RECIPE_CACHE_EXPIRE, RECIPE_CACHE_VERSION
+from backend.src.schemas.recipes import RecipeListRead, RecipeRead
+from backend.src.setup import redis_manager
+
+
+class RecipeCache:
+    """Кэш ответов со списком рецептов и отдельными рецептами.
+
+    В кэше хранится только не зависящая от пользователя часть ответа:
+    флаги избранного, списка покупок и подписки в ней всегда False.
+    Ключи содержат версию формата и номера поколений, которые хранятся
+    в Redis и увеличиваются при изменениях:
+    - общее поколение сбрасывает весь кэш рецептов;
+    - поколение списков сбрасывает все страницы списка;
+    - версия рецепта сбрасывает только этот рецепт.
+    Номера поколений читаются до запроса к БД, поэтому ответ, собранный
+    до изменения рецепта, сохраняется под устаревшим ключом и не будет
+    прочитан. Время жизни ключей нужно только для очистки Redis.
+    Без подключения к Redis кэш отключен, ошибки Redis не прерывают запрос.
+    """
+
+    prefix = f"recipes:v{RECIPE_CACHE_VERSION}"
+
+    def __init__(self, redis=redis_manager):
+        self.redis = redis
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis.is_connected
+
+    def _generation_key(self):
+        return f"{self.prefix}:generation"
+
+    def _list_generation_key(self):
+        return f"{self.prefix}:list_generation"
+
+    def _recipe_version_key(self, id: int):
+        return f"{self.prefix}:recipe_version:{id}"
+
+    async def _get_versions(self, *keys: str) -> list[int]:
+        versions = await self.redis.mget(*keys)
+        return [int(version or 0) for version in versions]
+
+    async def get_list_key(self, query_params: dict) -> str | None:
+        """Ключ страницы списка рецептов для текущих поколений."""
+        if not self.enabled:
+            return None
+        try:
+            generation, list_generation = await self._get_versions(
+                self._generation_key(), self._list_generation_key()
+            )
+        except RedisError as ex:
+            logger.warning(f"Кэш рецептов недоступен: {ex}")
+            return None
+        params_hash = hashlib.sha1(
+            json.dumps(query_params, sort_keys=True).encode()
+        ).hexdigest()
+        return f"{self.prefix}:{generation}:{list_generation}:list:{params_hash}"
+
+    async def get_recipe_key(self, id: int) -> str | None:
+        """Ключ рецепта для текущего поколения и версии рецепта."""
+        if not self.enabled:
+            return None
+        try:
+            generation, recipe_version = await self._get_versions(
+                self._generation_key(), self._recipe_version_key(id)
+            )
+        except RedisError as ex:
+            logger.warning(f"Кэш рецептов недоступен: {ex}")
+            return None
+        return f"{self.prefix}:{generation}:recipe:{id}:{recipe_version}"
+
+    async def get(self, key: str | None, schema):
+        if key is None:
+            return None
+        try:
+            cached = await self.redis.get(key)
+        except RedisError as ex:
+            logger.warning(f"Кэш рецептов недоступен: {ex}")
+            return None
+        if cached is None:
+            return None
+        return schema.model_validate_json(cached)
+
+    async def set(self, key: str | None, data: RecipeRead | RecipeListRead):
+        if key is None:
+            return
+        try:
+            await self.redis.set(key, data.model_dump_json(), RECIPE_CACHE_EXPIRE)
+        except RedisError as ex:
+            logger.warning(f"Кэш рецептов недоступен: {ex}")
+
+    async def _incr(self, *keys: str):
+        if not self.enabled:
+            return
+        try:
+            for key in keys:
+                await self.redis.incr(key)
+        except RedisError as ex:
+            logger.error(f"Не удалось сбросить кэш рецептов: {ex}")
+
+    async def invalidate_lists(self):
+        """Сброс страниц списка рецептов, например после создания рецепта."""
+        await self._incr(self._list_generation_key())
+
+    async def invalidate_recipe(self, id: int):
+        """Сброс рецепта и страниц списка после изменения или удаления."""
+        await self._incr(self._recipe_version_key(id), self._list_generation_key())
+
+    async def invalidate_all(self):
+        """Сброс всего кэша рецептов, например после удаления тега."""
+        await self._incr(self._generation_key())
@@ -0,0 +1,48 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from asyncpg.exceptions import DeadlockDetectedError, SerializationError
+from sqlalchemy.exc import DBAPIError
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from backend.src.base import Base  # noqa
+from backend.src.constants import COUNTERS_RECONCILE_ATTEMPTS
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+
+
+async def reconcile_counters(
+    attempts: int = COUNTERS_RECONCILE_ATTEMPTS,
+) -> dict[str, int]:
+    """Пересчет счетчиков пользователей и рецептов по исходным таблицам.
+
+    Сверка выполняется в транзакции REPEATABLE READ: если счетчик
+    изменила транзакция, зафиксированная после начала сверки, UPDATE
+    завершается ошибкой сериализации вместо того, чтобы перезаписать
+    новое значение счетом по старому снимку, и сверка повторяется.
+    Запускается отдельно от приложения, например по cron:
+    poe reconcile_counters. Возвращается число исправленных строк для
+    каждого счетчика.
+    """
+    for attempt in range(1, attempts + 1):
+        async with DBManager(session_factory=async_session_maker) as db:
+            await db.session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+            try:
+                fixed = await db.counters.reconcile()
+                await db.commit()
+                return fixed
+            except DBAPIError as ex:
+                if attempt == attempts or not isinstance(
+                    ex.orig.__cause__, (SerializationError, DeadlockDetectedError)
+                ):
+                    raise
+
+
+if __name__ == "__main__":
+    fixed = asyncio.run(reconcile_counters())
+    for counter, count in fixed.items():
+        print(f"{counter}: исправлено строк {count}")
@@ -0,0 +1,38 @@
+import csv
+import io
+
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+
+SHOPPING_LIST_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "txt": "text/plain; charset=utf-8",
+}
+SHOPPING_LIST_CSV_HEADER = ("Ингредиент", "Количество", "Единица измерения")
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+async def stream_shopping_list(user_id: int, username: str, format: str):
+    """Список покупок в формате csv или txt, строка за строкой.
+
+    Сессия открывается внутри генератора: зависимость DBManager
+    закрывается до отправки тела ответа, а строки читаются из БД
+    по мере отправки клиенту.
+    """
+    if format == "csv":
+        yield _csv_line(SHOPPING_LIST_CSV_HEADER)
+    else:
+        yield f"Список покупок пользователя {username}\n\n"
+    async with DBManager(session_factory=async_session_maker) as db:
+        async for elem in db.shopping_cart.stream_shopping_list(user_id):
+            if format == "csv":
+                yield _csv_line(
+                    (elem["name"], elem["total_amount"], elem["measurement_unit"])
+                )
+            else:
+                yield f'{elem["line"]}\n'
@@ -0,0 +1,131 @@
+from loguru import logger
+from redis.exceptions import RedisError
+
+from backend.src.constants import SUBSCRIPTION_CACHE_EXPIRE, SUBSCRIPTION_CACHE_VERSION
+from backend.src.setup import redis_manager
+
+LOADED_MARKER = 0
+# Множество заполняется, только если версия подписчика не изменилась с
+# начала чтения из БД и множества еще нет. SADD выполняется частями,
+# чтобы не упереться в ограничение unpack на число аргументов.
+LOAD_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+for i = 3, #ARGV, 1000 do
+    redis.call('SADD', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+INVALIDATE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+"""
+
+
+class SubscriptionGraphCache:
+    """Кэш подписок: для каждого подписчика множество id авторов в Redis.
+
+    Флаги подписки для страницы авторов проверяются одной командой
+    SMISMEMBER. Служебный элемент LOADED_MARKER отмечает множество,
+    загруженное из Postgres целиком: без него множество считается
+    отсутствующим, и подписки читаются из БД. Подписка и отписка после
+    фиксации транзакции удаляют множество и увеличивают версию подписчика.
+    Загрузка запоминает версию до чтения из БД и сохраняет множество,
+    только если версия не изменилась, поэтому прочитанные до отписки
+    подписки не попадут в кэш после нее. Полностью кэш восстанавливается
+    командой rebuild_subscription_cache.
+    Без подключения к Redis кэш отключен, ошибки Redis не прерывают запрос.
+    """
+
+    prefix = f"subscriptions:v{SUBSCRIPTION_CACHE_VERSION}:following"
+    version_prefix = f"subscriptions:v{SUBSCRIPTION_CACHE_VERSION}:version"
+
+    def __init__(self, redis=redis_manager):
+        self.redis = redis
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis.is_connected
+
+    def _key(self, subscriber_id: int) -> str:
+        return f"{self.prefix}:{subscriber_id}"
+
+    def _version_key(self, subscriber_id: int) -> str:
+        return f"{self.version_prefix}:{subscriber_id}"
+
+    async def get_subscribed(
+        self, subscriber_id: int, author_ids: list[int]
+    ) -> set[int] | None:
+        """id авторов из author_ids, на которых подписан пользователь,
+        или None, если подписки пользователя не загружены в кэш."""
+        if not self.enabled:
+            return None
+        author_ids = list(author_ids)
+        try:
+            flags = await self.redis.smismember(
+                self._key(subscriber_id), LOADED_MARKER, *author_ids
+            )
+        except RedisError as ex:
+            logger.warning(f"Кэш подписок недоступен: {ex}")
+            return None
+        if not flags[0]:
+            return None
+        return {author_id for author_id, flag in zip(author_ids, flags[1:]) if flag}
+
+    async def get_version(self, subscriber_id: int) -> str | None:
+        """Версия подписок пользователя, читается до загрузки из БД."""
+        if not self.enabled:
+            return None
+        try:
+            version = await self.redis.get(self._version_key(subscriber_id))
+        except RedisError as ex:
+            logger.warning(f"Кэш подписок недоступен: {ex}")
+            return None
+        return version.decode() if version else ""
+
+    async def load(self, subscriber_id: int, author_ids: list[int], version: str):
+        """Сохранение всех подписок пользователя, прочитанных из БД,
+        если с момента получения version они не менялись."""
+        if not self.enabled or version is None:
+            return
+        try:
+            await self.redis.eval(
+                LOAD_SCRIPT,
+                [self._key(subscriber_id), self._version_key(subscriber_id)],
+                version,
+                SUBSCRIPTION_CACHE_EXPIRE,
+                LOADED_MARKER,
+                *author_ids,
+            )
+        except RedisError as ex:
+            logger.warning(f"Кэш подписок недоступен: {ex}")
+
+    async def invalidate(self, subscriber_id: int):
+        """Сброс подписок пользователя после подписки или отписки."""
+        if not self.enabled:
+            return
+        try:
+            await self.redis.eval(
+                INVALIDATE_SCRIPT,
+                [self._key(subscriber_id), self._version_key(subscriber_id)],
+                SUBSCRIPTION_CACHE_EXPIRE,
+            )
+        except RedisError as ex:
+            logger.error(f"Не удалось обновить кэш подписок: {ex}")
+
+    async def rebuild(self, follows: dict[int, list[int]]):
+        """Замена кэша подписками всех пользователей из БД."""
+        await self.redis.delete_by_pattern(f"{self.prefix}:*")
+        for subscriber_id, author_ids in follows.items():
+            await self.redis.replace_set(
+                self._key(subscriber_id),
+                LOADED_MARKER,
+                *author_ids,
+                expire=SUBSCRIPTION_CACHE_EXPIRE,
+            )
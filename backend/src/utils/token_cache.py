@@ -0,0 +1,44 @@
+import time
+from collections import OrderedDict
+
+
+class VerifiedTokenCache:
+    """LRU проверенных JWT токенов процесса.
+
+    Для токена из кэша не проверяется подпись и не создается заново схема
+    пользователя. Запись живет не дольше ttl секунд и не дольше срока
+    действия самого токена, самые давние по использованию записи
+    вытесняются при превышении max_size.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._tokens = OrderedDict()
+
+    def get(self, token: str):
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return value
+
+    def set(self, token: str, value, expire: float):
+        """Сохранение проверенного токена, expire - срок действия токена
+        в секундах от начала эпохи."""
+        if self.max_size <= 0:
+            return
+        self._tokens[token] = (value, min(time.time() + self.ttl, expire))
+        self._tokens.move_to_end(token)
+        while len(self._tokens) > self.max_size:
+            self._tokens.popitem(last=False)
+
+    def clear(self):
+        self._tokens.clear()
+
+    def __len__(self):
+        return len(self._tokens)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+from backend.src.config import settings
+from backend.src.constants import TOKEN_REVOCATION_BATCH_DELAY
+from backend.src.setup import redis_manager
+
+
+class TokenRevocationList:
+    """Отозванные JWT токены в Redis.
+
+    Для отозванного токена хранится ключ с его идентификатором, который
+    живет до истечения срока действия токена. Проверки, пришедшие в
+    процесс в течение batch_delay секунд, выполняются одной командой MGET,
+    одновременные проверки одного токена ждут общий результат.
+    Отзыв включается настройкой TOKEN_REVOCATION_ENABLED и работает только
+    при подключении к Redis, ошибки Redis не прерывают запрос.
+    """
+
+    prefix = "tokens:revoked"
+
+    def __init__(
+        self,
+        redis=redis_manager,
+        enabled: bool = settings.TOKEN_REVOCATION_ENABLED,
+        batch_delay: float = TOKEN_REVOCATION_BATCH_DELAY,
+    ):
+        self.redis = redis
+        self._enabled = enabled
+        self.batch_delay = batch_delay
+        self._pending = dict()
+        self._flush_task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.redis.is_connected
+
+    def _key(self, token_id: str) -> str:
+        return f"{self.prefix}:{token_id}"
+
+    async def revoke(self, token_id: str, expire: int):
+        """Отзыв токена, expire - срок действия токена в секундах
+        от начала эпохи."""
+        if not self.enabled:
+            return
+        ttl = expire - int(time.time())
+        if ttl <= 0:
+            return
+        try:
+            await self.redis.set(self._key(token_id), 1, expire=ttl)
+        except RedisError as ex:
+            logger.warning(f"Не удалось отозвать токен: {ex}")
+
+    async def is_revoked(self, token_id: str) -> bool:
+        if not self.enabled:
+            return False
+        future = self._pending.get(token_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[token_id] = future
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        return await asyncio.shield(future)
+
+    async def _flush(self):
+        await asyncio.sleep(self.batch_delay)
+        pending, self._pending = self._pending, dict()
+        self._flush_task = None
+        token_ids = list(pending)
+        try:
+            values = await self.redis.mget(*map(self._key, token_ids))
+        except RedisError as ex:
+            logger.warning(f"Список отозванных токенов недоступен: {ex}")
+            values = [None] * len(token_ids)
+        for token_id, value in zip(token_ids, values):
+            if not pending[token_id].done():
+                pending[token_id].set_result(value is not None)
@@ -0,0 +1,49 @@
+from loguru import logger
+from redis.exceptions import RedisError
+
+from backend.src.constants import USER_COUNT_CACHE_EXPIRE
+from backend.src.setup import redis_manager
+
+
+class UserCountCache:
+    """Кэш общего числа пользователей для поля count списка пользователей.
+
+    Значение сбрасывается после регистрации пользователя, время жизни
+    ограничивает расхождение при изменениях в обход репозитория.
+    Без подключения к Redis кэш отключен, ошибки Redis не прерывают запрос.
+    """
+
+    key = "users:count"
+
+    def __init__(self, redis=redis_manager):
+        self.redis = redis
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis.is_connected
+
+    async def get(self) -> int | None:
+        if not self.enabled:
+            return None
+        try:
+            count = await self.redis.get(self.key)
+        except RedisError as ex:
+            logger.warning(f"Кэш числа пользователей недоступен: {ex}")
+            return None
+        return None if count is None else int(count)
+
+    async def set(self, count: int):
+        if not self.enabled:
+            return
+        try:
+            await self.redis.set(self.key, count, USER_COUNT_CACHE_EXPIRE)
+        except RedisError as ex:
+            logger.warning(f"Кэш числа пользователей недоступен: {ex}")
+
+    async def invalidate(self):
+        if not self.enabled:
+            return
+        try:
+            await self.redis.delete(self.key)
+        except RedisError as ex:
+            logger.error(f"Не удалось сбросить кэш числа пользователей: {ex}")
@@ -1,8 +1,6 @@
 # ruff: noqa: E402
 
 import json
-import os
-import pathlib
 from unittest import mock
 
 
@@ -18,11 +16,10 @@ mock.patch("fastapi_cache.decorator.cache", disable_cache).start()
 import pytest
 from fastapi import status
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import select, delete
+from sqlalchemy import select
 
 from backend.src.base import Base
 from backend.src.config import settings
-from backend.src.constants import MOUNT_PATH
 from backend.src.db import engine, async_session_maker
 from backend.src.db_manager import DBManager
 from backend.src.main import app
@@ -35,6 +32,7 @@ from backend.src.schemas.recipes import (
     FavoriteRecipeCreate,
 )
 from backend.src.schemas.tags import TagCreate
+from backend.src.utils.image_derivatives import remove_image_files
 
 
 MAX_EMAIL_LENGTH = 254
@@ -51,14 +49,11 @@ async def check_test_mode():
 async def setup_database():
     try:
         async with engine.connect() as conn:
-            media_path = pathlib.Path(__file__).parent.parent.resolve()
             images_to_del_stmt = select(ImageModel.name)
             image_list = await conn.execute(images_to_del_stmt)
             image_list = image_list.scalars().all()
             for image in image_list:
-                image_to_delete = f"{media_path}/src{MOUNT_PATH}/{image}"
-                if os.path.exists(image_to_delete):
-                    os.remove(image_to_delete)
+                remove_image_files(image)
     except Exception:
         pass
     async with engine.begin() as conn:
@@ -238,8 +233,9 @@ async def recipe_bulk_creating_fixture(db, recipe_creation_fixture):
 
 @pytest.fixture()
 async def removing_recipes_after_tests(db):
-    stmt = delete(RecipeModel)
-    await db.session.execute(stmt)
+    recipe_ids = await db.session.execute(select(RecipeModel.id))
+    for recipe_id in recipe_ids.scalars().all():
+        await db.recipes.delete(id=recipe_id)
     await db.commit()
     existing_recipes_stmt = select(RecipeModel)
     existing_recipes = await db.session.execute(existing_recipes_stmt)
@@ -248,8 +244,7 @@ async def removing_recipes_after_tests(db):
 
 @pytest.fixture()
 async def removing_recipe_after_test(db, recipe_id):
-    stmt = delete(RecipeModel).filter_by(id=recipe_id)
-    await db.session.execute(stmt)
+    await db.recipes.delete(id=recipe_id)
     await db.commit()
     existing_recipes_stmt = select(RecipeModel)
     existing_recipes = await db.session.execute(existing_recipes_stmt)
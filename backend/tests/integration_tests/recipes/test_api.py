@@ -1,6 +1,14 @@
+import base64
+import glob
+import json
+import struct
+import zlib
+
 import pytest
 from fastapi import status
 
+from backend.src.constants import IMAGE_MAX_SIZE
+from backend.src.utils.image_upload import MEDIA_PATH, UPLOAD_TMP_PATH
 from backend.tests.conftest import PARAMS_MAX_LENGTH
 
 
@@ -148,6 +156,96 @@ async def test_recipe_removing(auth_ac):
     assert removed_recipe.status_code == status.HTTP_204_NO_CONTENT
 
 
+PNG_IMAGE = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACVBMVEUAAAD///9fX1"
+    "/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=="
+)
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+# Заголовок PNG 20000x20000: файл в сотню байт, который Pillow
+# отказывается открывать как бомбу распаковки.
+BOMB_IMAGE = (
+    b"\x89PNG\r\n\x1a\n"
+    + png_chunk(b"IHDR", struct.pack(">IIBBBBB", 20000, 20000, 1, 0, 0, 0, 0))
+    + png_chunk(b"IDAT", zlib.compress(b""))
+    + png_chunk(b"IEND", b"")
+)
+
+
+@pytest.mark.parametrize(
+    "image, status_code",
+    [
+        (("recipe.png", PNG_IMAGE, "image/png"), status.HTTP_201_CREATED),
+        (None, status.HTTP_400_BAD_REQUEST),
+        (("bomb.png", BOMB_IMAGE, "image/png"), status.HTTP_400_BAD_REQUEST),
+        (
+            ("recipe.png", b"not an image", "image/png"),
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        ),
+        (
+            ("recipe.txt", PNG_IMAGE, "text/plain"),
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        ),
+        (
+            ("recipe.png", PNG_IMAGE + bytes(IMAGE_MAX_SIZE), "image/png"),
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        ),
+    ],
+)
+async def test_recipe_creating_with_upload(auth_ac, image, status_code):
+    files = {"image": image} if image else {"comment": (None, "без картинки")}
+    new_recipe = await auth_ac.post(
+        "/api/recipes/upload",
+        data={
+            "name": "uploaded name",
+            "text": "uploaded text",
+            "cooking_time": 10,
+            "tags": [2, 3],
+            "ingredients": json.dumps([{"id": 1, "amount": 100}]),
+        },
+        files=files,
+    )
+    assert (
+        new_recipe.status_code == status_code
+    ), f"статус ответа отличается от {status_code}"
+    assert not glob.glob(
+        f"{UPLOAD_TMP_PATH}/.upload-*"
+    ), "временные файлы загрузки должны удаляться"
+    assert not glob.glob(
+        f"{MEDIA_PATH}/.upload-*"
+    ), "загрузки не пишутся в раздаваемую директорию"
+    if new_recipe.status_code != status.HTTP_201_CREATED:
+        return
+    recipe_id = new_recipe.json()["id"]
+    image_name = new_recipe.json()["image"].split("/")[-1]
+    assert image_name.endswith(".png"), "расширение определяется по содержимому"
+    with open(f"{MEDIA_PATH}/{image_name}", "rb") as image_file:
+        assert image_file.read() == PNG_IMAGE, "картинка сохранена без изменений"
+    assert [
+        ingredient["amount"] for ingredient in new_recipe.json()["ingredients"]
+    ] == [100]
+
+    updated_recipe = await auth_ac.patch(
+        f"/api/recipes/{recipe_id}/upload",
+        data={"name": "updated name", "text": "updated text", "cooking_time": 20},
+        files={"image": ("new.gif", b"GIF89a" + bytes(16), "image/gif")},
+    )
+    assert updated_recipe.status_code == status.HTTP_200_OK
+    assert updated_recipe.json()["name"] == "updated name"
+    assert updated_recipe.json()["image"].endswith(".gif")
+    removed_recipe = await auth_ac.delete(f"/api/recipes/{recipe_id}")
+    assert removed_recipe.status_code == status.HTTP_204_NO_CONTENT
+
+
 # @pytest.mark.order(12)
 class TestFilteredRecipe:
     recipes_data = {
@@ -1,4 +1,44 @@
-from backend.src.schemas.recipes import RecipeCreateRequest, RecipeUpdateRequest
+import asyncio
+import base64
+import glob
+import hashlib
+import io
+import os
+from functools import partial
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+
+from backend.src.config import settings
+from backend.src.connectors.redis_connector import RedisManager
+from backend.src.db import async_session_maker, engine
+from backend.src.db_manager import DBManager
+from backend.src.exceptions.ingredients import IngredientNotFoundException
+from backend.src.models.recipes import RecipeModel
+from backend.src.models.subscriptions import SubscriptionModel
+from backend.src.repositories.recipes import RecipeRepository
+from backend.src.repositories.utils.viewer_state import ViewerStateResolver
+from backend.src.schemas.ingredients import (
+    IngredientAmountCreate,
+    IngredientAmountCreateRequest,
+    IngredientCreate,
+)
+from backend.src.schemas.recipes import (
+    FavoriteRecipeCreate,
+    RecipeCreateRequest,
+    RecipeUpdateRequest,
+    ShoppingCartRecipeCreate,
+)
+from backend.src.schemas.subscriptions import SubscriptionCreate
+from backend.src.schemas.tags import TagCreate
+from backend.src.services import only_for_admins, recipes
+from backend.src.utils.image_upload import MEDIA_PATH, UPLOAD_TMP_PATH
+from backend.src.utils.recipe_cache import RecipeCache
+from backend.src.utils.reconcile_counters import reconcile_counters
 
 
 async def test_recipe_crud(
@@ -51,3 +91,453 @@ async def test_recipe_crud(
     ), "обновленный репецт не найден в бд"
     await db.recipes.delete(id=updated_recipe.id)
     await db.commit()
+
+
+async def test_recipe_list_by_ids(db, recipe_creation_fixture: RecipeCreateRequest):
+    recipe_ids = list()
+    for _ in range(3):
+        new_recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+        )
+        recipe_ids.append(new_recipe.id)
+    await db.commit()
+    current_user = await db.users.get_one_or_none(user_id=1)
+
+    recipe_list = await db.recipes.get_list_by_ids(
+        recipe_ids=recipe_ids[::-1], current_user=current_user
+    )
+    assert [recipe.id for recipe in recipe_list] == recipe_ids[
+        ::-1
+    ], "порядок рецептов должен совпадать с порядком переданных id"
+    single_recipe = await db.recipes.get_one_or_none(
+        id=recipe_ids[0], current_user=current_user, db=db
+    )
+    assert (
+        recipe_list[-1] == single_recipe
+    ), "рецепт из списка отличается от рецепта, полученного по id"
+
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
+
+
+async def test_recipe_list_by_cursor(db, recipe_creation_fixture: RecipeCreateRequest):
+    recipe_ids = list()
+    for _ in range(2):
+        new_recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=2
+        )
+        recipe_ids.append(new_recipe.id)
+    await db.commit()
+    list_params = {
+        "current_user": None,
+        "is_favorited": 0,
+        "is_in_shopping_cart": 0,
+        "tags": None,
+        "author": 2,
+        "db": db,
+        "limit": 1,
+        "page": None,
+        "router_prefix": "/api/recipes",
+    }
+
+    first_page = await db.recipes.get_filtered(cursor="", **list_params)
+    assert first_page.count == 2, "count считается на первой странице"
+    next_cursor = first_page.next.split("cursor=", 1)[1].split("&", 1)[0]
+    second_page = await db.recipes.get_filtered(cursor=next_cursor, **list_params)
+    assert second_page.count is None, "следующие страницы не считают count"
+    assert [recipe.id for recipe in first_page.results + second_page.results] == (
+        recipe_ids[::-1]
+    )
+
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
+
+
+async def test_viewer_state_resolver(db, recipe_creation_fixture: RecipeCreateRequest):
+    recipe_ids = list()
+    for _ in range(2):
+        new_recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+        )
+        recipe_ids.append(new_recipe.id)
+    await db.favorite_recipes.create(
+        data=FavoriteRecipeCreate(recipe_id=recipe_ids[0], user_id=2)
+    )
+    await db.shopping_cart.create(
+        data=ShoppingCartRecipeCreate(recipe_id=recipe_ids[1], user_id=2)
+    )
+    new_subscription = await db.session.execute(
+        insert(SubscriptionModel)
+        .values(author_id=1, subscriber_id=2)
+        .on_conflict_do_nothing()
+        .returning(SubscriptionModel.id)
+    )
+    new_subscription_id = new_subscription.scalars().one_or_none()
+    await db.commit()
+
+    viewer_state = await ViewerStateResolver(db.session, user_id=2).resolve(
+        recipe_ids=recipe_ids, author_ids=[1]
+    )
+    assert viewer_state.favorited_ids == {recipe_ids[0]}
+    assert viewer_state.in_shopping_cart_ids == {recipe_ids[1]}
+    assert viewer_state.subscribed_author_ids == {1}
+    anonymous_state = await ViewerStateResolver(db.session, user_id=None).resolve(
+        recipe_ids=recipe_ids, author_ids=[1]
+    )
+    assert not anonymous_state.favorited_ids, "у анонима нет избранного"
+
+    current_user = await db.users.get_one_or_none(user_id=2)
+    single_recipe = await db.recipes.get_one_or_none(
+        id=recipe_ids[0], current_user=current_user
+    )
+    assert single_recipe.is_favorited
+    assert not single_recipe.is_in_shopping_cart
+    assert single_recipe.author.is_subscribed
+    recipe_list = await db.recipes.get_list_by_ids(
+        recipe_ids=recipe_ids, current_user=current_user
+    )
+    assert recipe_list[0] == single_recipe, "флаги списка и рецепта различаются"
+    assert recipe_list[1].is_in_shopping_cart
+
+    await db.session.execute(
+        delete(SubscriptionModel).filter_by(id=new_subscription_id)
+    )
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
+
+
+async def test_shared_ingredient_amounts(
+    db,
+    recipe_creation_fixture: RecipeCreateRequest,
+    recipe_updating_fixture: RecipeUpdateRequest,
+):
+    first_recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+    )
+    second_recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+    )
+    await db.commit()
+
+    executed_statements = list()
+
+    def count_statements(*args):
+        executed_statements.append(args)
+
+    ingredients_data = [
+        IngredientAmountCreate(ingredient_id=ingredient_id, amount=ingredient_id * 10)
+        for ingredient_id in range(1, 11)
+    ]
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statements)
+    new_ingredients = await db.ingredients_amount.change_recipe_ingredients(
+        ingredients_data=ingredients_data, recipe_id=first_recipe.id
+    )
+    event.remove(engine.sync_engine, "before_cursor_execute", count_statements)
+    await db.commit()
+    assert len(new_ingredients) == len(ingredients_data)
+    assert (
+        len(executed_statements) <= 5
+    ), "число запросов не должно зависеть от количества ингредиентов"
+
+    await db.recipes.update(
+        recipe_data=recipe_updating_fixture, db=db, id=first_recipe.id
+    )
+    await db.recipes.delete(id=first_recipe.id)
+    await db.commit()
+    current_recipe = await db.recipes.get_one_or_none(
+        id=second_recipe.id, current_user=None
+    )
+    assert (
+        current_recipe.ingredients == second_recipe.ingredients
+    ), "изменение другого рецепта не должно затрагивать общие ингредиенты"
+
+    await db.recipes.delete(id=second_recipe.id)
+    await db.commit()
+
+
+async def test_shared_recipe_images(
+    db,
+    recipe_creation_fixture: RecipeCreateRequest,
+    recipe_updating_fixture: RecipeUpdateRequest,
+):
+    image_file = io.BytesIO()
+    Image.new("RGB", (2, 3), "#123456").save(image_file, format="PNG")
+    recipe_creation_fixture.image = "data:image/png;base64," + base64.b64encode(
+        image_file.getvalue()
+    ).decode("utf-8")
+    first_recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+    )
+    second_recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=2
+    )
+    await db.commit()
+    image_name = first_recipe.image.split("/")[-1]
+    assert second_recipe.image == first_recipe.image, "одна картинка - один файл"
+    image = await db.images.get_one_or_none(name=image_name)
+    assert image.ref_count == 2
+    assert image.mime == "image/png"
+    assert (image.width, image.height) == (2, 3)
+    assert image_name == f"{image.hash}.png"
+    assert image.has_derivatives, "копии создаются при загрузке"
+    recipe_detail = await db.recipes.get_one_or_none(
+        id=second_recipe.id, current_user=None
+    )
+    assert recipe_detail.image_variants == first_recipe.image_variants
+    assert first_recipe.image_variants.card.endswith(f"{image.hash}_card.webp")
+
+    updated_recipe = await db.recipes.update(
+        recipe_data=recipe_updating_fixture, db=db, id=first_recipe.id
+    )
+    await db.commit()
+    assert updated_recipe.image != first_recipe.image
+    image = await db.images.get_one_or_none(name=image_name)
+    assert image.ref_count == 1
+    assert os.path.exists(f"{MEDIA_PATH}/{image_name}")
+
+    await db.recipes.delete(id=second_recipe.id)
+    await db.commit()
+    assert await db.images.get_one_or_none(name=image_name) is None
+    assert not os.path.exists(
+        f"{MEDIA_PATH}/{image_name}"
+    ), "файл удаляется вместе с последней ссылкой"
+    assert not os.path.exists(f"{MEDIA_PATH}/{image.hash}_card.webp")
+
+    await db.recipes.delete(id=first_recipe.id)
+    await db.commit()
+
+
+async def test_image_files_follow_transaction(
+    recipe_creation_fixture: RecipeCreateRequest,
+):
+    image_file = io.BytesIO()
+    Image.new("RGB", (4, 4), "#abcdef").save(image_file, format="PNG")
+    image_name = f"{hashlib.sha256(image_file.getvalue()).hexdigest()}.png"
+    recipe_creation_fixture.image = "data:image/png;base64," + base64.b64encode(
+        image_file.getvalue()
+    ).decode("utf-8")
+
+    failing_recipe = recipe_creation_fixture.model_copy(
+        update={"ingredients": [IngredientAmountCreateRequest(id=10**6, amount=1)]}
+    )
+    with pytest.raises(IngredientNotFoundException):
+        async with DBManager(session_factory=async_session_maker) as db:
+            await db.recipes.create(
+                recipe_data=failing_recipe, db=db, current_user_id=1
+            )
+    assert not os.path.exists(f"{MEDIA_PATH}/{image_name}")
+    assert not glob.glob(
+        f"{UPLOAD_TMP_PATH}/.upload-*"
+    ), "после отката временные файлы удаляются"
+
+    async with DBManager(session_factory=async_session_maker) as db:
+        recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+        )
+        assert not os.path.exists(
+            f"{MEDIA_PATH}/{image_name}"
+        ), "файл появляется только после commit"
+        await db.commit()
+        assert os.path.exists(f"{MEDIA_PATH}/{image_name}")
+
+        await db.recipes.delete(id=recipe.id)
+        assert os.path.exists(f"{MEDIA_PATH}/{image_name}")
+        await db.commit()
+        assert not os.path.exists(f"{MEDIA_PATH}/{image_name}")
+
+        recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+        )
+        stale_removal = asyncio.create_task(
+            RecipeRepository._remove_image_files(image_name)
+        )
+        await asyncio.sleep(0.2)
+        assert not stale_removal.done(), "удаление файла ждет загрузку тех же байтов"
+        await db.commit()
+        await stale_removal
+        assert os.path.exists(
+            f"{MEDIA_PATH}/{image_name}"
+        ), "устаревшее удаление не трогает загруженную заново картинку"
+        await db.recipes.delete(id=recipe.id)
+        await db.commit()
+
+
+async def test_denormalized_counters(db, recipe_creation_fixture: RecipeCreateRequest):
+    author = await db.users.get_one_or_none(user_id=2)
+
+    recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=2
+    )
+    assert recipe.author.recipes_count == author.recipes_count + 1
+    await db.favorite_recipes.create(
+        data=FavoriteRecipeCreate(recipe_id=recipe.id, user_id=1)
+    )
+    await db.favorite_recipes.add_many(
+        user_id=1, recipes_stmt=db.favorite_recipes.recipes_by_ids([recipe.id])
+    )
+    for user_id in (1, 2):
+        await db.shopping_cart.create(
+            data=ShoppingCartRecipeCreate(recipe_id=recipe.id, user_id=user_id)
+        )
+    await db.subscriptions.create(
+        data=SubscriptionCreate(author_id=2, subscriber_id=1), recipes_limit=0
+    )
+    await db.commit()
+
+    single_recipe = await db.recipes.get_one_or_none(id=recipe.id, current_user=None)
+    assert single_recipe.favorites_count == 1, "повторное добавление не считается"
+    assert single_recipe.shopping_cart_count == 2
+    assert single_recipe.author.recipes_count == author.recipes_count + 1
+    assert single_recipe.author.followers_count == author.followers_count + 1
+    recipe_list = await db.recipes.get_list_by_ids(recipe_ids=[recipe.id])
+    assert recipe_list[0] == single_recipe, "счетчики списка и рецепта различаются"
+
+    await db.favorite_recipes.remove_many(user_id=1, recipe_ids=[recipe.id])
+    await db.shopping_cart.delete(recipe_id=recipe.id, user_id=1)
+    await db.subscriptions.delete(author_id=2, subscriber_id=1)
+    await db.commit()
+    single_recipe = await db.recipes.get_one_or_none(id=recipe.id, current_user=None)
+    assert single_recipe.favorites_count == 0
+    assert single_recipe.shopping_cart_count == 1
+    assert single_recipe.author.followers_count == author.followers_count
+
+    await db.session.execute(
+        update(RecipeModel).filter_by(id=recipe.id).values(favorites_count=5)
+    )
+    await db.commit()
+    async with DBManager(session_factory=async_session_maker) as reconciler:
+        await reconciler.session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        await reconciler.session.execute(select(RecipeModel.id).limit(1))
+        await db.favorite_recipes.create(
+            data=FavoriteRecipeCreate(recipe_id=recipe.id, user_id=1)
+        )
+        await db.commit()
+        with pytest.raises(DBAPIError):
+            await reconciler.counters.reconcile()
+    fixed = await reconcile_counters()
+    assert fixed["favorites_count"] == 1, "сверка исправляет расхождение"
+    single_recipe = await db.recipes.get_one_or_none(id=recipe.id, current_user=None)
+    assert single_recipe.favorites_count == 1, "сверка не теряет новое избранное"
+
+    await db.recipes.delete(id=recipe.id)
+    await db.commit()
+    author_after = await db.users.get_one_or_none(user_id=2)
+    assert author_after.recipes_count == author.recipes_count
+
+
+async def test_recipe_cache(
+    db,
+    monkeypatch,
+    recipe_creation_fixture: RecipeCreateRequest,
+    recipe_updating_fixture: RecipeUpdateRequest,
+):
+    redis = RedisManager(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    await redis.connect()
+    recipe_cache = RecipeCache(redis=redis)
+    await redis.delete_by_pattern(f"{recipe_cache.prefix}:*")
+    for module in (recipes, only_for_admins):
+        monkeypatch.setattr(module, "RecipeCache", partial(RecipeCache, redis=redis))
+    recipe_service = recipes.RecipeService(db)
+    admin_service = only_for_admins.OnlyForAdminService(db)
+    author = await db.users.get_one_or_none(user_id=2)
+    tag = await db.tags.create(TagCreate(name="Перекус", color="#a0a0a0", slug="snack"))
+    ingredient = await db.ingredients.create(
+        data=IngredientCreate(name="кэшированный сыр", measurement_unit="г")
+    )
+    await db.commit()
+    recipe_data = recipe_creation_fixture.model_copy(
+        update={
+            "tags": [tag.id],
+            "ingredients": [
+                IngredientAmountCreateRequest(id=ingredient.id, amount=100)
+            ],
+        }
+    )
+    list_params = {
+        "router_prefix": "/api/recipes",
+        "current_user": None,
+        "page": 1,
+        "limit": 10,
+    }
+
+    async def get_list():
+        return await recipe_service.get_recipe_list(tags=[tag.slug], **list_params)
+
+    recipe = await recipe_service.create_recipe(
+        current_user=author, recipe_data=recipe_data
+    )
+    cached_recipe = await recipe_service.get_recipe(id=recipe.id, current_user=None)
+    cached_list = await get_list()
+    assert (
+        await recipe_cache.get(
+            await recipe_cache.get_recipe_key(id=recipe.id), recipes.RecipeRead
+        )
+        == cached_recipe
+    ), "рецепт сохраняется в кэш"
+    await db.session.execute(
+        update(RecipeModel).filter_by(id=recipe.id).values(name="без сброса кэша")
+    )
+    await db.commit()
+    assert (
+        await recipe_service.get_recipe(id=recipe.id, current_user=None)
+        == cached_recipe
+    ), "повторный запрос рецепта читается из кэша"
+    assert await get_list() == cached_list, "страница списка читается из кэша"
+
+    another_recipe = await recipe_service.create_recipe(
+        current_user=author, recipe_data=recipe_data
+    )
+    recipe_list = await get_list()
+    assert recipe_list.count == 2, "создание рецепта сбрасывает страницы списка"
+    assert {result.id for result in recipe_list.results} == {
+        recipe.id,
+        another_recipe.id,
+    }
+
+    await recipe_service.update_recipe(
+        current_user=author,
+        id=recipe.id,
+        recipe_data=recipe_updating_fixture.model_copy(
+            update={
+                "tags": [tag.id],
+                "ingredients": [
+                    IngredientAmountCreateRequest(id=ingredient.id, amount=300)
+                ],
+            }
+        ),
+    )
+    updated_recipe = await recipe_service.get_recipe(id=recipe.id, current_user=None)
+    assert updated_recipe.name == recipe_updating_fixture.name
+    assert updated_recipe.ingredients[0].amount == 300
+    assert {result.name for result in (await get_list()).results} == {
+        recipe_updating_fixture.name,
+        recipe_data.name,
+    }, "изменение рецепта сбрасывает страницы списка"
+
+    await recipe_service.delete_recipe(current_user=author, id=recipe.id)
+    with pytest.raises(HTTPException):
+        await recipe_service.get_recipe(id=recipe.id, current_user=None)
+    recipe_list = await get_list()
+    assert [result.id for result in recipe_list.results] == [another_recipe.id]
+
+    await recipe_service.get_recipe(id=another_recipe.id, current_user=None)
+    await admin_service.delete_ingredient(id=ingredient.id)
+    another_recipe = await recipe_service.get_recipe(
+        id=another_recipe.id, current_user=None
+    )
+    assert not another_recipe.ingredients, "удаление ингредиента сбрасывает кэш"
+    assert not (await get_list()).results[0].ingredients
+    await admin_service.delete_tag(id=tag.id)
+    another_recipe = await recipe_service.get_recipe(
+        id=another_recipe.id, current_user=None
+    )
+    assert not another_recipe.tags, "удаление тега сбрасывает кэш"
+
+    await recipe_service.delete_recipe(current_user=author, id=another_recipe.id)
+    await redis.delete_by_pattern(f"{recipe_cache.prefix}:*")
+    await redis.close()
@@ -2,6 +2,8 @@ import os
 
 from fastapi import status
 
+from backend.src.setup import shopping_list_cache
+
 
 async def test_shopping_cart_flow(auth_ac, another_auth_ac, test_recipe, db):
     recipe = test_recipe
@@ -42,15 +44,104 @@ async def test_shopping_cart_flow(auth_ac, another_auth_ac, test_recipe, db):
     await db.recipes.delete(id=recipe.id)
     await db.commit()
 
+    cached_documents = set(os.listdir(shopping_list_cache.directory))
     download_shopping_cart = await auth_ac.get("/api/recipes/download_shopping_cart")
     assert (
         download_shopping_cart.status_code == status.HTTP_200_OK
     ), "статус ответа отличается от 200"
-    pdf_to_delete = download_shopping_cart.headers["content-disposition"].split(
-        "filename="
-    )[1]
-
-    pdf_path_to_delete = f"src/media/shopping_cart/shopping_lists/{pdf_to_delete}"
-    assert os.path.exists(pdf_path_to_delete)
-    os.remove(pdf_path_to_delete)
-    assert not os.path.exists(pdf_path_to_delete)
+    assert download_shopping_cart.headers["content-type"] == "application/pdf"
+    assert download_shopping_cart.headers["content-disposition"].endswith(
+        "filename=shopping_list.pdf"
+    )
+
+    etag = download_shopping_cart.headers["etag"]
+    cached_shopping_cart = await auth_ac.get("/api/recipes/download_shopping_cart")
+    assert cached_shopping_cart.headers["etag"] == etag
+    assert cached_shopping_cart.content == download_shopping_cart.content
+    assert "server-timing" not in cached_shopping_cart.headers
+    not_modified = await auth_ac.get(
+        "/api/recipes/download_shopping_cart", headers={"If-None-Match": etag}
+    )
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+    csv_shopping_cart = await auth_ac.get(
+        "/api/recipes/download_shopping_cart", params={"format": "csv"}
+    )
+    assert csv_shopping_cart.status_code == status.HTTP_200_OK
+    assert csv_shopping_cart.headers["content-type"].startswith("text/csv")
+    assert csv_shopping_cart.text.splitlines()[0] == (
+        "Ингредиент,Количество,Единица измерения"
+    )
+    txt_shopping_cart = await auth_ac.get(
+        "/api/recipes/download_shopping_cart", params={"format": "txt"}
+    )
+    assert txt_shopping_cart.status_code == status.HTTP_200_OK
+    assert txt_shopping_cart.headers["content-type"].startswith("text/plain")
+    assert txt_shopping_cart.text.startswith("Список покупок пользователя")
+    wrong_format = await auth_ac.get(
+        "/api/recipes/download_shopping_cart", params={"format": "doc"}
+    )
+    assert wrong_format.status_code == status.HTTP_400_BAD_REQUEST
+    new_documents = set(os.listdir(shopping_list_cache.directory)) - cached_documents
+    document_key = etag.removeprefix('W/"').removesuffix('"')
+    assert new_documents <= {
+        f"{document_key}.pdf"
+    }, "на диск попадает только pdf в кэше документов"
+
+
+async def test_bulk_shopping_cart(auth_ac, db, test_recipe, recipe_creation_fixture):
+    another_recipe = await db.recipes.create(
+        recipe_data=recipe_creation_fixture, db=db, current_user_id=1
+    )
+    await db.commit()
+    recipe_ids = [test_recipe.id, another_recipe.id]
+    missing_id = another_recipe.id + 1000
+
+    favorites = await auth_ac.post(
+        "/api/recipes/favorite", json={"ids": [test_recipe.id, missing_id]}
+    )
+    assert favorites.status_code == status.HTTP_200_OK
+    assert favorites.json() == [
+        {"id": test_recipe.id, "status": "added"},
+        {"id": missing_id, "status": "not_found"},
+    ]
+
+    shopping_cart = await auth_ac.post(
+        "/api/recipes/shopping_cart", json={"ids": [another_recipe.id]}
+    )
+    assert shopping_cart.json() == [{"id": another_recipe.id, "status": "added"}]
+    from_favorites = await auth_ac.post("/api/recipes/shopping_cart/from_favorites")
+    assert {"id": test_recipe.id, "status": "added"} in from_favorites.json()
+    shopping_cart = await auth_ac.post(
+        "/api/recipes/shopping_cart", json={"ids": recipe_ids}
+    )
+    assert [elem["status"] for elem in shopping_cart.json()] == [
+        "already_added",
+        "already_added",
+    ]
+    assert await db.shopping_list_totals.get_inconsistent_users() == []
+
+    removed = await auth_ac.request(
+        "DELETE",
+        "/api/recipes/shopping_cart",
+        json={"ids": [*recipe_ids, missing_id]},
+    )
+    assert removed.json() == [
+        {"id": test_recipe.id, "status": "removed"},
+        {"id": another_recipe.id, "status": "removed"},
+        {"id": missing_id, "status": "not_found"},
+    ]
+    removed = await auth_ac.request(
+        "DELETE", "/api/recipes/favorite", json={"ids": recipe_ids}
+    )
+    assert removed.json() == [
+        {"id": test_recipe.id, "status": "removed"},
+        {"id": another_recipe.id, "status": "not_found"},
+    ]
+    assert await db.shopping_list_totals.get_inconsistent_users() == []
+    empty_ids = await auth_ac.post("/api/recipes/shopping_cart", json={"ids": []})
+    assert empty_ids.status_code == status.HTTP_400_BAD_REQUEST
+
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
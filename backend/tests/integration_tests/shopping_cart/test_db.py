@@ -1,6 +1,16 @@
+import asyncio
+
 import pytest
+from sqlalchemy import select
 
-from backend.src.schemas.recipes import ShoppingCartRecipeCreate
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+from backend.src.models.recipes import ShoppingListTotalModel
+from backend.src.schemas.recipes import (
+    RecipeCreateRequest,
+    RecipeUpdateRequest,
+    ShoppingCartRecipeCreate,
+)
 
 
 @pytest.mark.order(9)
@@ -29,3 +39,123 @@ async def test_shopping_cart_cd(db, test_recipe):
 
     await db.recipes.delete(id=recipe.id)
     await db.commit()
+
+
+async def test_shopping_list_aggregation(db, recipe_creation_fixture):
+    ingredient = await db.ingredients.get_one_or_none(id=4)
+    recipe_ids = list()
+    for amount in (100, 250):
+        recipe_data = RecipeCreateRequest(
+            **recipe_creation_fixture.model_dump(exclude={"ingredients"}),
+            ingredients=[{"id": 4, "amount": amount}, {"id": 5, "amount": 10}],
+        )
+        recipe = await db.recipes.create(
+            recipe_data=recipe_data, db=db, current_user_id=1
+        )
+        await db.shopping_cart.create(
+            ShoppingCartRecipeCreate(recipe_id=recipe.id, user_id=1)
+        )
+        recipe_ids.append(recipe.id)
+    await db.commit()
+
+    shopping_list = [
+        elem async for elem in db.shopping_cart.stream_shopping_list(user_id=1)
+    ]
+    ingredient_rows = [
+        elem for elem in shopping_list if elem["name"] == ingredient.name.capitalize()
+    ]
+    assert len(ingredient_rows) == 1, "разные количества ингредиента в одной строке"
+    assert ingredient_rows[0]["total_amount"] == 350
+    assert ingredient_rows[0]["line"] == (
+        f"{ingredient.name.capitalize()} - 350 {ingredient.measurement_unit}"
+    )
+
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
+
+
+async def test_shopping_list_totals(db, recipe_creation_fixture):
+    assert await db.shopping_list_totals.get_inconsistent_users() == []
+
+    recipe_data = RecipeCreateRequest(
+        **recipe_creation_fixture.model_dump(exclude={"ingredients"}),
+        ingredients=[{"id": 6, "amount": 100}, {"id": 7, "amount": 10}],
+    )
+    recipe = await db.recipes.create(recipe_data=recipe_data, db=db, current_user_id=1)
+    for user_id in (1, 2):
+        await db.shopping_cart.create(
+            ShoppingCartRecipeCreate(recipe_id=recipe.id, user_id=user_id)
+        )
+    await db.commit()
+
+    async def user_totals(user_id):
+        totals = await db.session.execute(
+            select(
+                ShoppingListTotalModel.ingredient_id,
+                ShoppingListTotalModel.total_amount,
+            ).filter(
+                ShoppingListTotalModel.user_id == user_id,
+                ShoppingListTotalModel.ingredient_id.in_((6, 7, 8)),
+            )
+        )
+        return dict(totals.all())
+
+    assert await user_totals(2) == {6: 100, 7: 10}
+    recipe_update_data = RecipeUpdateRequest(
+        **recipe_data.model_dump(exclude={"ingredients"}),
+        ingredients=[{"id": 6, "amount": 300}, {"id": 8, "amount": 5}],
+    )
+    await db.recipes.update(db=db, recipe_data=recipe_update_data, id=recipe.id)
+    await db.commit()
+    assert await user_totals(1) == await user_totals(2) == {6: 300, 8: 5}
+
+    await db.shopping_cart.delete(recipe_id=recipe.id, user_id=2)
+    await db.commit()
+    assert await user_totals(2) == {}
+    assert await db.shopping_list_totals.get_inconsistent_users() == []
+
+    await db.recipes.delete(id=recipe.id)
+    await db.commit()
+    assert await user_totals(1) == {}
+    assert await db.shopping_list_totals.get_inconsistent_users() == []
+
+
+async def test_shopping_cart_waits_for_recipe_update(db, recipe_creation_fixture):
+    recipe_data = RecipeCreateRequest(
+        **recipe_creation_fixture.model_dump(exclude={"ingredients"}),
+        ingredients=[{"id": 9, "amount": 100}],
+    )
+    recipe = await db.recipes.create(recipe_data=recipe_data, db=db, current_user_id=1)
+    await db.commit()
+
+    async def add_to_cart():
+        async with DBManager(session_factory=async_session_maker) as cart_db:
+            await cart_db.shopping_cart.create(
+                ShoppingCartRecipeCreate(recipe_id=recipe.id, user_id=2)
+            )
+            await cart_db.commit()
+
+    async with DBManager(session_factory=async_session_maker) as updater:
+        await updater.recipes.update(
+            db=updater,
+            recipe_data=RecipeUpdateRequest(
+                **recipe_data.model_dump(exclude={"ingredients"}),
+                ingredients=[{"id": 9, "amount": 300}],
+            ),
+            id=recipe.id,
+        )
+        cart_add = asyncio.create_task(add_to_cart())
+        await asyncio.sleep(0.2)
+        assert not cart_add.done(), "добавление в корзину ждет изменения рецепта"
+        await updater.commit()
+    await cart_add
+
+    totals = await db.session.execute(
+        select(ShoppingListTotalModel.total_amount).filter_by(
+            user_id=2, ingredient_id=9
+        )
+    )
+    assert totals.scalars().all() == [300], "суммы посчитаны по новым количествам"
+    await db.recipes.delete(id=recipe.id)
+    await db.commit()
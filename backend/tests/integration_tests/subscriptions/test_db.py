@@ -1,6 +1,13 @@
 import pytest
+from sqlalchemy import func, select
 
+from backend.src.config import settings
+from backend.src.connectors.redis_connector import RedisManager
+from backend.src.db import async_session_maker
+from backend.src.db_manager import DBManager
+from backend.src.models.recipes import RecipeModel
 from backend.src.schemas.subscriptions import SubscriptionCreate
+from backend.src.utils.subscription_cache import SubscriptionGraphCache
 
 
 @pytest.mark.order(7)
@@ -53,3 +60,87 @@ async def test_subscription_crud(db):
     assert (
         len(user_subs.results) == 0
     ), "неверное количество подписок пользователя после отмены подписки"
+
+
+async def test_subscription_recipes_limit(db, recipe_creation_fixture):
+    recipe_ids = list()
+    for _ in range(3):
+        recipe = await db.recipes.create(
+            recipe_data=recipe_creation_fixture, db=db, current_user_id=2
+        )
+        recipe_ids.append(recipe.id)
+    new_sub = await db.subscriptions.create(
+        data=SubscriptionCreate(author_id=2, subscriber_id=1), recipes_limit=1
+    )
+    await db.commit()
+    author_recipes_count = await db.session.execute(
+        select(func.count()).filter(RecipeModel.author == 2)
+    )
+    author_recipes_count = author_recipes_count.scalars().one()
+    assert [recipe.id for recipe in new_sub.recipes] == recipe_ids[-1:]
+    assert new_sub.recipes_count == author_recipes_count
+
+    user_subs = await db.subscriptions.get_user_subs(
+        user_id=1,
+        limit=3,
+        page=1,
+        recipes_limit=2,
+        offset=0,
+        router_prefix="/api/subscriptions",
+    )
+    author = [obj for obj in user_subs.results if obj.id == 2][0]
+    assert [recipe.id for recipe in author.recipes] == recipe_ids[
+        :0:-1
+    ], "в подписке должны быть последние recipes_limit рецептов автора"
+    assert author.recipes_count == author_recipes_count
+
+    recipes = await db.subscriptions.get_authors_recipes(
+        author_ids=[2], recipes_limit=None
+    )
+    assert len(recipes[2]) == author_recipes_count
+
+    await db.subscriptions.delete(author_id=2, subscriber_id=1)
+    for recipe_id in recipe_ids:
+        await db.recipes.delete(id=recipe_id)
+    await db.commit()
+
+
+async def test_subscription_graph_cache(db):
+    redis = RedisManager(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    await redis.connect()
+    graph_cache = SubscriptionGraphCache(redis=redis)
+    db.subscriptions.graph_cache = graph_cache
+    await graph_cache.rebuild(await db.subscriptions.get_all_follows())
+    assert await db.subscriptions.get_subscribed_author_ids(1, [2]) == set()
+
+    await db.subscriptions.create(
+        data=SubscriptionCreate(author_id=2, subscriber_id=1), recipes_limit=1
+    )
+    assert (
+        await graph_cache.get_subscribed(1, [2]) == set()
+    ), "кэш сбрасывается только после фиксации транзакции"
+    await db.commit()
+    assert (
+        await graph_cache.get_subscribed(1, [2]) is None
+    ), "подписка сбрасывает множество подписчика"
+    assert await db.subscriptions.get_subscribed_author_ids(1, [2, 999]) == {2}
+    assert await graph_cache.get_subscribed(1, [2, 999]) == {
+        2
+    }, "при промахе подписки загружаются в кэш из БД"
+
+    await redis.delete(graph_cache._key(1))
+    version = await graph_cache.get_version(1)
+    following_ids = await db.subscriptions.get_following_ids(1)
+    async with DBManager(session_factory=async_session_maker) as other_db:
+        other_db.subscriptions.graph_cache = graph_cache
+        await other_db.subscriptions.delete(author_id=2, subscriber_id=1)
+        await other_db.commit()
+    await graph_cache.load(1, following_ids, version=version)
+    assert (
+        await graph_cache.get_subscribed(1, [2]) is None
+    ), "прочитанные до отписки подписки не попадают в кэш"
+    assert await db.subscriptions.get_subscribed_author_ids(1, [2]) == set()
+    assert await graph_cache.get_subscribed(1, [2]) == set()
+
+    await redis.delete_by_pattern("subscriptions:*")
+    await redis.close()
@@ -1,3 +1,4 @@
+import jwt
 import pytest
 from fastapi import status
 from sqlalchemy import select
@@ -104,6 +105,10 @@ async def test_auth_flow(
         jwt_token.status_code == status.HTTP_201_CREATED
     ), "статус ответа отличается от 201"
     assert isinstance(jwt_token.json()["auth_token"], str), "неверный формат jwt-токена"
+    claims = jwt.decode(
+        jwt_token.json()["auth_token"], options={"verify_signature": False}
+    )
+    assert set(claims) == {"sub", "role", "exp", "jti"}, "лишние данные в токене"
 
     current_user_info = await ac.get(
         "/api/users/me",
@@ -197,3 +202,31 @@ async def test_not_auth_flow(ac):
     assert (
         non_existent_user_info.status_code == status.HTTP_404_NOT_FOUND
     ), "статус ответа отличается от 404"
+
+
+async def test_user_list_by_cursor(ac):
+    user_list = await ac.get("/api/users", params={"limit": 100})
+    user_ids = [obj["id"] for obj in user_list.json()["results"]]
+
+    cursor_user_ids = list()
+    next_page = "/api/users?cursor=&limit=1"
+    expected_count = user_list.json()["count"]
+    while next_page:
+        user_page = await ac.get(next_page.replace("http://0.0.0.0:8000", ""))
+        assert (
+            user_page.status_code == status.HTTP_200_OK
+        ), "статус ответа отличается от 200"
+        assert (
+            user_page.json()["count"] == expected_count
+        ), "count заполняется только на первой странице"
+        expected_count = None
+        cursor_user_ids += [obj["id"] for obj in user_page.json()["results"]]
+        next_page = user_page.json()["next"]
+    assert (
+        cursor_user_ids == user_ids
+    ), "постраничный вывод по курсору должен вернуть всех пользователей"
+
+    invalid_cursor = await ac.get("/api/users", params={"cursor": "invalid"})
+    assert (
+        invalid_cursor.status_code == status.HTTP_400_BAD_REQUEST
+    ), "некорректный курсор должен возвращать 400"
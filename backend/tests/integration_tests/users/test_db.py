@@ -1,4 +1,8 @@
 import pytest
+from sqlalchemy import func, select
+
+from backend.src.models.users import UserModel
+from backend.src.schemas.subscriptions import SubscriptionCreate
 
 
 @pytest.mark.order(3)
@@ -58,3 +62,23 @@ async def test_user_repository(db):
     assert isinstance(
         get_user_hashed_password.hashed_password, str
     ), "корректный тип hashed_password - str"
+
+
+async def test_user_list_subscriptions(db):
+    await db.subscriptions.create(
+        data=SubscriptionCreate(author_id=2, subscriber_id=1), recipes_limit=1
+    )
+    await db.commit()
+    user_list = await db.users.get_all(
+        limit=2, page=1, router_prefix="/api/users", user_id=1
+    )
+    is_subscribed = {obj.id: obj.is_subscribed for obj in user_list.results}
+    assert is_subscribed == {
+        1: False,
+        2: True,
+    }, "is_subscribed должно быть True только для авторов из подписок"
+    users_count = await db.session.execute(select(func.count(UserModel.id)))
+    assert user_list.count == users_count.scalars().one()
+
+    await db.subscriptions.delete(author_id=2, subscriber_id=1)
+    await db.commit()
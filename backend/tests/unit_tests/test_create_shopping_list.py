@@ -1,13 +1,11 @@
-import os
-
-from backend.src.utils.pdf_shopping_list import create_shopping_list
+from backend.src.setup import shopping_list_renderer
 
 
 async def test_create_shopping_list():
     data = ("абрикос - 100 г", "яблоко - 200 г", "банан - 300 г")
     username = "artni-test"
 
-    shopping_list_pdf = create_shopping_list(data=data, username=username)
-    assert os.path.exists(shopping_list_pdf), "Не удалось создать файл"
-    os.remove(shopping_list_pdf)
-    assert not os.path.exists(shopping_list_pdf), "Не удалось удалить pdf файл"
+    shopping_list_pdf, _ = await shopping_list_renderer.create_shopping_list(
+        data=data, username=username
+    )
+    assert shopping_list_pdf, "Не удалось создать pdf"
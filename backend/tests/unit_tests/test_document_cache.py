@@ -0,0 +1,42 @@
+import os
+import time
+
+from backend.src.utils.document_cache import DocumentCache
+from backend.src.utils.media_io import MediaIO
+
+
+async def put_document(cache, key, content):
+    return await cache.put(key, "pdf", content)
+
+
+async def test_document_cache_lru_and_ttl(tmp_path):
+    media_io = MediaIO(max_workers=1)
+    cache = DocumentCache(directory=tmp_path, max_bytes=20, ttl=60, media_io=media_io)
+    first_key = cache.make_key(1, "user", ["Яблоко - 200 г"], "pdf")
+    assert first_key == cache.make_key(1, "user", ["Яблоко - 200 г"], "pdf")
+    assert first_key != cache.make_key(1, "user", ["Яблоко - 300 г"], "pdf")
+    assert await cache.get(first_key, "pdf") is None
+
+    second_key = cache.make_key(2, "user", [], "pdf")
+    third_key = cache.make_key(3, "user", [], "pdf")
+    (tmp_path / ".gitignore").write_text("*")
+    first_path = await put_document(cache, first_key, b"1" * 10)
+    second_path = await put_document(cache, second_key, b"2" * 10)
+    past = time.time() - 30
+    os.utime(second_path, (past, os.stat(second_path).st_mtime))
+    assert await cache.get(first_key, "pdf") == first_path
+    os.utime(first_path, (time.time(), os.stat(first_path).st_mtime))
+
+    third_path = await put_document(cache, third_key, b"3" * 10)
+    assert not os.path.exists(second_path), "вытесняется давно не запрошенный"
+    assert os.path.exists(first_path)
+
+    expired = time.time() - 120
+    os.utime(first_path, (time.time(), expired))
+    os.utime(tmp_path / ".gitignore", (expired, expired))
+    assert await cache.get(first_key, "pdf") is None
+    assert await cache.cleanup() == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [".gitignore", third_path.split("/")[-1]]
+    )
+    media_io.shutdown()
@@ -0,0 +1,62 @@
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+from backend.src.constants import IMAGE_DERIVATIVE_SIZES
+from backend.src.utils.image_derivatives import (
+    ImageDerivativeGenerator,
+    derivative_name,
+    make_derivatives,
+    remove_image_files,
+)
+from backend.src.utils.image_upload import MEDIA_PATH
+
+
+async def test_image_derivatives():
+    image_file = io.BytesIO()
+    Image.new("RGB", (1600, 800), "#654321").save(image_file, format="PNG")
+    image_hash = hashlib.sha256(image_file.getvalue()).hexdigest()
+    image_name = f"{image_hash}.png"
+    with open(f"{MEDIA_PATH}/{image_name}", "wb") as f:
+        f.write(image_file.getvalue())
+
+    generator = ImageDerivativeGenerator(max_workers=1)
+    try:
+        assert await generator.generate(image_name), "копии должны быть созданы"
+        assert not await generator.generate(
+            "missing.png"
+        ), "отсутствующий файл не обрабатывается"
+    finally:
+        generator.shutdown()
+
+    for variant, size in IMAGE_DERIVATIVE_SIZES.items():
+        variant_path = f"{MEDIA_PATH}/{derivative_name(image_hash, variant)}"
+        with Image.open(variant_path) as variant_image:
+            assert variant_image.format == "WEBP"
+            assert variant_image.size == (size, size // 2), "пропорции сохраняются"
+
+    remove_image_files(image_name)
+    assert not os.path.exists(f"{MEDIA_PATH}/{image_name}")
+    for variant in IMAGE_DERIVATIVE_SIZES:
+        assert not os.path.exists(
+            f"{MEDIA_PATH}/{derivative_name(image_hash, variant)}"
+        ), "копии удаляются вместе с картинкой"
+
+
+def test_image_derivatives_decompression_bomb(monkeypatch):
+    image_file = io.BytesIO()
+    Image.new("RGB", (400, 400), "#123456").save(image_file, format="PNG")
+    image_hash = hashlib.sha256(image_file.getvalue()).hexdigest()
+    image_name = f"{image_hash}.png"
+    with open(f"{MEDIA_PATH}/{image_name}", "wb") as f:
+        f.write(image_file.getvalue())
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 400 * 400 // 4)
+
+    assert not make_derivatives(image_name), "слишком большая картинка пропускается"
+    for variant in IMAGE_DERIVATIVE_SIZES:
+        assert not os.path.exists(
+            f"{MEDIA_PATH}/{derivative_name(image_hash, variant)}"
+        )
+    remove_image_files(image_name)
@@ -0,0 +1,59 @@
+import base64
+import os
+import time
+
+from backend.src.utils.image_upload import (
+    MEDIA_PATH,
+    UPLOAD_TMP_PATH,
+    UploadedImage,
+    create_upload_file,
+    remove_image_file,
+    remove_stale_uploads,
+)
+from backend.src.utils.media_io import MediaIO
+
+
+def test_stale_uploads_removal():
+    paths = list()
+    for _ in range(2):
+        fd, path = create_upload_file()
+        os.close(fd)
+        paths.append(path)
+    stale_path, fresh_path = paths
+    assert os.path.dirname(stale_path) == UPLOAD_TMP_PATH
+    assert not stale_path.startswith(MEDIA_PATH), "загрузки вне раздаваемой директории"
+    old_time = time.time() - 2 * 60 * 60
+    os.utime(stale_path, (old_time, old_time))
+
+    assert remove_stale_uploads(max_age=60 * 60) == 1
+    assert not os.path.exists(stale_path)
+    assert os.path.exists(fresh_path), "незавершенная загрузка не удаляется"
+    os.remove(fresh_path)
+
+
+async def test_uploaded_image_publish_and_discard(test_base64_fixture):
+    media_io = MediaIO(max_workers=1)
+    image = await media_io.run(UploadedImage.from_base64, test_base64_fixture)
+    image_path = f"{MEDIA_PATH}/{image.name}"
+    existed = os.path.exists(image_path)
+    temp_path = image.path
+    assert os.path.dirname(temp_path) == UPLOAD_TMP_PATH
+    with open(temp_path, "rb") as image_file:
+        assert image_file.read() == base64.b64decode(
+            test_base64_fixture.split(";base64,", 1)[1]
+        )
+
+    await media_io.run(image.save)
+    assert os.path.exists(image_path), "картинка переносится в media"
+    assert not os.path.exists(temp_path), "временный файл переименовывается"
+
+    discarded = await media_io.run(UploadedImage.from_base64, test_base64_fixture)
+    temp_path = discarded.path
+    await media_io.run(discarded.discard)
+    assert not os.path.exists(temp_path), "при откате временный файл удаляется"
+    assert discarded.path is None
+    await media_io.run(discarded.discard)
+
+    if not existed:
+        await media_io.run(remove_image_file, image.name)
+    media_io.shutdown()
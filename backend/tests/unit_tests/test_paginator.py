@@ -0,0 +1,63 @@
+import pytest
+
+from backend.src.exceptions.base import InvalidCursorException
+from backend.src.repositories.utils.paginator import (
+    cursor_paginator,
+    decode_cursor,
+    encode_cursor,
+    url_paginator,
+)
+
+
+async def test_cursor_encoding():
+    cursor = encode_cursor(sort_key=10, id=3)
+    assert isinstance(cursor, str), "корректный тип курсора - str"
+    decoded_cursor = decode_cursor(cursor)
+    assert decoded_cursor.sort_key == 10, "неверное значение ключа сортировки"
+    assert decoded_cursor.id == 3, "неверное значение id"
+    assert decode_cursor("") is None, "пустой курсор соответствует первой странице"
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        encode_cursor("key", 1),
+        "W10",
+        encode_cursor(2**40, 1),
+        encode_cursor(1, -(2**31) - 1),
+    ],
+)
+async def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor)
+
+
+async def test_paginator_keeps_filters():
+    query_params = {
+        "tags": ["breakfast", "lunch"],
+        "author": 1,
+        "is_favorited": 0,
+        "is_in_shopping_cart": 1,
+    }
+    paginator_values = url_paginator(
+        page=2,
+        limit=2,
+        count=10,
+        router_prefix="/api/recipes",
+        query_params=query_params,
+    )
+    for link in paginator_values.values():
+        assert "tags=breakfast&tags=lunch" in link, "в ссылке потерян фильтр tags"
+        assert "author=1" in link, "в ссылке потерян фильтр author"
+        assert "is_in_shopping_cart=1" in link, "в ссылке потерян фильтр корзины"
+        assert "is_favorited" not in link, "пустые фильтры не попадают в ссылку"
+
+    cursor_values = cursor_paginator(
+        limit=2,
+        next_cursor=encode_cursor(sort_key=5, id=5),
+        router_prefix="/api/recipes",
+        query_params=query_params,
+    )
+    assert "cursor=" in cursor_values["next"], "в ссылке next отсутствует курсор"
+    assert "tags=lunch" in cursor_values["next"], "в ссылке потерян фильтр tags"
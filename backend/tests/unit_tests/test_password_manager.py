@@ -0,0 +1,56 @@
+import asyncio
+
+from backend.src.exceptions.users import PasswordHasherBusyException
+from backend.src.repositories.utils.users import PasswordManager
+
+
+async def test_password_manager_rehash():
+    old_manager = PasswordManager(rounds=4, max_concurrency=1, max_queue=1)
+    new_manager = PasswordManager(rounds=5, max_concurrency=1, max_queue=1)
+    hashed_password = await old_manager.hash_password("password")
+    assert await old_manager.verify_password("password", hashed_password)
+    assert not await old_manager.verify_password("wrong", hashed_password)
+
+    verified, new_hash = await old_manager.verify_and_update(
+        "password", hashed_password
+    )
+    assert (verified, new_hash) == (True, None), "стоимость хеша не менялась"
+    verified, new_hash = await new_manager.verify_and_update("wrong", hashed_password)
+    assert (verified, new_hash) == (False, None)
+    verified, new_hash = await new_manager.verify_and_update(
+        "password", hashed_password
+    )
+    assert verified
+    assert new_hash.startswith("$2b$05$"), "хеш пересчитан с новой стоимостью"
+    assert await new_manager.verify_password("password", new_hash)
+    assert new_manager.metrics.rehashed == 1
+    old_manager.shutdown()
+    new_manager.shutdown()
+
+
+async def test_password_manager_queue():
+    manager = PasswordManager(rounds=10, max_concurrency=1, max_queue=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    results = await asyncio.gather(
+        *[manager.hash_password("password") for _ in range(3)],
+        return_exceptions=True,
+    )
+    ticker_task.cancel()
+    manager.shutdown()
+
+    assert ticks > 5, "хеширование не должно блокировать event loop"
+    assert all(isinstance(result, str) for result in results[:2])
+    assert isinstance(results[2], PasswordHasherBusyException)
+    metrics = manager.metrics.snapshot()
+    assert (metrics["completed"], metrics["rejected"]) == (2, 1)
+    assert (metrics["in_progress"], metrics["queued"]) == (0, 0)
+    assert metrics["max_queued"] == 1
+    assert metrics["max_queue_seconds"] > 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from backend.src.exceptions.recipes import (
+    ShoppingListRenderException,
+    ShoppingListRendererBusyException,
+)
+from backend.src.utils.pdf_shopping_list import (
+    RenderTiming,
+    ShoppingListRenderer,
+    remove_legacy_shopping_lists,
+)
+
+FAKE_WKHTMLTOPDF = """#!/bin/sh
+sleep 0.3
+cat
+"""
+
+
+async def test_shopping_list_renderer_queue(tmp_path):
+    wkhtmltopdf = tmp_path / "wkhtmltopdf"
+    wkhtmltopdf.write_text(FAKE_WKHTMLTOPDF)
+    wkhtmltopdf.chmod(0o755)
+    renderer = ShoppingListRenderer(
+        wkhtmltopdf=str(wkhtmltopdf), max_concurrency=1, max_queue=1
+    )
+    html = renderer.render_html(data=["Яблоко - 200 г"], username="<test>")
+    assert "&lt;test&gt;" in html, "данные пользователя экранируются"
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    results = await asyncio.gather(
+        *[renderer.render_pdf(html) for _ in range(3)],
+        return_exceptions=True,
+    )
+    ticker_task.cancel()
+
+    assert ticks > 20, "рендеринг не должен блокировать event loop"
+    rendered = [result for result in results if isinstance(result, tuple)]
+    assert len(rendered) == 2
+    timings = [timing for _, timing in rendered]
+    assert all(isinstance(timing, RenderTiming) for timing in timings)
+    assert isinstance(results[2], ShoppingListRendererBusyException)
+    assert max(timing.queue_seconds for timing in timings) > 0.2
+    assert rendered[0][0] == html.encode()
+    assert list(tmp_path.iterdir()) == [wkhtmltopdf], "pdf создается в памяти"
+    metrics = renderer.metrics.snapshot()
+    assert (metrics["rendered"], metrics["rejected"]) == (2, 1)
+    assert (metrics["in_progress"], metrics["queued"]) == (0, 0)
+
+    renderer.wkhtmltopdf = str(tmp_path / "missing")
+    with pytest.raises(ShoppingListRenderException):
+        await renderer.render_pdf(html)
+    assert renderer.metrics.failed == 1
+
+
+def test_remove_legacy_shopping_lists(tmp_path):
+    legacy_path = tmp_path / "shopping_lists"
+    (legacy_path / "__pycache__").mkdir(parents=True)
+    (legacy_path / "01.01.2025_10:00:00_user_shopping_list.pdf").write_bytes(b"%PDF")
+    (legacy_path / "__init__.py").write_text("")
+    assert remove_legacy_shopping_lists(legacy_path) == 2
+    assert not legacy_path.exists()
+    assert (
+        remove_legacy_shopping_lists(legacy_path) == 0
+    ), "повторный запуск ничего не делает"
@@ -0,0 +1,14 @@
+from backend.src.connectors.redis_connector import RedisManager
+from backend.src.schemas.recipes import RecipeRead
+from backend.src.utils.recipe_cache import RecipeCache
+
+
+async def test_recipe_cache_without_redis():
+    recipe_cache = RecipeCache(redis=RedisManager(host="localhost", port=6379))
+    assert not recipe_cache.enabled, "без подключения к Redis кэш отключен"
+    assert await recipe_cache.get_list_key(query_params={"page": 1}) is None
+    cache_key = await recipe_cache.get_recipe_key(id=1)
+    assert cache_key is None
+    assert await recipe_cache.get(cache_key, RecipeRead) is None
+    await recipe_cache.invalidate_recipe(id=1)
+    await recipe_cache.invalidate_all()
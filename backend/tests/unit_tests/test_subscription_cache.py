@@ -0,0 +1,14 @@
+from backend.src.connectors.redis_connector import RedisManager
+from backend.src.utils.subscription_cache import SubscriptionGraphCache
+
+
+async def test_subscription_cache_without_redis():
+    graph_cache = SubscriptionGraphCache(
+        redis=RedisManager(host="localhost", port=6379)
+    )
+    assert not graph_cache.enabled, "без подключения к Redis кэш отключен"
+    assert await graph_cache.get_subscribed(subscriber_id=1, author_ids=[2]) is None
+    version = await graph_cache.get_version(subscriber_id=1)
+    assert version is None
+    await graph_cache.load(subscriber_id=1, author_ids=[2], version=version)
+    await graph_cache.invalidate(subscriber_id=1)
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from uuid import uuid4
+
+from backend.src.config import settings
+from backend.src.connectors.redis_connector import RedisManager
+from backend.src.utils.token_cache import VerifiedTokenCache
+from backend.src.utils.token_revocation import TokenRevocationList
+
+
+def test_verified_token_cache():
+    cache = VerifiedTokenCache(max_size=2, ttl=60)
+    expire = time.time() + 600
+    cache.set("first", 1, expire=expire)
+    cache.set("second", 2, expire=expire)
+    assert cache.get("first") == 1
+    cache.set("third", 3, expire=expire)
+    assert cache.get("second") is None, "вытесняется давно не использованный токен"
+    assert (cache.get("first"), cache.get("third")) == (1, 3)
+
+    cache.set("expired", 4, expire=time.time() - 1)
+    assert cache.get("expired") is None, "запись не живет дольше токена"
+    assert len(cache) == 1
+
+
+async def test_token_revocation():
+    redis = RedisManager(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    assert not TokenRevocationList(redis=redis, enabled=True).enabled
+    await redis.connect()
+    revocation = TokenRevocationList(redis=redis, enabled=True)
+    mget = redis.mget
+    mget_calls = 0
+
+    async def counting_mget(*keys):
+        nonlocal mget_calls
+        mget_calls += 1
+        return await mget(*keys)
+
+    redis.mget = counting_mget
+    revoked_id, active_id = uuid4().hex, uuid4().hex
+    await revocation.revoke(revoked_id, expire=int(time.time()) + 60)
+    results = await asyncio.gather(
+        revocation.is_revoked(revoked_id),
+        revocation.is_revoked(active_id),
+        revocation.is_revoked(active_id),
+    )
+    assert results == [True, False, False]
+    assert mget_calls == 1, "одновременные проверки выполняются одним MGET"
+    assert not await TokenRevocationList(redis=redis).is_revoked(
+        revoked_id
+    ), "без TOKEN_REVOCATION_ENABLED отзыв не проверяется"
+    await redis.delete(revocation._key(revoked_id))
+    await redis.close()